@@ -0,0 +1,320 @@
+"""
+benchmark_system.py — Performance benchmarks for the scoring and storage hot paths.
+Reports p50 / p99 latency and throughput, saves them as a baseline JSON file and
+flags regressions against it.
+
+Run: python benchmark_system.py --save-baseline          # record a baseline
+     python benchmark_system.py                          # compare against it
+     python benchmark_system.py --quick --only database  # 10K-row database only
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "bench")
+DB_SIZES = (10_000, 1_000_000, 10_000_000)
+# Fixture data spans this many days, whatever its size
+FIXTURE_DAYS = 30
+
+
+# ── Measurement ───────────────────────────────────────────────────
+
+def measure(fn, items: int = 1, min_time: float = 0.5, min_iterations: int = 20,
+            max_iterations: int = 100_000, warmup: int = 3) -> dict:
+    """
+    Call fn(i) repeatedly, for at least `min_time` seconds and `min_iterations`
+    calls, timing each call separately.
+
+    Returns:
+        dict with iterations, p50_ms, p99_ms and per_second (items per second,
+        where each call handles `items` items)
+    """
+    for i in range(warmup):
+        fn(i)
+    timings = []
+    started = time.perf_counter()
+    i = 0
+    while i < max_iterations and (i < min_iterations or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn(warmup + i)
+        timings.append(time.perf_counter() - t0)
+        i += 1
+    timings = np.array(timings)
+    return {
+        "iterations": i,
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+        "per_second": items * i / float(timings.sum()),
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float = 0.25) -> list:
+    """
+    Benchmarks that got slower than the baseline by more than `threshold`
+    (0.25 = 25%) in p50 latency or throughput. p99 is reported but not
+    flagged: on a shared machine it is too noisy to gate on.
+
+    Returns:
+        list of (name, metric, baseline value, current value), worst first
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            regressions.append((name, "p50_ms", before["p50_ms"], current["p50_ms"]))
+        elif current["per_second"] < before["per_second"] / (1 + threshold):
+            regressions.append((name, "per_second", before["per_second"], current["per_second"]))
+    regressions.sort(key=lambda r: max(r[2], r[3]) / max(min(r[2], r[3]), 1e-12), reverse=True)
+    return regressions
+
+
+# ── Fixtures ──────────────────────────────────────────────────────
+
+def _sample_transactions(count: int, seed: int = 0) -> tuple:
+    """Transactions from the load generator, with a matching profile per user."""
+    from src.load_generator import LoadGenerator, SyntheticPopulation
+    from src.stream_file import columns_to_transactions
+
+    population = SyntheticPopulation(max(count // 10, 20), seed=seed)
+    transactions = columns_to_transactions(LoadGenerator(population, seed=seed).generate(count))
+    profiles = {
+        uid: {"user_id": uid, "avg_amount": float(population.avg_spend[uid - 1001]),
+              "last_device": "Android_A", "usual_location": "Mumbai",
+              "transaction_count": 12, "last_transaction_time": "2024-01-01T00:00:00"}
+        for uid in {t["user_id"] for t in transactions}
+    }
+    return transactions, profiles
+
+
+def build_fixture(path: str, rows: int, chunk_size: int = 100_000, progress=None):
+    """
+    Fill a database with `rows` scored transactions spread over FIXTURE_DAYS,
+    from users with the load generator's skewed activity, and their profiles.
+    Scores are drawn at random rather than computed, so building is fast.
+    """
+    from src.database_manager import DatabaseManager
+    from src.load_generator import LoadGenerator, SyntheticPopulation
+    from src.stream_file import columns_to_transactions
+
+    population = SyntheticPopulation(max(rows // 20, 100), seed=1)
+    generator = LoadGenerator(population, rate=rows / (FIXTURE_DAYS * 86400), seed=1,
+                              id_prefix="BENCH")
+    rng = np.random.default_rng(1)
+    db = DatabaseManager(db_path=path, synchronous="OFF")
+    profiles = {}
+    done = 0
+    while done < rows:
+        columns = generator.generate(min(chunk_size, rows - done))
+        transactions = columns_to_transactions(columns)
+        count = len(transactions)
+        probabilities = np.round(np.where(columns["injected_fraud"], rng.uniform(0.6, 1.0, count),
+                                          rng.uniform(0.0, 0.4, count)), 4)
+        for txn, probability in zip(transactions, probabilities.tolist()):
+            high = probability >= 0.5
+            header = "🚨 HIGH RISK TRANSACTION DETECTED" if high else "✅ Transaction appears normal"
+            txn["fraud_probability"] = probability
+            txn["risk_level"] = "HIGH RISK" if high else "LOW RISK"
+            txn["explanation"] = (f"{header}\n   Fraud Probability: {probability * 100:.1f}%"
+                                  f"\n   ℹ No specific behavioral anomalies detected")
+            profile = profiles.setdefault(
+                txn["user_id"], {"user_id": txn["user_id"], "avg_amount": 0.0, "transaction_count": 0})
+            seen = profile["transaction_count"] + 1
+            profile["avg_amount"] += (txn["amount"] - profile["avg_amount"]) / seen
+            profile["transaction_count"] = seen
+            profile["last_device"] = txn["device_id"]
+            profile["usual_location"] = txn["location"]
+            profile["last_transaction_time"] = txn["timestamp"]
+        db.insert_transactions_bulk(transactions, chunk_size=chunk_size)
+        done += len(transactions)
+        if progress:
+            progress(done)
+    db.upsert_user_profiles_bulk(list(profiles.values()), chunk_size=chunk_size)
+    db.close()
+
+
+def fixture_path(rows: int) -> str:
+    """Path of the cached fixture database with `rows` transactions, building it if needed."""
+    path = os.path.join(FIXTURE_DIR, f"bench_{rows}.db")
+    if not os.path.exists(path):
+        os.makedirs(FIXTURE_DIR, exist_ok=True)
+        partial = path + ".partial"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(partial + suffix):
+                os.remove(partial + suffix)
+        started = time.perf_counter()
+
+        def progress(done):
+            print(f"\r  building {rows:,}-row fixture: {done:,}", end="", flush=True)
+
+        build_fixture(partial, rows, progress=progress)
+        os.replace(partial, path)
+        print(f" ({time.perf_counter() - started:.0f}s)")
+    return path
+
+
+# ── Benchmarks ────────────────────────────────────────────────────
+
+def bench_scoring(min_time: float) -> dict:
+    """Feature engineering and prediction, single and batched."""
+    from src.data_processing import build_feature_dataframe, compute_behavioral_features
+    from src.fraud_prediction import batch_predict, predict_fraud
+
+    transactions, profiles = _sample_transactions(2000)
+    pairs = [(t, profiles[t["user_id"]]) for t in transactions]
+    features = [compute_behavioral_features(t, p, 2) for t, p in pairs[:100]]
+    batch = transactions[:1000]
+    velocities = {uid: 2 for uid in profiles}
+
+    return {
+        "compute_behavioral_features": measure(
+            lambda i: compute_behavioral_features(*pairs[i % len(pairs)], 2), min_time=min_time),
+        "build_feature_dataframe": measure(
+            lambda i: build_feature_dataframe(features[i % len(features)]), min_time=min_time),
+        "predict_fraud": measure(
+            lambda i: predict_fraud(*pairs[i % len(pairs)], 2), min_time=min_time),
+        "batch_predict[1000]": measure(
+            lambda i: batch_predict(batch, profiles, velocities), items=len(batch),
+            min_time=min_time, min_iterations=5),
+    }
+
+
+def bench_process_transaction(min_time: float) -> dict:
+    """End to end: profile + velocity lookup, scoring and storage, on a fresh database."""
+    from src.database_manager import DatabaseManager
+    from src.simulator import process_transaction
+
+    transactions, _ = _sample_transactions(200_000, seed=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(db_path=os.path.join(tmp, "e2e.db"))
+        try:
+            return {"process_transaction": measure(
+                lambda i: process_transaction(db, transactions[i % len(transactions)]),
+                min_time=min_time, max_iterations=len(transactions) - 3)}
+        finally:
+            db.close()
+
+
+def bench_database(rows: int, min_time: float) -> dict:
+    """Every DatabaseManager read path against a cached `rows`-row fixture."""
+    from src.database_manager import DatabaseManager
+
+    db = DatabaseManager(db_path=fixture_path(rows))
+    # The most active users, at the end of the data, where velocity windows are full
+    user_ids = [p["user_id"] for p in sorted(db.iter_user_profiles(),
+                                             key=lambda p: -p["transaction_count"])[:500]]
+    now = db.get_recent_transactions(1)[0]["timestamp"]
+    day_ago = (datetime.fromisoformat(now) - timedelta(days=1)).isoformat()
+
+    def uid(i):
+        return user_ids[i % len(user_ids)]
+
+    def some_users(i):
+        return user_ids[i % 400:i % 400 + 100]
+
+    queries = {
+        "get_user_profile": lambda i: db.get_user_profile(uid(i)),
+        "get_user_profiles[100]": lambda i: db.get_user_profiles(some_users(i)),
+        "get_scoring_context": lambda i: db.get_scoring_context(uid(i), now),
+        "get_transaction_velocity": lambda i: db.get_transaction_velocity(uid(i), now),
+        "get_velocity_counts": lambda i: db.get_velocity_counts(uid(i), now),
+        "get_user_activity[100]": lambda i: db.get_user_activity(some_users(i), day_ago),
+        "get_recent_transactions": lambda i: db.get_recent_transactions(50),
+        "get_fraud_alerts": lambda i: db.get_fraud_alerts(20),
+        "get_fraud_stats": lambda i: db.get_fraud_stats(),
+        "get_hourly_fraud_distribution": lambda i: db.get_hourly_fraud_distribution(),
+        "get_user_risk_summary": lambda i: db.get_user_risk_summary(),
+        "get_location_fraud_distribution": lambda i: db.get_location_fraud_distribution(),
+        "get_merchant_fraud_distribution": lambda i: db.get_merchant_fraud_distribution(),
+    }
+    try:
+        return {f"db[{rows}].{name}": measure(fn, min_time=min_time) for name, fn in queries.items()}
+    finally:
+        db.close()
+
+
+def run_benchmarks(sizes=DB_SIZES, only: str = None, min_time: float = 0.5) -> dict:
+    groups = [("scoring", lambda: bench_scoring(min_time)),
+              ("process_transaction", lambda: bench_process_transaction(min_time))]
+    groups += [(f"database[{rows}]", lambda rows=rows: bench_database(rows, min_time))
+               for rows in sizes]
+    results = {}
+    for group, run in groups:
+        if only and only not in group:
+            continue
+        print(f"▶ {group}")
+        for name, result in run().items():
+            results[name] = result
+            print(f"  {name:<52} p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+                  f"{result['per_second']:>12,.0f}/s")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scoring and storage hot paths.")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DB_SIZES),
+                        help="database fixture sizes in rows (default: 10000,1000000,10000000; "
+                             "fixtures are built once and cached in database/bench)")
+    parser.add_argument("--quick", action="store_true", help="only the 10,000-row database")
+    parser.add_argument("--only", default=None,
+                        help="run groups whose name contains this (scoring, process_transaction, "
+                             "database)")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="seconds spent timing each benchmark (default: 0.5)")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="baseline JSON file (default: benchmark_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown flagged as a regression (default: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [10_000] if args.quick else [int(n) for n in args.sizes.split(",")]
+    print(f"\n🛡️  FINTECHAI — Benchmarks ({platform.python_version()}, SQLite {sqlite3.sqlite_version}, "
+          f"{os.cpu_count()} CPU)\n")
+    results = run_benchmarks(sizes, args.only, args.min_time)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        baseline.update(results)  # partial runs refresh only what they measured
+        with open(args.baseline, "w") as f:
+            json.dump({"created": datetime.now().isoformat(timespec="seconds"),
+                       "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                       "machine": platform.machine(), "cpus": os.cpu_count(),
+                       "results": baseline}, f, indent=2, sort_keys=True)
+        print(f"\n✅ Baseline saved to {args.baseline} ({len(results)} benchmarks)")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nℹ No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if not regressions:
+        print(f"\n✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+        return 0
+    print(f"\n⚠️  {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+    for name, metric, before, after in regressions:
+        print(f"  {name:<52} {metric:<10} {before:>12,.3f} → {after:>12,.3f}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
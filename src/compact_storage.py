@@ -0,0 +1,294 @@
+"""
+compact_storage.py — Row codecs for the two layouts of the transactions table.
+The standard layout stores rows as the pipeline produces them; the compact layout
+stores epoch-microsecond timestamps, dictionary-coded categories and reason-code bitmasks.
+"""
+
+import re
+import threading
+
+from src.timestamps import iso_to_micros, micros_to_iso
+
+# ── Explanation reason codes ──────────────────────────────────────
+# One bit per behavioral flag, plus the numbers the explanation text prints.
+# Layout: bits 0-6 flags, 8-18 probability (tenths of a percent),
+# 19-34 velocity, 35-62 amount deviation (tenths).
+REASON_AMOUNT = 1 << 0
+REASON_NEW_DEVICE = 1 << 1
+REASON_NIGHT = 1 << 2
+REASON_LOCATION_CHANGE = 1 << 3
+REASON_NEW_MERCHANT = 1 << 4
+REASON_VELOCITY = 1 << 5
+REASON_HIGH_RISK = 1 << 6
+
+_PROBABILITY_SHIFT, _PROBABILITY_BITS = 8, 11
+_VELOCITY_SHIFT, _VELOCITY_BITS = 19, 16
+_DEVIATION_SHIFT, _DEVIATION_BITS = 35, 28
+
+_HIGH_RISK_HEADER = "🚨 HIGH RISK TRANSACTION DETECTED"
+_NORMAL_HEADER = "✅ Transaction appears normal"
+_PROBABILITY_LINE = re.compile(r"   Fraud Probability: (\d+)\.(\d)%")
+_AMOUNT_LINE = re.compile(r"   ⚠ Unusual transaction amount \((\d+)\.(\d)x deviation from average\)")
+_NEW_DEVICE_LINE = "   ⚠ New device detected (different from usual device)"
+_NIGHT_LINE = re.compile(r"   ⚠ Unusual transaction time \(hour: .*, night hours\)")
+_LOCATION_LINE = "   ⚠ Location change detected (different from usual location)"
+_NEW_MERCHANT_LINE = "   ⚠ New merchant detected (first-time interaction)"
+_VELOCITY_LINE = re.compile(r"   ⚠ Rapid sequential transactions \(velocity: (\d+)\)")
+_NO_ANOMALIES_LINE = "   ℹ No specific behavioral anomalies detected"
+
+
+def _field(code: int, shift: int, bits: int) -> int:
+    return (code >> shift) & ((1 << bits) - 1)
+
+
+def render_explanation(code: int, hour) -> str:
+    """Rebuild the text generate_explanation() produced from its reason code."""
+    probability = _field(code, _PROBABILITY_SHIFT, _PROBABILITY_BITS)
+    lines = [
+        _HIGH_RISK_HEADER if code & REASON_HIGH_RISK else _NORMAL_HEADER,
+        f"   Fraud Probability: {probability // 10}.{probability % 10}%",
+    ]
+    if code & REASON_AMOUNT:
+        deviation = _field(code, _DEVIATION_SHIFT, _DEVIATION_BITS)
+        lines.append(f"   ⚠ Unusual transaction amount ({deviation // 10}.{deviation % 10}x "
+                     f"deviation from average)")
+    if code & REASON_NEW_DEVICE:
+        lines.append(_NEW_DEVICE_LINE)
+    if code & REASON_NIGHT:
+        lines.append(f"   ⚠ Unusual transaction time (hour: {hour}, night hours)")
+    if code & REASON_LOCATION_CHANGE:
+        lines.append(_LOCATION_LINE)
+    if code & REASON_NEW_MERCHANT:
+        lines.append(_NEW_MERCHANT_LINE)
+    if code & REASON_VELOCITY:
+        lines.append(f"   ⚠ Rapid sequential transactions "
+                     f"(velocity: {_field(code, _VELOCITY_SHIFT, _VELOCITY_BITS)})")
+    if len(lines) == 2:
+        lines.append(_NO_ANOMALIES_LINE)
+    return "\n".join(lines)
+
+
+def encode_explanation(text, hour):
+    """
+    Reduce an explanation to its reason code.
+
+    Returns the integer code when render_explanation(code, hour) reproduces
+    `text` exactly, otherwise `text` unchanged (free-form explanations are
+    stored as they are).
+    """
+    if not isinstance(text, str):
+        return text
+    lines = text.split("\n")
+    if len(lines) < 3 or lines[0] not in (_HIGH_RISK_HEADER, _NORMAL_HEADER):
+        return text
+    match = _PROBABILITY_LINE.fullmatch(lines[1])
+    if not match:
+        return text
+
+    code = REASON_HIGH_RISK if lines[0] == _HIGH_RISK_HEADER else 0
+    fields = {_PROBABILITY_SHIFT: int(match[1]) * 10 + int(match[2])}
+    for line in lines[2:]:
+        if (match := _AMOUNT_LINE.fullmatch(line)):
+            code |= REASON_AMOUNT
+            fields[_DEVIATION_SHIFT] = int(match[1]) * 10 + int(match[2])
+        elif line == _NEW_DEVICE_LINE:
+            code |= REASON_NEW_DEVICE
+        elif _NIGHT_LINE.fullmatch(line):
+            code |= REASON_NIGHT
+        elif line == _LOCATION_LINE:
+            code |= REASON_LOCATION_CHANGE
+        elif line == _NEW_MERCHANT_LINE:
+            code |= REASON_NEW_MERCHANT
+        elif (match := _VELOCITY_LINE.fullmatch(line)):
+            code |= REASON_VELOCITY
+            fields[_VELOCITY_SHIFT] = int(match[1])
+        elif line != _NO_ANOMALIES_LINE:
+            return text
+
+    widths = {_PROBABILITY_SHIFT: _PROBABILITY_BITS, _VELOCITY_SHIFT: _VELOCITY_BITS,
+              _DEVIATION_SHIFT: _DEVIATION_BITS}
+    for shift, value in fields.items():
+        if value >= 1 << widths[shift]:
+            return text
+        code |= value << shift
+    # Anything the parser accepted but the renderer can't reproduce stays as text
+    return code if render_explanation(code, hour) == text else text
+
+
+# ── Codecs ────────────────────────────────────────────────────────
+
+_RISK_LEVELS = {"HIGH RISK": 1, "LOW RISK": 0}
+_RISK_NAMES = {code: name for name, code in _RISK_LEVELS.items()}
+
+# Value used for an unparseable window start, so that `timestamp >= ?` matches
+# every row, as the empty string does against ISO text
+_MIN_MICROS = -(1 << 63)
+
+
+class StandardCodec:
+    """Rows stored as the pipeline produces them: ISO text, category strings, explanation text."""
+
+    name = "standard"
+    compact = False
+    # SQL literal stored in risk_level for HIGH RISK rows
+    high_risk_sql = "'HIGH RISK'"
+    column_types = {"timestamp": "TEXT", "device_id": "TEXT", "location": "TEXT",
+                    "merchant_id": "TEXT", "risk_level": "TEXT", "explanation": "TEXT",
+                    "model_version": "TEXT"}
+
+    def encode(self, cursor, transaction: dict) -> tuple:
+        """INSERT parameters for a transaction, in transactions column order."""
+        return (
+            transaction["transaction_id"],
+            transaction["user_id"],
+            transaction["amount"],
+            transaction["hour"],
+            transaction["device_id"],
+            transaction["location"],
+            transaction["merchant_id"],
+            transaction.get("fraud_probability"),
+            transaction.get("risk_level"),
+            transaction.get("explanation", ""),
+            transaction["timestamp"],
+            transaction.get("model_version"),
+        )
+
+    def decode(self, cursor, rows) -> list:
+        return [dict(row) for row in rows]
+
+    def encode_time(self, timestamp: str):
+        """Query parameter for comparisons against the timestamp column."""
+        return timestamp
+
+    def decode_time(self, value) -> str:
+        return value
+
+    def decode_value(self, cursor, column: str, value):
+        """Stored value of a categorical column back to its string."""
+        return value
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class CompactCodec(StandardCodec):
+    """
+    Rows stored as integers: epoch-microsecond timestamps, category codes from
+    the dim_* lookup tables, 1/0 risk levels and reason-code explanations.
+
+    Codes assigned inside an open transaction stay private to the assigning
+    thread until it commits, so a rollback never leaves a dangling code cached.
+    """
+
+    name = "compact"
+    compact = True
+    high_risk_sql = "1"
+    column_types = {"timestamp": "INTEGER", "device_id": "INTEGER", "location": "INTEGER",
+                    "merchant_id": "INTEGER", "risk_level": "INTEGER", "explanation": "INTEGER",
+                    "model_version": "INTEGER"}
+    # Categorical column -> lookup table
+    dimensions = {"device_id": "dim_device", "location": "dim_location",
+                  "merchant_id": "dim_merchant", "model_version": "dim_model_version"}
+
+    def __init__(self):
+        self._codes = {column: {} for column in self.dimensions}   # value -> code
+        self._values = {column: {} for column in self.dimensions}  # code -> value
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _pending(self) -> dict:
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            pending = self._local.pending = {column: {} for column in self.dimensions}
+        return pending
+
+    def _code(self, cursor, column: str, value: str) -> int:
+        if value is None:
+            return None
+        code = self._codes[column].get(value)
+        if code is not None:
+            return code
+        pending = self._pending()[column]
+        code = pending.get(value)
+        if code is None:
+            table = self.dimensions[column]
+            cursor.execute(f"INSERT OR IGNORE INTO {table} (value) VALUES (?)", (value,))
+            code = cursor.execute(f"SELECT code FROM {table} WHERE value = ?",
+                                  (value,)).fetchone()[0]
+            pending[value] = code
+        return code
+
+    def decode_value(self, cursor, column: str, value):
+        if not isinstance(value, int):
+            return value
+        name = self._values[column].get(value)
+        if name is None:
+            # Assigned by another thread, process or an earlier session
+            row = cursor.execute(f"SELECT value FROM {self.dimensions[column]} WHERE code = ?",
+                                 (value,)).fetchone()
+            if row is None:
+                return value
+            name = row[0]
+            with self._lock:
+                self._codes[column].setdefault(name, value)
+                self._values[column][value] = name
+        return name
+
+    def commit(self):
+        pending = getattr(self._local, "pending", None)
+        if not pending:
+            return
+        with self._lock:
+            for column, assigned in pending.items():
+                for value, code in assigned.items():
+                    self._codes[column][value] = code
+                    self._values[column][code] = value
+        self._local.pending = None
+
+    def rollback(self):
+        self._local.pending = None
+
+    def encode(self, cursor, transaction: dict) -> tuple:
+        risk_level = transaction.get("risk_level")
+        return (
+            transaction["transaction_id"],
+            transaction["user_id"],
+            transaction["amount"],
+            transaction["hour"],
+            self._code(cursor, "device_id", transaction["device_id"]),
+            self._code(cursor, "location", transaction["location"]),
+            self._code(cursor, "merchant_id", transaction["merchant_id"]),
+            transaction.get("fraud_probability"),
+            _RISK_LEVELS.get(risk_level, risk_level),
+            encode_explanation(transaction.get("explanation", ""), transaction["hour"]),
+            iso_to_micros(transaction["timestamp"]),
+            self._code(cursor, "model_version", transaction.get("model_version")),
+        )
+
+    def decode(self, cursor, rows) -> list:
+        decoded = []
+        for row in rows:
+            row = dict(row)
+            for column in self.dimensions:
+                row[column] = self.decode_value(cursor, column, row[column])
+            row["risk_level"] = _RISK_NAMES.get(row["risk_level"], row["risk_level"])
+            if isinstance(row["explanation"], int):
+                row["explanation"] = render_explanation(row["explanation"], row["hour"])
+            row["timestamp"] = self.decode_time(row["timestamp"])
+            decoded.append(row)
+        return decoded
+
+    def encode_time(self, timestamp: str):
+        try:
+            return iso_to_micros(timestamp)
+        except (ValueError, TypeError):
+            return _MIN_MICROS
+
+    def decode_time(self, value) -> str:
+        return micros_to_iso(value) if isinstance(value, int) else value
+
+
+CODECS = {codec.name: codec for codec in (StandardCodec, CompactCodec)}
@@ -7,11 +7,10 @@ Run: streamlit run src/dashboard.py
 
 import sys
 import os
-import time
 import uuid
-import threading
 from datetime import datetime
 
+import numpy as np
 import streamlit as st
 import pandas as pd
 import plotly.express as px
@@ -20,10 +19,11 @@ import plotly.graph_objects as go
 # Ensure project root is in path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.dashboard_data import DashboardData
 from src.database_manager import DatabaseManager
 from src.fraud_prediction import predict_fraud, get_model_info
 from src.simulator import (
-    process_transaction, run_simulator, USER_PROFILES_SEED,
+    process_transaction, SimulatorWorker, USER_PROFILES_SEED,
     LOCATIONS, DEVICES, MERCHANTS,
 )
 
@@ -191,24 +191,39 @@ st.markdown("""
 # ── Initialize State ──────────────────────────────────────────────
 @st.cache_resource
 def get_db():
-    return DatabaseManager()
+    # Records scored in this process (simulator, manual entry) are pushed to the live feed
+    return DatabaseManager(profile_cache_size=100_000, live_feed_size=10_000)
 
 
 @st.cache_resource
-def get_model_metadata():
-    return get_model_info()
+def get_dashboard_data():
+    # Shared by every session, so concurrent viewers reuse one set of query results.
+    # New records arrive through the live feed; the version check only catches
+    # writes from other processes, so it can run every few seconds.
+    return DashboardData(get_db(), ttl=5.0)
 
 
-db = get_db()
-model_info = get_model_metadata()
+@st.cache_resource
+def get_simulator():
+    # One background simulator per server, shared by every session like the database
+    return SimulatorWorker(get_db())
+
 
+db = get_db()
+data = get_dashboard_data()
+# Not cached: the active model can be swapped while the dashboard runs
+model_info = get_model_info()
+simulator = get_simulator()
 
 # Initialize session state
-if "simulator_running" not in st.session_state:
-    st.session_state.simulator_running = False
+st.session_state.simulator_running = simulator.running
 if "sim_count" not in st.session_state:
     st.session_state.sim_count = 0
 
+# Live sections re-render on their own, from the live feed (no SQLite reads):
+# twice a second while the simulator runs, every few seconds otherwise
+LIVE_REFRESH = 0.5 if st.session_state.simulator_running else 3.0
+
 
 # ── Hero Header ───────────────────────────────────────────────────
 st.markdown("""
@@ -221,33 +236,38 @@ st.markdown("""
 
 
 # ── Key Metrics ───────────────────────────────────────────────────
-stats = db.get_fraud_stats()
-
-col1, col2, col3, col4 = st.columns(4)
-with col1:
-    st.markdown(f"""
-    <div class="metric-card metric-blue">
-        <div class="metric-label">Total Transactions</div>
-        <div class="metric-value">{stats['total_transactions']:,}</div>
-    </div>""", unsafe_allow_html=True)
-with col2:
-    st.markdown(f"""
-    <div class="metric-card metric-red">
-        <div class="metric-label">High Risk Alerts</div>
-        <div class="metric-value">{stats['high_risk_count']:,}</div>
-    </div>""", unsafe_allow_html=True)
-with col3:
-    st.markdown(f"""
-    <div class="metric-card metric-amber">
-        <div class="metric-label">Fraud Rate</div>
-        <div class="metric-value">{stats['fraud_rate']:.1f}%</div>
-    </div>""", unsafe_allow_html=True)
-with col4:
-    st.markdown(f"""
-    <div class="metric-card metric-green">
-        <div class="metric-label">Avg Risk Score</div>
-        <div class="metric-value">{stats['avg_probability']:.2%}</div>
-    </div>""", unsafe_allow_html=True)
+@st.fragment(run_every=LIVE_REFRESH)
+def render_key_metrics():
+    stats = data.fraud_stats()
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card metric-blue">
+            <div class="metric-label">Total Transactions</div>
+            <div class="metric-value">{stats['total_transactions']:,}</div>
+        </div>""", unsafe_allow_html=True)
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card metric-red">
+            <div class="metric-label">High Risk Alerts</div>
+            <div class="metric-value">{stats['high_risk_count']:,}</div>
+        </div>""", unsafe_allow_html=True)
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card metric-amber">
+            <div class="metric-label">Fraud Rate</div>
+            <div class="metric-value">{stats['fraud_rate']:.1f}%</div>
+        </div>""", unsafe_allow_html=True)
+    with col4:
+        st.markdown(f"""
+        <div class="metric-card metric-green">
+            <div class="metric-label">Avg Risk Score</div>
+            <div class="metric-value">{stats['avg_probability']:.2%}</div>
+        </div>""", unsafe_allow_html=True)
+
+
+render_key_metrics()
 
 
 # ── Sidebar ───────────────────────────────────────────────────────
@@ -256,7 +276,8 @@ with st.sidebar:
 
     st.markdown(f"""
     <div class="sidebar-info">
-        <strong>Model:</strong> {model_info['model_type']}<br>
+        <strong>Model:</strong> {model_info['model_type']} ({model_info['version']})<br>
+        <strong>Shadow:</strong> {model_info['shadow_version'] or 'none'}<br>
         <strong>Features:</strong> {model_info['n_features']}<br>
         <strong>Threshold:</strong> {model_info['threshold']}<br>
     </div>
@@ -265,33 +286,58 @@ with st.sidebar:
     # ── Simulator Controls ────────────────────────────────────────
     st.markdown("### 🔄 Transaction Simulator")
 
-    sim_count = st.slider("Transactions to generate", 5, 200, 50, step=5)
-    sim_delay = st.slider("Delay between transactions (sec)", 0.1, 2.0, 0.3, step=0.1)
+    sim_count = st.number_input("Transactions to generate (0 = until stopped)",
+                                min_value=0, max_value=1_000_000, value=50, step=50)
+    sim_delay = st.slider("Delay between transactions (sec)", 0.0, 2.0, 0.3, step=0.1)
     fraud_ratio = st.slider("Fraud injection ratio", 0.05, 0.30, 0.10, step=0.01)
 
-    if st.button("🚀 Run Simulator", use_container_width=True, type="primary"):
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        def sim_callback(result, count):
-            progress = count / sim_count
-            progress_bar.progress(min(progress, 1.0))
-            risk_emoji = "🚨" if result["risk_level"] == "HIGH RISK" else "✅"
-            status_text.text(f"{risk_emoji} Txn #{count}: ₹{result['amount']:.2f} → {result['risk_level']}")
-
-        with st.spinner("Simulating transactions..."):
-            run_simulator(
-                db=db,
-                num_transactions=sim_count,
-                delay=sim_delay,
-                fraud_ratio=fraud_ratio,
-                callback=sim_callback,
-            )
-
-        progress_bar.progress(1.0)
-        status_text.text(f"✅ Completed {sim_count} transactions!")
-        st.success(f"Generated {sim_count} transactions!")
-        st.rerun()
+    if not simulator.running:
+        if st.button("🚀 Run Simulator", use_container_width=True, type="primary"):
+            simulator.start(num_transactions=sim_count, delay=sim_delay, fraud_ratio=fraud_ratio)
+            st.session_state.sim_count = sim_count
+            st.rerun()
+    else:
+        col_pause, col_stop = st.columns(2)
+        with col_pause:
+            if simulator.status()["state"] == "paused":
+                if st.button("▶️ Resume", use_container_width=True):
+                    simulator.resume()
+                    st.rerun()
+            elif st.button("⏸️ Pause", use_container_width=True):
+                simulator.pause()
+                st.rerun()
+        with col_stop:
+            if st.button("⏹️ Stop", use_container_width=True):
+                simulator.stop()
+                st.rerun()
+
+    @st.fragment(run_every=LIVE_REFRESH)
+    def render_simulator_status():
+        status = simulator.status()
+        if status["state"] == "idle":
+            return
+        if status["target"]:
+            st.progress(min(status["processed"] / status["target"], 1.0))
+        last = status["last"]
+        if status["state"] in ("running", "paused"):
+            label = "⏸️ Paused" if status["state"] == "paused" else "🔄 Running"
+            st.caption(f"{label}: {status['processed']:,} transactions "
+                       f"({status['rate']:,.1f}/s), {status['high_risk']:,} high risk")
+            if last:
+                risk_emoji = "🚨" if last["risk_level"] == "HIGH RISK" else "✅"
+                st.text(f"{risk_emoji} User {last['user_id']}: "
+                        f"₹{last['amount']:.2f} → {last['risk_level']}")
+        elif status["state"] == "failed":
+            st.error(f"Simulator failed after {status['processed']:,} transactions: "
+                     f"{status['error']}")
+        else:
+            st.success(f"{'Completed' if status['state'] == 'finished' else 'Stopped after'} "
+                       f"{status['processed']:,} transactions!")
+        # The run ended since this page was drawn: redraw everything once and stop polling
+        if st.session_state.simulator_running and not simulator.running:
+            st.rerun(scope="app")
+
+    render_simulator_status()
 
     st.divider()
 
@@ -299,6 +345,7 @@ with st.sidebar:
     st.markdown("### 🗃️ Database")
     if st.button("🗑️ Clear All Data", use_container_width=True):
         db.clear_all_data()
+        data.invalidate()
         st.success("Database cleared!")
         st.rerun()
 
@@ -322,79 +369,139 @@ tab1, tab2, tab3, tab4 = st.tabs([
 
 
 # ── Tab 1: Live Transactions ─────────────────────────────────────
-with tab1:
+PAGE_SIZES = [50, 100, 250, 500, 1000]
+DISPLAY_COLUMNS = ["transaction_id", "user_id", "amount", "hour", "device_id",
+                   "location", "merchant_id", "fraud_probability", "risk_level", "timestamp"]
+TABLE_COLUMN_CONFIG = {
+    "amount": st.column_config.NumberColumn("amount", format="₹%.2f"),
+    "fraud_probability": st.column_config.NumberColumn("fraud_probability", format="%.1f%%"),
+}
+
+
+def format_transactions(df):
+    """Display columns, formatted with whole-column operations (no per-row Python)."""
+    df_display = df[[c for c in DISPLAY_COLUMNS if c in df.columns]].copy()
+    df_display["fraud_probability"] = df_display["fraud_probability"] * 100
+    df_display["timestamp"] = df_display["timestamp"].astype(str).str.slice(0, 19)
+    return df_display
+
+
+def highlight_risk(frame):
+    # One style per cell, built for the whole page at once
+    row_style = np.where(frame["risk_level"].to_numpy() == "HIGH RISK",
+                         "background-color: rgba(255,71,87,0.15)", "")
+    return pd.DataFrame(np.repeat(row_style[:, None], frame.shape[1], axis=1),
+                        index=frame.index, columns=frame.columns)
+
+
+def paginate(key: str, total: int, high_risk_only: bool = False):
+    """
+    The current page of a keyset-paginated transaction table, with page controls.
+    The session keeps the cursor of every page before the current one, so
+    Newer/Older cost one page fetch each, however deep the operator has gone.
+    """
+    state = st.session_state.setdefault(key, {"cursors": [], "next": None})
+    size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_size")
+    if state.get("size") != size:
+        state.update(cursors=[], size=size)
+
+    after = state["cursors"][-1] if state["cursors"] else None
+    page, state["next"] = data.transactions_page(after, size, high_risk_only)
+
+    def newest():
+        state["cursors"].clear()
+
+    def newer():
+        state["cursors"].pop()
+
+    def older():
+        state["cursors"].append(state["next"])
+
+    col_first, col_newer, col_label, col_older = st.columns([1, 1, 2, 1])
+    with col_first:
+        st.button("⏮️ Newest", key=f"{key}_newest", on_click=newest,
+                  disabled=not state["cursors"], use_container_width=True)
+    with col_newer:
+        st.button("⬅️ Newer", key=f"{key}_newer", on_click=newer,
+                  disabled=not state["cursors"], use_container_width=True)
+    with col_label:
+        pages = max(1, -(-total // size))
+        st.caption(f"Page {len(state['cursors']) + 1:,} of {pages:,} · {total:,} transactions")
+    with col_older:
+        st.button("Older ➡️", key=f"{key}_older", on_click=older,
+                  disabled=state["next"] is None, use_container_width=True)
+    return page
+
+
+@st.fragment(run_every=LIVE_REFRESH)
+def render_live_transactions():
     st.markdown('<div class="section-header">📊 Recent Transactions</div>', unsafe_allow_html=True)
 
-    recent = db.get_recent_transactions(limit=100)
-
-    if recent:
-        df = pd.DataFrame(recent)
-        display_cols = ["transaction_id", "user_id", "amount", "hour", "device_id",
-                        "location", "merchant_id", "fraud_probability", "risk_level", "timestamp"]
-        display_cols = [c for c in display_cols if c in df.columns]
-        df_display = df[display_cols].copy()
+    df = paginate("transactions_pages", data.fraud_stats()["total_transactions"])
 
-        # Format columns
-        df_display["amount"] = df_display["amount"].apply(lambda x: f"₹{x:,.2f}")
-        df_display["fraud_probability"] = df_display["fraud_probability"].apply(lambda x: f"{x:.1%}")
-        df_display["timestamp"] = df_display["timestamp"].apply(
-            lambda x: x[:19] if len(str(x)) > 19 else x
-        )
-
-        # Color-code risk level
-        def highlight_risk(row):
-            if row["risk_level"] == "HIGH RISK":
-                return ["background-color: rgba(255,71,87,0.15)"] * len(row)
-            return [""] * len(row)
-
-        styled_df = df_display.style.apply(highlight_risk, axis=1)
-        st.dataframe(styled_df, use_container_width=True, height=500)
+    if not df.empty:
+        styled_df = format_transactions(df).style.apply(highlight_risk, axis=None)
+        st.dataframe(styled_df, use_container_width=True, height=500,
+                     column_config=TABLE_COLUMN_CONFIG)
 
         # Quick stats
-        high_count = len(df[df["risk_level"] == "HIGH RISK"])
-        low_count = len(df[df["risk_level"] == "LOW RISK"])
+        high_count = int((df["risk_level"] == "HIGH RISK").sum())
+        low_count = int((df["risk_level"] == "LOW RISK").sum())
         col1, col2 = st.columns(2)
         with col1:
-            st.info(f"✅ Low Risk: {low_count} transactions")
+            st.info(f"✅ Low Risk: {low_count} transactions on this page")
         with col2:
-            st.error(f"🚨 High Risk: {high_count} transactions")
+            st.error(f"🚨 High Risk: {high_count} transactions on this page")
     else:
         st.info("No transactions yet. Use the simulator or submit a manual transaction to get started!")
 
 
+with tab1:
+    render_live_transactions()
+
+
 # ── Tab 2: Fraud Alerts ──────────────────────────────────────────
-with tab2:
+def alert_card(alert: dict) -> str:
+    prob = alert.get("fraud_probability", 0)
+    explanation = alert.get("explanation", "No explanation available")
+    ts = str(alert.get("timestamp", ""))[:19]
+    return f"""
+    <div class="fraud-alert">
+        <div class="alert-header">
+            🚨 {alert['transaction_id']} — Fraud Probability: {prob:.1%}
+        </div>
+        <div class="alert-details">
+            <strong>User:</strong> {alert['user_id']} &nbsp;|&nbsp;
+            <strong>Amount:</strong> ₹{alert['amount']:,.2f} &nbsp;|&nbsp;
+            <strong>Location:</strong> {alert['location']} &nbsp;|&nbsp;
+            <strong>Device:</strong> {alert['device_id']} &nbsp;|&nbsp;
+            <strong>Merchant:</strong> {alert['merchant_id']} &nbsp;|&nbsp;
+            <strong>Time:</strong> {ts}<br><br>
+            <pre style="color: rgba(255,255,255,0.8); font-family: 'Inter', monospace; font-size: 0.78rem; white-space: pre-wrap;">{explanation}</pre>
+        </div>
+    </div>
+    """
+
+
+@st.fragment(run_every=LIVE_REFRESH)
+def render_fraud_alerts():
     st.markdown('<div class="section-header">🚨 Fraud Alerts — High Risk Transactions</div>',
                 unsafe_allow_html=True)
 
-    alerts = db.get_fraud_alerts(limit=30)
-
-    if alerts:
-        for alert in alerts:
-            prob = alert.get("fraud_probability", 0)
-            explanation = alert.get("explanation", "No explanation available")
-            ts = str(alert.get("timestamp", ""))[:19]
+    alerts = paginate("alert_pages", data.fraud_stats()["high_risk_count"], high_risk_only=True)
 
-            st.markdown(f"""
-            <div class="fraud-alert">
-                <div class="alert-header">
-                    🚨 {alert['transaction_id']} — Fraud Probability: {prob:.1%}
-                </div>
-                <div class="alert-details">
-                    <strong>User:</strong> {alert['user_id']} &nbsp;|&nbsp;
-                    <strong>Amount:</strong> ₹{alert['amount']:,.2f} &nbsp;|&nbsp;
-                    <strong>Location:</strong> {alert['location']} &nbsp;|&nbsp;
-                    <strong>Device:</strong> {alert['device_id']} &nbsp;|&nbsp;
-                    <strong>Merchant:</strong> {alert['merchant_id']} &nbsp;|&nbsp;
-                    <strong>Time:</strong> {ts}<br><br>
-                    <pre style="color: rgba(255,255,255,0.8); font-family: 'Inter', monospace; font-size: 0.78rem; white-space: pre-wrap;">{explanation}</pre>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+    if not alerts.empty:
+        # The whole page as one element instead of one per alert
+        st.markdown("".join(alert_card(alert) for alert in alerts.to_dict("records")),
+                    unsafe_allow_html=True)
     else:
         st.info("No high-risk transactions detected yet. Run the simulator to generate some!")
 
 
+with tab2:
+    render_fraud_alerts()
+
+
 # ── Tab 3: Manual Transaction Entry ──────────────────────────────
 with tab3:
     st.markdown('<div class="section-header">📝 Submit a Transaction for Analysis</div>',
@@ -432,6 +539,7 @@ with tab3:
         }
 
         result = process_transaction(db, transaction)
+        data.invalidate()
 
         # Display result
         st.divider()
@@ -469,125 +577,112 @@ with tab3:
 
 
 # ── Tab 4: Analytics ──────────────────────────────────────────────
+# Figures are built once per data version and shared by every viewer
+def style_figure(fig, **layout):
+    fig.update_layout(
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        font_color="white",
+        title_font_size=16,
+        **layout,
+    )
+    return fig
+
+
+def build_probability_figure():
+    return style_figure(px.histogram(
+        data.recent_transactions(limit=500), x="fraud_probability", nbins=30,
+        color="risk_level",
+        color_discrete_map={"HIGH RISK": "#ff4757", "LOW RISK": "#2ed573"},
+        title="Fraud Probability Distribution",
+        labels={"fraud_probability": "Fraud Probability", "count": "Count"},
+    ), bargap=0.05)
+
+
+def build_hourly_figure():
+    hourly = data.hourly_fraud_distribution()
+    if not hourly:
+        return None
+    df_hourly = pd.DataFrame(hourly)
+    fig_hourly = go.Figure()
+    fig_hourly.add_trace(go.Bar(
+        x=df_hourly["hour"], y=df_hourly["total"],
+        name="Total", marker_color="rgba(0,210,255,0.5)",
+    ))
+    fig_hourly.add_trace(go.Bar(
+        x=df_hourly["hour"], y=df_hourly["fraud_count"],
+        name="Fraud", marker_color="#ff4757",
+    ))
+    return style_figure(fig_hourly, title="Transactions by Hour", barmode="overlay",
+                        xaxis_title="Hour of Day", yaxis_title="Count")
+
+
+def build_user_risk_figure():
+    user_risk = data.user_risk_summary()
+    if not user_risk:
+        return None
+    return style_figure(px.bar(
+        pd.DataFrame(user_risk), x="user_id", y="avg_risk",
+        color="fraud_count",
+        color_continuous_scale=["#2ed573", "#ffa502", "#ff4757"],
+        title="Average Risk Score by User",
+        labels={"avg_risk": "Avg Risk Score", "user_id": "User ID",
+                "fraud_count": "Fraud Count"},
+    ))
+
+
+def build_location_figure():
+    return style_figure(px.bar(
+        pd.DataFrame(data.location_fraud_distribution()), x="location", y=["total", "high_risk"],
+        barmode="group",
+        color_discrete_sequence=["#00d2ff", "#ff4757"],
+        title="Fraud by Location",
+    ))
+
+
+def build_merchant_figure():
+    return style_figure(px.pie(
+        pd.DataFrame(data.merchant_fraud_distribution()), names="merchant_id", values="high_risk",
+        title="Fraud Alerts by Merchant",
+        color_discrete_sequence=px.colors.qualitative.Set2,
+        hole=0.4,
+    ))
+
+
 with tab4:
     st.markdown('<div class="section-header">📈 Fraud Analytics Dashboard</div>',
                 unsafe_allow_html=True)
 
-    recent_all = db.get_recent_transactions(limit=500)
-
-    if recent_all:
-        df_all = pd.DataFrame(recent_all)
-
+    if not data.recent_transactions(limit=500).empty:
         # ── Fraud Probability Distribution ────────────────────────
         col1, col2 = st.columns(2)
 
         with col1:
-            fig_hist = px.histogram(
-                df_all, x="fraud_probability", nbins=30,
-                color="risk_level",
-                color_discrete_map={"HIGH RISK": "#ff4757", "LOW RISK": "#2ed573"},
-                title="Fraud Probability Distribution",
-                labels={"fraud_probability": "Fraud Probability", "count": "Count"},
-            )
-            fig_hist.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)",
-                paper_bgcolor="rgba(0,0,0,0)",
-                font_color="white",
-                title_font_size=16,
-                bargap=0.05,
-            )
-            st.plotly_chart(fig_hist, use_container_width=True)
+            st.plotly_chart(data.memo("fig_probability", build_probability_figure),
+                            use_container_width=True)
 
         # ── Hourly Pattern ────────────────────────────────────────
         with col2:
-            hourly = db.get_hourly_fraud_distribution()
-            if hourly:
-                df_hourly = pd.DataFrame(hourly)
-                fig_hourly = go.Figure()
-                fig_hourly.add_trace(go.Bar(
-                    x=df_hourly["hour"], y=df_hourly["total"],
-                    name="Total", marker_color="rgba(0,210,255,0.5)",
-                ))
-                fig_hourly.add_trace(go.Bar(
-                    x=df_hourly["hour"], y=df_hourly["fraud_count"],
-                    name="Fraud", marker_color="#ff4757",
-                ))
-                fig_hourly.update_layout(
-                    title="Transactions by Hour",
-                    barmode="overlay",
-                    plot_bgcolor="rgba(0,0,0,0)",
-                    paper_bgcolor="rgba(0,0,0,0)",
-                    font_color="white",
-                    title_font_size=16,
-                    xaxis_title="Hour of Day",
-                    yaxis_title="Count",
-                )
+            fig_hourly = data.memo("fig_hourly", build_hourly_figure)
+            if fig_hourly is not None:
                 st.plotly_chart(fig_hourly, use_container_width=True)
 
         # ── Per-User Risk ─────────────────────────────────────────
         st.markdown("#### 👤 Per-User Risk Summary")
-        user_risk = db.get_user_risk_summary()
-        if user_risk:
-            df_user = pd.DataFrame(user_risk)
-            fig_user = px.bar(
-                df_user, x="user_id", y="avg_risk",
-                color="fraud_count",
-                color_continuous_scale=["#2ed573", "#ffa502", "#ff4757"],
-                title="Average Risk Score by User",
-                labels={"avg_risk": "Avg Risk Score", "user_id": "User ID",
-                        "fraud_count": "Fraud Count"},
-            )
-            fig_user.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)",
-                paper_bgcolor="rgba(0,0,0,0)",
-                font_color="white",
-                title_font_size=16,
-            )
+        fig_user = data.memo("fig_user_risk", build_user_risk_figure)
+        if fig_user is not None:
             st.plotly_chart(fig_user, use_container_width=True)
 
         # ── Location-based fraud ──────────────────────────────────
         col3, col4 = st.columns(2)
 
         with col3:
-            location_fraud = df_all.groupby("location").agg(
-                total=("transaction_id", "count"),
-                high_risk=("risk_level", lambda x: (x == "HIGH RISK").sum()),
-                avg_prob=("fraud_probability", "mean"),
-            ).reset_index()
-
-            fig_loc = px.bar(
-                location_fraud, x="location", y=["total", "high_risk"],
-                barmode="group",
-                color_discrete_sequence=["#00d2ff", "#ff4757"],
-                title="Fraud by Location",
-            )
-            fig_loc.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)",
-                paper_bgcolor="rgba(0,0,0,0)",
-                font_color="white",
-                title_font_size=16,
-            )
-            st.plotly_chart(fig_loc, use_container_width=True)
+            st.plotly_chart(data.memo("fig_location", build_location_figure),
+                            use_container_width=True)
 
         with col4:
-            merchant_fraud = df_all.groupby("merchant_id").agg(
-                total=("transaction_id", "count"),
-                high_risk=("risk_level", lambda x: (x == "HIGH RISK").sum()),
-            ).reset_index()
-
-            fig_merch = px.pie(
-                merchant_fraud, names="merchant_id", values="high_risk",
-                title="Fraud Alerts by Merchant",
-                color_discrete_sequence=px.colors.qualitative.Set2,
-                hole=0.4,
-            )
-            fig_merch.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)",
-                paper_bgcolor="rgba(0,0,0,0)",
-                font_color="white",
-                title_font_size=16,
-            )
-            st.plotly_chart(fig_merch, use_container_width=True)
+            st.plotly_chart(data.memo("fig_merchant", build_merchant_figure),
+                            use_container_width=True)
     else:
         st.info("No data available yet. Run the simulator to generate transaction data for analytics!")
 
@@ -0,0 +1,255 @@
+"""
+dashboard_data.py — Shared, incrementally refreshed query results for the dashboard.
+One instance serves every viewer: results are reused for `ttl` seconds, then kept
+as long as the database's data version is unchanged. When new transactions
+arrive, only rows newer than the latest cached one are fetched and prepended.
+If the database has a live feed, records scored in this process are applied
+from it as they are published, without reading SQLite at all.
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+from src.database_manager import DatabaseManager
+
+# Columns of a stored transaction, in table order
+STORED_COLUMNS = ["transaction_id", "user_id", "amount", "hour", "device_id", "location",
+                  "merchant_id", "fraud_probability", "risk_level", "explanation", "timestamp",
+                  "model_version"]
+
+
+class DashboardData:
+    """
+    Cached dashboard queries over a DatabaseManager.
+
+    Every read first calls refresh(). Within `ttl` seconds of the last check it
+    returns cached results without touching SQLite. After that it reads the
+    data version (one primary-key lookup). If the version is unchanged the cache
+    stays. If it has changed, the aggregates are reloaded, and the recent and
+    alert frames are updated incrementally when the new rows account for the
+    whole change, or reloaded otherwise (deletes, replaced rows, backfills).
+
+    With `db.live_feed`, every read also applies the records published since
+    the last one, and the version check only has to catch writes made outside
+    the feed (other processes), so `ttl` can be much longer.
+    """
+
+    def __init__(self, db: DatabaseManager, ttl: float = 1.0, recent_rows: int = 500,
+                 alert_rows: int = 100):
+        """
+        Args:
+            db: database to read
+            ttl: seconds results are served without checking the data version
+            recent_rows: most recent transactions kept in memory
+            alert_rows: most recent high-risk transactions kept in memory
+        """
+        self.db = db
+        self.ttl = ttl
+        self.recent_rows = recent_rows
+        self.alert_rows = alert_rows
+        self._lock = threading.RLock()
+        self._checked = None  # perf_counter time of the last version check
+        self._version = None
+        self._cache = {}      # query or derived-value name -> result for _version
+        self._recent = None
+        self._alerts = None
+        self._subscription = db.live_feed.subscribe() if db.live_feed is not None else None
+        self._fed = (0, 0)  # (records, high-risk records) applied from the feed since the last check
+        self.stats = {"checks": 0, "reloads": 0, "incremental": 0, "rows_fetched": 0, "fed": 0}
+
+    def invalidate(self):
+        """Check the data version on the next read (e.g. right after a write)."""
+        with self._lock:
+            self._checked = None
+
+    def refresh(self) -> tuple:
+        """Bring the cache up to date if the TTL has passed. Returns the data version."""
+        with self._lock:
+            if self._subscription is not None and self._recent is not None:
+                self._apply_feed()
+            now = time.perf_counter()
+            if self._checked is not None and now - self._checked < self.ttl:
+                return self._version
+            self._checked = now
+            self.stats["checks"] += 1
+            version = self.db.get_data_version()
+            previous, fed = self._version, self._fed
+            self._fed = (0, 0)
+            if version != previous:
+                self._version = version
+                self._cache = {}
+                if previous is not None:
+                    # What the feed already applied doesn't need fetching again
+                    previous = (previous[0] + fed[0], previous[1] + fed[1])
+                    if version[:2] == previous:
+                        return version
+                self._update_frames(previous, version)
+            return version
+
+    def _apply_feed(self):
+        records = self._subscription.poll()
+        if self._subscription.missed:
+            # Fell behind the ring buffer: reload everything on this read
+            self._subscription.missed = False
+            self._checked, self._version = None, None
+            return
+        known = set(self._recent["transaction_id"])
+        records = [r for r in records if r["transaction_id"] not in known]
+        if not records:
+            return
+        high_risk = [r for r in records if r["risk_level"] == "HIGH RISK"]
+        self._recent = self._merge(self._recent, records, self.recent_rows)
+        self._alerts = self._merge(self._alerts, high_risk, self.alert_rows)
+        self._fed = (self._fed[0] + len(records), self._fed[1] + len(high_risk))
+        self.stats["fed"] += len(records)
+
+        stats = self._cache.get("fraud_stats")
+        self._cache = {name: value for name, value in self._cache.items()
+                       if name in ("hourly", "user_risk", "location", "merchant")}
+        if stats is not None:
+            self._cache["fraud_stats"] = _add_to_stats(stats, records, high_risk)
+
+    @staticmethod
+    def _merge(frame: pd.DataFrame, records: list, keep: int) -> pd.DataFrame:
+        """The newest `keep` of `frame` plus `records`, in page order."""
+        if not records:
+            return frame
+        added = pd.DataFrame(records).reindex(columns=frame.columns)
+        if len(frame) >= keep:
+            # Older than everything kept: rows in between may not be cached
+            added = added[added["timestamp"] > frame["timestamp"].iloc[-1]]
+        merged = pd.concat([added, frame], ignore_index=True)
+        return merged.sort_values(["timestamp", "transaction_id"], ascending=False,
+                                  ignore_index=True).head(keep)
+
+    def _update_frames(self, previous: tuple, version: tuple):
+        if previous is not None and self._recent is not None:
+            added, added_high_risk = version[0] - previous[0], version[1] - previous[1]
+            recent = self._fetch_new(self._recent, added, False)
+            alerts = self._fetch_new(self._alerts, added_high_risk, True)
+            if recent is not None and alerts is not None:
+                self._recent = recent.head(self.recent_rows)
+                self._alerts = alerts.head(self.alert_rows)
+                self.stats["incremental"] += 1
+                return
+
+        recent = self.db.get_recent_transactions(limit=self.recent_rows)
+        alerts = self.db.get_fraud_alerts(limit=self.alert_rows)
+        self.stats["rows_fetched"] += len(recent) + len(alerts)
+        self.stats["reloads"] += 1
+        self._recent = pd.DataFrame(recent, columns=STORED_COLUMNS)
+        self._alerts = pd.DataFrame(alerts, columns=STORED_COLUMNS)
+
+    def _fetch_new(self, frame: pd.DataFrame, added: int, high_risk_only: bool):
+        """`frame` with rows added since it was loaded prepended, or None if that can't be done."""
+        if added == 0:
+            return frame
+        if added < 0 or frame.empty:
+            return None
+        latest = frame["timestamp"].iloc[0]
+        rows = self.db.get_transactions_since(latest, limit=added + len(frame),
+                                              high_risk_only=high_risk_only)
+        self.stats["rows_fetched"] += len(rows)
+        known = set(frame["transaction_id"][frame["timestamp"] == latest])
+        rows = [row for row in rows if row["transaction_id"] not in known]
+        if len(rows) != added:
+            return None  # some of the change is older than the cached rows, or not an insert
+        added = pd.DataFrame(rows, columns=frame.columns)
+        merged = pd.concat([added, frame], ignore_index=True)
+        if (added["timestamp"] == latest).any():
+            # A new row tied with cached ones on timestamp: restore the ID order among them
+            merged = merged.sort_values(["timestamp", "transaction_id"], ascending=False,
+                                        ignore_index=True)
+        return merged
+
+    def _cached(self, name: str, build):
+        with self._lock:
+            if name not in self._cache:
+                self._cache[name] = build()
+            return self._cache[name]
+
+    # ── Reads ─────────────────────────────────────────────────────
+
+    def memo(self, name: str, build):
+        """
+        `build()`, computed once per data version and shared by every viewer.
+        Use it for DataFrames and figures derived from the cached queries.
+        """
+        self.refresh()
+        return self._cached(name, build)
+
+    def fraud_stats(self) -> dict:
+        self.refresh()
+        return self._cached("fraud_stats", self.db.get_fraud_stats)
+
+    def recent_transactions(self, limit: int = 100) -> pd.DataFrame:
+        """Newest `limit` transactions (up to recent_rows), newest first."""
+        self.refresh()
+        with self._lock:
+            return self._recent.head(min(limit, self.recent_rows))
+
+    def fraud_alerts(self, limit: int = 30) -> pd.DataFrame:
+        """Newest `limit` high-risk transactions (up to alert_rows), newest first."""
+        self.refresh()
+        with self._lock:
+            return self._alerts.head(min(limit, self.alert_rows))
+
+    def transactions_page(self, after: tuple = None, limit: int = 100,
+                          high_risk_only: bool = False) -> tuple:
+        """
+        A page of DatabaseManager.get_transactions_page as (DataFrame, next cursor).
+        The newest page comes from the cached frames when it fits in them; older
+        pages are read by cursor and cached until the data version changes.
+        """
+        version = self.refresh()
+        if after is None:
+            with self._lock:
+                frame, kept = ((self._alerts, self.alert_rows) if high_risk_only
+                               else (self._recent, self.recent_rows))
+                if limit <= kept:
+                    page = frame.head(limit)
+                    total = version[1] if high_risk_only else version[0]
+                    if total <= limit or len(page) < limit:
+                        return page, None
+                    last = page.iloc[-1]
+                    return page, (last["timestamp"], last["transaction_id"])
+
+        def load():
+            rows, cursor = self.db.get_transactions_page(after, limit, high_risk_only)
+            return pd.DataFrame(rows), cursor
+        return self._cached(("page", after, limit, high_risk_only), load)
+
+    def hourly_fraud_distribution(self) -> list:
+        self.refresh()
+        return self._cached("hourly", self.db.get_hourly_fraud_distribution)
+
+    def user_risk_summary(self) -> list:
+        self.refresh()
+        return self._cached("user_risk", self.db.get_user_risk_summary)
+
+    def location_fraud_distribution(self) -> list:
+        self.refresh()
+        return self._cached("location", self.db.get_location_fraud_distribution)
+
+    def merchant_fraud_distribution(self) -> list:
+        self.refresh()
+        return self._cached("merchant", self.db.get_merchant_fraud_distribution)
+
+
+def _add_to_stats(stats: dict, records: list, high_risk: list) -> dict:
+    """get_fraud_stats() after `records` were added, without querying."""
+    total = stats["total_transactions"] + len(records)
+    high = stats["high_risk_count"] + len(high_risk)
+    probability_sum = (stats["avg_probability"] * stats["total_transactions"]
+                       + sum(r["fraud_probability"] for r in records))
+    high_probability_sum = (stats["avg_fraud_probability"] * stats["high_risk_count"]
+                            + sum(r["fraud_probability"] for r in high_risk))
+    return {
+        "total_transactions": total,
+        "high_risk_count": high,
+        "fraud_rate": (high / total * 100) if total > 0 else 0.0,
+        "avg_probability": probability_sum / total if total else 0.0,
+        "avg_fraud_probability": high_probability_sum / high if high else 0.0,
+    }
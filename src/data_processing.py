@@ -3,7 +3,8 @@ data_processing.py — Real-time behavioral feature engineering.
 Computes features from raw transaction + user profile to match the trained model's 24 columns.
 """
 
-import pandas as pd
+from operator import itemgetter
+
 import numpy as np
 
 # Known categorical values from the training data
@@ -25,6 +26,84 @@ FEATURE_COLUMNS = [
     "merchant_id_gpay@upi", "merchant_id_paytm@upi", "merchant_id_phonepe@upi",
 ]
 
+# Columns that compute_behavioral_features emits as floats (everything else is int)
+_FLOAT_COLUMNS = frozenset({"amount", "avg_user_amount", "amount_deviation"})
+
+_DEFAULT_PROFILE = {
+    "avg_amount": 0.0, "last_device": "", "usual_location": "", "transaction_count": 0,
+}
+
+
+class CategoryEncoder:
+    """
+    One-hot encoding through column offsets computed once.
+
+    For every categorical field, each known value maps straight to its column
+    in the feature layout, so encoding a transaction costs one dict lookup and
+    one index assignment per field, however large the vocabularies grow.
+    Unknown values encode to no column (all zeros), as in training.
+
+    active_columns() is the sparse form: one column index per field (-1 for
+    an unknown value) instead of a dense row with a 1 among thousands of
+    zeros. CompiledScorer.score_sparse scores it directly.
+    """
+
+    def __init__(self, feature_columns: list, vocabularies: dict):
+        """
+        Args:
+            feature_columns: feature layout; "<field>_<value>" names the one-hot columns
+            vocabularies: field -> known values, e.g. {"merchant_id": MERCHANTS}
+        """
+        self.fields = tuple(vocabularies)
+        position = {column: i for i, column in enumerate(feature_columns)}
+        # field -> value -> (column index, column name)
+        self._columns = {
+            field: {value: (position[f"{field}_{value}"], f"{field}_{value}") for value in values}
+            for field, values in vocabularies.items()
+        }
+        self._lookups = [(field, {value: i for value, (i, _) in columns.items()}.get)
+                         for field, columns in self._columns.items()]
+        one_hot = sorted(i for columns in self._columns.values() for i, _ in columns.values())
+        self.one_hot_columns = np.array(one_hot, dtype=np.intp)
+        self.dense_columns = np.array([i for i in range(len(feature_columns)) if i not in one_hot],
+                                      dtype=np.intp)
+        # Non-categorical values of a feature dict, in dense_columns order
+        self.dense_values = itemgetter(*(feature_columns[i] for i in self.dense_columns))
+        # Zero for every one-hot column, in layout order (the template of a feature dict)
+        self.zeros = {feature_columns[i]: 0 for i in one_hot}
+
+    def names(self, record: dict) -> list:
+        """Feature names of the one-hot columns `record` sets."""
+        return [entry[1] for field, columns in self._columns.items()
+                if (entry := columns.get(str(record[field]))) is not None]
+
+    def active_columns(self, records: list) -> np.ndarray:
+        """(N, fields) column set by each record for each field, -1 where the value is unknown."""
+        active = np.empty((len(records), len(self.fields)), dtype=np.intp)
+        for j, (field, lookup) in enumerate(self._lookups):
+            active[:, j] = [lookup(str(record[field]), -1) for record in records]
+        return active
+
+    def encode_row(self, row: np.ndarray, record: dict) -> np.ndarray:
+        """Set the one-hot columns of `record` in a zeroed feature `row`, by column offset."""
+        for field, lookup in self._lookups:
+            i = lookup(str(record[field]))
+            if i is not None:
+                row[i] = 1.0
+        return row
+
+    def encode_rows(self, matrix: np.ndarray, records: list) -> np.ndarray:
+        """Set the one-hot columns of each record in the matching row of a zeroed `matrix`."""
+        active = self.active_columns(records)
+        rows = np.broadcast_to(np.arange(len(records))[:, None], active.shape)
+        known = active >= 0
+        matrix[rows[known], active[known]] = 1.0
+        return matrix
+
+
+ENCODER = CategoryEncoder(FEATURE_COLUMNS, {"location": LOCATIONS, "device_id": DEVICES,
+                                            "merchant_id": MERCHANTS})
+
 
 def compute_behavioral_features(transaction: dict, user_profile: dict,
                                  transaction_velocity: int = 1) -> dict:
@@ -44,7 +123,6 @@ def compute_behavioral_features(transaction: dict, user_profile: dict,
     user_id = int(transaction["user_id"])
     device_id = str(transaction["device_id"])
     location = str(transaction["location"])
-    merchant_id = str(transaction["merchant_id"])
 
     avg_amount = float(user_profile.get("avg_amount", 0.0))
     last_device = str(user_profile.get("last_device", ""))
@@ -59,11 +137,6 @@ def compute_behavioral_features(transaction: dict, user_profile: dict,
     is_new_merchant = 0  # Conservative: flag only when specifically injected
     velocity = max(transaction_velocity, 1)
 
-    # ── One-hot encoding ──────────────────────────────────────────
-    location_ohe = {f"location_{loc}": (1 if location == loc else 0) for loc in LOCATIONS}
-    device_ohe = {f"device_id_{dev}": (1 if device_id == dev else 0) for dev in DEVICES}
-    merchant_ohe = {f"merchant_id_{m}": (1 if merchant_id == m else 0) for m in MERCHANTS}
-
     features = {
         "amount": amount,
         "hour": hour,
@@ -75,19 +148,135 @@ def compute_behavioral_features(transaction: dict, user_profile: dict,
         "location_change_flag": location_change_flag,
         "is_new_merchant": is_new_merchant,
         "transaction_velocity": velocity,
-        **location_ohe,
-        **device_ohe,
-        **merchant_ohe,
+        **ENCODER.zeros,
     }
 
+    # ── One-hot encoding ──────────────────────────────────────────
+    for name in ENCODER.names(transaction):
+        features[name] = 1
+
     return features
 
 
-def build_feature_dataframe(features: dict) -> pd.DataFrame:
+def compute_feature_matrix(transactions: list, user_profiles: dict,
+                           velocities: dict = None) -> np.ndarray:
+    """
+    Compute behavioral features for many transactions at once.
+
+    Produces the same values as compute_behavioral_features, laid out as an
+    (N, 24) float64 matrix in FEATURE_COLUMNS order so the whole batch can be
+    scaled and scored in a single call.
+
+    Args:
+        transactions: list of transaction dicts
+        user_profiles: dict mapping user_id -> profile dict
+        velocities: dict mapping user_id -> velocity count
+
+    Returns:
+        numpy array of shape (len(transactions), len(FEATURE_COLUMNS))
+    """
+    velocities = velocities or {}
+    profiles = [user_profiles.get(txn["user_id"], _DEFAULT_PROFILE) for txn in transactions]
+    row_velocities = [velocities.get(txn["user_id"], 1) for txn in transactions]
+    return compute_feature_rows(transactions, profiles, row_velocities)
+
+
+def compute_feature_rows(transactions: list, profiles: list, velocities: list) -> np.ndarray:
+    """
+    Like compute_feature_matrix, but with one profile and one velocity per
+    transaction rather than per user — for batches where the same user's
+    profile changes between rows.
+    """
+    matrix = np.zeros((len(transactions), len(FEATURE_COLUMNS)), dtype=np.float64)
+    if not transactions:
+        return matrix
+    _fill_dense_features(matrix, transactions, profiles, velocities)
+    return ENCODER.encode_rows(matrix, transactions)
+
+
+def compute_sparse_feature_rows(transactions: list, profiles: list, velocities: list) -> tuple:
+    """
+    compute_feature_rows in sparse form, for vocabularies too large for dense rows.
+
+    Returns:
+        (dense, active): the (N, 10) non-categorical features, in
+        ENCODER.dense_columns order, and ENCODER.active_columns(transactions)
+    """
+    dense = np.zeros((len(transactions), len(ENCODER.dense_columns)), dtype=np.float64)
+    if transactions:
+        _fill_dense_features(dense, transactions, profiles, velocities)
+    return dense, ENCODER.active_columns(transactions)
+
+
+def _fill_dense_features(matrix: np.ndarray, transactions: list, profiles: list,
+                         velocities: list):
+    """Write the non-categorical features (the first ten columns) of each transaction."""
+    n = len(transactions)
+
+    amount = np.fromiter((float(t["amount"]) for t in transactions), dtype=np.float64, count=n)
+    hour = np.fromiter((int(t["hour"]) for t in transactions), dtype=np.int64, count=n)
+    avg_amount = np.fromiter((float(p.get("avg_amount", 0.0)) for p in profiles),
+                             dtype=np.float64, count=n)
+
+    # ── Behavioral features ───────────────────────────────────────
+    deviation = np.where(avg_amount > 0,
+                         np.abs(amount - avg_amount) / np.maximum(avg_amount, 1.0), 0.0)
+    # Python's round() is correctly rounded; np.round is not, and the batch
+    # path must reproduce the single-transaction values bit for bit.
+    deviation = np.array([round(v, 4) for v in deviation.tolist()], dtype=np.float64)
+
+    new_device = np.empty(n, dtype=np.float64)
+    location_change = np.empty(n, dtype=np.float64)
+    velocity = np.empty(n, dtype=np.float64)
+    for i, (txn, profile, txn_velocity) in enumerate(zip(transactions, profiles, velocities)):
+        device_id = str(txn["device_id"])
+        location = str(txn["location"])
+        last_device = str(profile.get("last_device", ""))
+        usual_location = str(profile.get("usual_location", ""))
+        new_device[i] = 1 if (last_device != "" and device_id != last_device) else 0
+        location_change[i] = 1 if (usual_location != "" and location != usual_location) else 0
+        velocity[i] = max(txn_velocity, 1)
+
+    matrix[:, 0] = amount
+    matrix[:, 1] = hour
+    matrix[:, 2] = np.fromiter((int(t["user_id"]) for t in transactions), dtype=np.int64, count=n)
+    matrix[:, 3] = avg_amount
+    matrix[:, 4] = deviation
+    matrix[:, 5] = (hour >= 0) & (hour <= 6)
+    matrix[:, 6] = new_device
+    matrix[:, 7] = location_change
+    # Column 8 (is_new_merchant) stays 0, as in the single-transaction path
+    matrix[:, 9] = velocity
+
+
+def feature_row_to_dict(row) -> dict:
+    """Convert one row of a feature matrix back to the dict produced by compute_behavioral_features."""
+    values = row.tolist()
+    return {
+        col: (val if col in _FLOAT_COLUMNS else int(val))
+        for col, val in zip(FEATURE_COLUMNS, values)
+    }
+
+
+def feature_rows_to_dicts(matrix: np.ndarray) -> list:
+    """
+    feature_row_to_dict for every row of a feature matrix. Converts column by
+    column (one tolist() per column) instead of checking each cell's type, so
+    turning the batch back into dicts doesn't outweigh scoring it in one go.
+    """
+    columns = [matrix[:, i].tolist() if col in _FLOAT_COLUMNS
+               else matrix[:, i].astype(np.int64).tolist()
+               for i, col in enumerate(FEATURE_COLUMNS)]
+    return [dict(zip(FEATURE_COLUMNS, values)) for values in zip(*columns)]
+
+
+def build_feature_dataframe(features: dict) -> "pd.DataFrame":
     """
     Convert feature dict to a DataFrame aligned to the model's expected columns.
     Missing columns get 0, extra columns are dropped.
     """
+    import pandas as pd  # only the sklearn fallback path needs pandas
+
     df = pd.DataFrame([features])
     # Ensure exact column order and fill any missing columns with 0
     for col in FEATURE_COLUMNS:
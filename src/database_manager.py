@@ -3,56 +3,245 @@ database_manager.py — SQLite backend for the fraud detection system.
 Manages transactions table and user behavioral profiles.
 """
 
+import atexit
+import re
 import sqlite3
 import os
+import threading
 from datetime import datetime, timedelta
 from contextlib import contextmanager
 
+from src.compact_storage import CODECS, CompactCodec, StandardCodec
+from src.live_feed import LiveFeed
+from src.partitions import GRANULARITIES, partition_period, read_archive, write_archive
+from src.profile_cache import ProfileCache
+from src.timestamps import iso_to_micros, micros_to_iso
+from src.velocity_tracker import VelocityTracker
+
 DB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database")
 DB_PATH = os.path.join(DB_DIR, "fraud_detection.db")
 
 
+# Bumped whenever _migrate learns a new step
+SCHEMA_VERSION = 2
+
+# SQLite's default bound-parameter limit is 999 on older builds
+_MAX_QUERY_PARAMS = 500
+
+
+def _chunks(items, size: int):
+    """Yield successive lists of at most `size` items from any iterable."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def velocity_window_start(current_time: str, window_hours: int) -> str:
+    """ISO timestamp `window_hours` before `current_time` ("" if it can't be parsed)."""
+    try:
+        dt = datetime.fromisoformat(current_time)
+        return (dt - timedelta(hours=window_hours)).isoformat()
+    except (ValueError, TypeError):
+        return ""
+
+
+# Analytics rollups: (table, transactions column it groups by). Each table holds
+# total, fraud_count, probability_sum and probability_count per key.
+_ROLLUPS = (
+    ("rollup_hourly", "hour"),
+    ("rollup_user", "user_id"),
+    ("rollup_location", "location"),
+    ("rollup_merchant", "merchant_id"),
+)
+# EXPLAIN QUERY PLAN line for a table scan of transactions that uses no index
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?transactions(_p\d+)?\b(?!.*\bUSING\b)")
+
+_ROLLUP_KEY_TYPES = {"hour": "INTEGER", "user_id": "INTEGER"}
+
+
 class DatabaseManager:
     """Manages SQLite database for transactions and user profiles."""
 
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, persistent_connections: bool = True,
+                 journal_mode: str = "WAL", synchronous: str = "NORMAL",
+                 cache_size_kb: int = 16384, busy_timeout_ms: int = 5000,
+                 profile_cache_size: int = 0, profile_flush_interval: float = 1.0,
+                 profile_flush_threshold: int = 1000, velocity_windows=None,
+                 storage: str = None, partition_by: str = None,
+                 retention_days: int = None, archive_dir: str = None,
+                 live_feed_size: int = 0):
+        """
+        Args:
+            db_path: SQLite file path (defaults to database/fraud_detection.db)
+            persistent_connections: keep one open connection per thread instead of
+                connecting and closing on every call
+            journal_mode: SQLite journal mode; WAL lets readers run alongside a writer
+            synchronous: SQLite synchronous level; NORMAL is durable under WAL
+                without an fsync on every commit
+            cache_size_kb: page cache size per connection
+            busy_timeout_ms: how long a connection waits on a lock before failing
+            profile_cache_size: keep up to this many user profiles in memory and
+                write them back in batches (0 = read and write SQLite directly)
+            profile_flush_interval: seconds between write-behind profile flushes
+            profile_flush_threshold: dirty-profile count that triggers an early flush
+            velocity_windows: window sizes in seconds (e.g. (600, 3600, 86400)) to
+                count in memory instead of with COUNT(*) queries; the tracker is
+                warm-started from recent transactions (None = always query SQLite)
+            storage: transactions table layout for a new database, "standard" or
+                "compact" (integer timestamps, dictionary-coded categories and
+                reason-code explanations); None = whatever the file already uses.
+                Convert an existing database with migrate_to_compact().
+            partition_by: "day" or "month" to write transactions into one table
+                per period; None = whatever the file already uses (unpartitioned
+                for a new database). Rows written before partitioning was enabled
+                stay in `transactions` until repartition() moves them.
+            retention_days: archive_partitions() archives partitions that ended
+                more than this many days ago
+            archive_dir: where archived partitions are written (defaults to an
+                `archive` directory next to the database)
+            live_feed_size: keep the last this many records scored by the pipeline
+                in an in-process LiveFeed that readers can subscribe to (0 = off)
+        """
         self.db_path = db_path or DB_PATH
+        self.persistent_connections = persistent_connections
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        if storage is not None and storage not in CODECS:
+            raise ValueError(f"storage must be one of {sorted(CODECS)}, got {storage!r}")
+        if partition_by is not None and partition_by not in GRANULARITIES:
+            raise ValueError(f"partition_by must be one of {GRANULARITIES}, got {partition_by!r}")
+        self._codec = StandardCodec()
+        self.partition_by = None
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(self.db_path), "archive")
+        # (PRAGMA schema_version it was read at, partitions newest first)
+        self._catalog = (None, [])
+
+        self._local = threading.local()
+        self._connections = {}  # thread ident -> persistent connection
+        self._connections_lock = threading.Lock()
+
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        self._init_tables()
+        self._init_tables(storage, partition_by)
+
+        self.profile_cache = None
+        if profile_cache_size > 0:
+            self.profile_cache = ProfileCache(
+                loader=self._load_user_profile,
+                writer=self._write_user_profiles,
+                max_users=profile_cache_size,
+                flush_interval=profile_flush_interval,
+                flush_threshold=profile_flush_threshold,
+                bulk_loader=self._load_user_profiles,
+            )
+            atexit.register(self.close)
+
+        self.live_feed = LiveFeed(live_feed_size) if live_feed_size > 0 else None
+
+        self.velocity_tracker = None
+        if velocity_windows:
+            self.velocity_tracker = VelocityTracker(velocity_windows)
+            self._warm_start_velocity()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection with the configured pragmas applied."""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # INSERT OR REPLACE must fire the delete triggers that keep fraud_stats exact
+        conn.execute("PRAGMA recursive_triggers = ON")
+        return conn
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        """Return this thread's persistent connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._connections_lock:
+                # Threads come and go (Streamlit reruns); drop connections of dead ones
+                alive = {t.ident for t in threading.enumerate()}
+                for ident in [i for i in self._connections if i not in alive]:
+                    self._connections.pop(ident).close()
+                # A new thread can reuse a dead one's ident before it was dropped above
+                stale = self._connections.pop(threading.get_ident(), None)
+                if stale is not None:
+                    stale.close()
+                self._connections[threading.get_ident()] = conn
+        return conn
 
     @contextmanager
     def _get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        if not self.persistent_connections:
+            conn = self._connect()
+            try:
+                yield conn
+                conn.commit()
+                self._codec.commit()
+            except Exception:
+                conn.rollback()
+                self._codec.rollback()
+                raise
+            finally:
+                conn.close()
+            return
+
+        conn = self._thread_connection()
+        # Nested calls share the outer call's transaction; only the outermost commits
+        self._local.depth += 1
         try:
             yield conn
-            conn.commit()
+            if self._local.depth == 1:
+                if conn.in_transaction:  # nothing to commit after a read
+                    conn.commit()
+                self._codec.commit()
         except Exception:
-            conn.rollback()
+            if self._local.depth == 1:
+                conn.rollback()
+                self._codec.rollback()
             raise
         finally:
-            conn.close()
+            self._local.depth -= 1
 
-    def _init_tables(self):
+    def close(self):
+        """Flush cached profiles and close all persistent connections held by this manager."""
+        if self.profile_cache is not None:
+            self.profile_cache.close()
+        with self._connections_lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _init_tables(self, storage: str = None, partition_by: str = None):
         """Create tables if they don't exist."""
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    transaction_id TEXT PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    amount REAL NOT NULL,
-                    hour INTEGER NOT NULL,
-                    device_id TEXT NOT NULL,
-                    location TEXT NOT NULL,
-                    merchant_id TEXT NOT NULL,
-                    fraud_probability REAL,
-                    risk_level TEXT,
-                    explanation TEXT,
-                    timestamp TEXT NOT NULL
+            current = self._detect_storage(cursor)
+            if current is not None and storage is not None and storage != current:
+                raise ValueError(
+                    f"{self.db_path} uses {current} storage; convert it with "
+                    f"`python -m src.db_admin compact` instead of opening it as {storage}"
                 )
-            """)
+            self._codec = CODECS[current or storage or "standard"]()
+
+            if self._codec.compact:
+                self._create_dimension_tables(cursor)
+            self._create_transactions_table(cursor)
 
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS user_profiles (
@@ -65,20 +254,516 @@ class DatabaseManager:
                 )
             """)
 
-            # Index for fast lookups
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_transactions_user
-                ON transactions(user_id)
+            self._create_transaction_indexes(cursor)
+            self._migrate(cursor)
+            self._init_partitioning(cursor, partition_by)
+
+            # Running totals behind get_fraud_stats and the analytics rollups,
+            # kept current by triggers on transactions
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            existing = {row["name"] for row in cursor.fetchall()}
+            self._create_aggregate_tables(cursor)
+
+            # Trigger bodies change between versions, so always recreate them
+            for table in self._all_tables(cursor):
+                self._drop_aggregate_triggers(cursor, table)
+                self._create_aggregate_triggers(cursor, table)
+            if not {"fraud_stats", *(table for table, _ in _ROLLUPS)} <= existing:
+                # First run against an existing database: count what's already there
+                self._rebuild_aggregates(cursor)
+
+    @staticmethod
+    def _detect_storage(cursor):
+        """Layout of an existing transactions table ("standard"/"compact"), None if there is none."""
+        cursor.execute("SELECT type FROM pragma_table_info('transactions') WHERE name = 'timestamp'")
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return "compact" if row[0].upper() == "INTEGER" else "standard"
+
+    def _create_transactions_table(self, cursor, table: str = "transactions"):
+        types = self._codec.column_types
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                transaction_id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                amount REAL NOT NULL,
+                hour INTEGER NOT NULL,
+                device_id {types["device_id"]} NOT NULL,
+                location {types["location"]} NOT NULL,
+                merchant_id {types["merchant_id"]} NOT NULL,
+                fraud_probability REAL,
+                risk_level {types["risk_level"]},
+                explanation {types["explanation"]},
+                timestamp {types["timestamp"]} NOT NULL,
+                model_version {types["model_version"]}
+            )
+        """)
+
+    @staticmethod
+    def _create_dimension_tables(cursor):
+        for table in CompactCodec.dimensions.values():
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    code INTEGER PRIMARY KEY,
+                    value TEXT NOT NULL UNIQUE
+                )
             """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_transactions_timestamp
-                ON transactions(timestamp DESC)
+
+    def _create_transaction_indexes(self, cursor, table: str = "transactions"):
+        # Indexes for the hot queries: velocity filters on (user_id, timestamp),
+        # alerts on high-risk rows by time, recent transactions by time
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_user_time
+            ON {table}(user_id, timestamp)
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_timestamp
+            ON {table}(timestamp DESC)
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_high_risk
+            ON {table}(timestamp DESC)
+            WHERE risk_level = {self._codec.high_risk_sql}
+        """)
+
+    def _create_aggregate_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fraud_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total_transactions INTEGER NOT NULL DEFAULT 0,
+                high_risk_count INTEGER NOT NULL DEFAULT 0,
+                probability_sum REAL NOT NULL DEFAULT 0.0,
+                probability_count INTEGER NOT NULL DEFAULT 0,
+                high_risk_probability_sum REAL NOT NULL DEFAULT 0.0,
+                high_risk_probability_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO fraud_stats (id) VALUES (1)")
+        for table, key in _ROLLUPS:
+            # Location and merchant rollups are keyed like the transactions column
+            key_type = _ROLLUP_KEY_TYPES.get(key) or self._codec.column_types[key]
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {key} {key_type} PRIMARY KEY,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    fraud_count INTEGER NOT NULL DEFAULT 0,
+                    probability_sum REAL NOT NULL DEFAULT 0.0,
+                    probability_count INTEGER NOT NULL DEFAULT 0
+                )
             """)
 
+    def _migrate(self, cursor):
+        """Bring a database created by an older version up to SCHEMA_VERSION."""
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if version < 1:
+            # Superseded by the (user_id, timestamp) composite index
+            cursor.execute("DROP INDEX IF EXISTS idx_transactions_user")
+        if version < 2:
+            # Which model version scored each row; NULL for rows scored before versioning.
+            # Partitions too: rows move between tables with SELECT *
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            for (table,) in cursor.fetchall():
+                columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+                if "fraud_probability" in columns and "model_version" not in columns:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN model_version "
+                                   f"{self._codec.column_types['model_version']}")
+        if version < SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def get_schema_version(self) -> int:
+        with self._get_connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @property
+    def storage(self) -> str:
+        """Layout of the transactions table: "standard" or "compact"."""
+        return self._codec.name
+
+    def get_storage_stats(self) -> dict:
+        """Database file size (pages in use) and bytes per stored transaction."""
+        with self._get_connection() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            rows = conn.execute("SELECT total_transactions FROM fraud_stats").fetchone()[0]
+        size = (pages - free) * page_size
+        return {
+            "storage": self.storage,
+            "rows": rows,
+            "bytes": size,
+            "bytes_per_row": size / rows if rows else 0.0,
+            "mb_per_million_rows": size / rows * 1_000_000 / 2**20 if rows else 0.0,
+        }
+
+    def migrate_to_compact(self, batch_size: int = 5000) -> dict:
+        """
+        Rewrite a standard database in the compact layout, then VACUUM it.
+
+        Rows are re-encoded in batches inside one transaction, so the file is
+        either fully converted or untouched. Run it with no other process
+        writing. Returns get_storage_stats() before and after.
+        """
+        before = self.get_storage_stats()
+        if self._codec.compact:
+            return {"before": before, "after": before}
+
+        standard, compact = self._codec, CompactCodec()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            if not conn.in_transaction:
+                # DDL would otherwise autocommit statement by statement
+                conn.execute("BEGIN IMMEDIATE")
+            tables = self._all_tables(cursor)
+            self._codec = compact
+            try:
+                self._create_dimension_tables(cursor)
+                for table in tables:
+                    self._create_transactions_table(cursor, "transactions_compact")
+                    reader = conn.execute(f"SELECT * FROM {table} ORDER BY rowid")
+                    while rows := reader.fetchmany(batch_size):
+                        cursor.executemany(
+                            self._INSERT_TRANSACTION_SQL.format(table="transactions_compact"),
+                            [compact.encode(cursor, dict(row)) for row in rows],
+                        )
+                    # Dropping the table drops its indexes and triggers with it
+                    cursor.execute(f"DROP TABLE {table}")
+                    cursor.execute(f"ALTER TABLE transactions_compact RENAME TO {table}")
+                    self._create_transaction_indexes(cursor, table)
+                    self._create_aggregate_triggers(cursor, table)
+                for table, _ in _ROLLUPS:
+                    cursor.execute(f"DROP TABLE {table}")
+                self._create_aggregate_tables(cursor)
+                self._rebuild_aggregates(cursor)
+            except Exception:
+                self._codec = standard
+                raise
+
+        self.vacuum()
+        return {"before": before, "after": self.get_storage_stats()}
+
+    def vacuum(self):
+        """Rebuild the database file without free pages."""
+        with self._get_connection() as conn:
+            conn.execute("VACUUM")
+
+    # ── Partitions ─────────────────────────────────────────────────
+
+    def _init_partitioning(self, cursor, partition_by: str = None):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS db_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS transaction_partitions (
+                name TEXT PRIMARY KEY,
+                period_start TEXT NOT NULL,
+                period_end TEXT NOT NULL
+            )
+        """)
+        cursor.execute("SELECT value FROM db_settings WHERE key = 'partition_by'")
+        row = cursor.fetchone()
+        current = row[0] if row else None
+        if current is not None and partition_by is not None and partition_by != current:
+            raise ValueError(f"{self.db_path} is partitioned by {current}, not {partition_by}")
+        if current is None and partition_by is not None:
+            cursor.execute("INSERT INTO db_settings (key, value) VALUES ('partition_by', ?)",
+                           (partition_by,))
+        self.partition_by = current or partition_by
+
+    def _partitions(self, cursor) -> list:
+        """Partitions as (table, start micros, end micros), newest first."""
+        if self.partition_by is None:
+            return []
+        # Creating or dropping a partition changes the schema, so the catalog
+        # only needs re-reading when the schema version moves
+        version = cursor.execute("PRAGMA schema_version").fetchone()[0]
+        cached_version, partitions = self._catalog
+        if version != cached_version:
+            cursor.execute("SELECT name, period_start, period_end FROM transaction_partitions")
+            partitions = sorted(
+                ((name, iso_to_micros(start), iso_to_micros(end))
+                 for name, start, end in cursor.fetchall()),
+                key=lambda partition: partition[1], reverse=True,
+            )
+            self._catalog = (version, partitions)
+        return partitions
+
+    def _all_tables(self, cursor) -> list:
+        """Every table holding transactions: partitions newest first, then `transactions`."""
+        return [name for name, _, _ in self._partitions(cursor)] + ["transactions"]
+
+    def _tables_since(self, cursor, since: str) -> list:
+        """Tables that can hold rows at or after `since` (all of them if it can't be parsed)."""
+        if self.partition_by is None:
+            return ["transactions"]
+        try:
+            since = iso_to_micros(since)
+        except (ValueError, TypeError):
+            return self._all_tables(cursor)
+        return [name for name, _, end in self._partitions(cursor) if end > since] + ["transactions"]
+
+    def _route(self, cursor, timestamp: str) -> str:
+        """Table a transaction with this timestamp belongs in, creating its partition if needed."""
+        if self.partition_by is None:
+            return "transactions"
+        period = partition_period(timestamp, self.partition_by)
+        if period is None:
+            return "transactions"
+        name = period[0]
+        if not any(existing == name for existing, _, _ in self._partitions(cursor)):
+            self._create_partition(cursor, *period)
+        return name
+
+    def _create_partition(self, cursor, name: str, start: str, end: str):
+        # The catalog row opens the write transaction, so the DDL below commits
+        # or rolls back together with the rows that needed the partition
+        cursor.execute("""
+            INSERT OR IGNORE INTO transaction_partitions (name, period_start, period_end)
+            VALUES (?, ?, ?)
+        """, (name, start, end))
+        self._create_transactions_table(cursor, name)
+        self._create_transaction_indexes(cursor, name)
+        self._create_aggregate_triggers(cursor, name)
+
+    def get_partitions(self) -> list:
+        """Partitions newest first, as dicts with name, period_start, period_end and rows."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            return [
+                {"name": name, "period_start": micros_to_iso(start),
+                 "period_end": micros_to_iso(end),
+                 "rows": cursor.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]}
+                for name, start, end in self._partitions(cursor)
+            ]
+
+    def repartition(self) -> int:
+        """
+        Move rows written to `transactions` before partitioning was enabled into
+        their partitions, in one transaction. Aggregates are unchanged. Returns
+        the number of rows moved.
+        """
+        if self.partition_by is None:
+            raise ValueError("partitioning is not enabled for this database")
+        moved = 0
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT DISTINCT timestamp FROM transactions")
+            periods = {partition_period(self._codec.decode_time(ts), self.partition_by)
+                       for (ts,) in cursor.fetchall()}
+            periods.discard(None)
+
+            # Moving rows doesn't change any total; skip the per-row triggers
+            self._drop_aggregate_triggers(cursor)
+            for name, start, end in sorted(periods):
+                self._route(cursor, start)
+                self._drop_aggregate_triggers(cursor, name)
+                bounds = (self._codec.encode_time(start), self._codec.encode_time(end))
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO {name}
+                    SELECT * FROM transactions WHERE timestamp >= ? AND timestamp < ?
+                """, bounds)
+                cursor.execute("DELETE FROM transactions WHERE timestamp >= ? AND timestamp < ?",
+                               bounds)
+                moved += cursor.rowcount
+                self._create_aggregate_triggers(cursor, name)
+            self._create_aggregate_triggers(cursor)
+        return moved
+
+    def archive_partitions(self, before: str = None) -> list:
+        """
+        Archive every partition whose period ended at or before `before`
+        (default: retention_days ago) to `<archive_dir>/<partition>.jsonl.gz`,
+        then drop its table. Aggregates drop the archived rows, so they keep
+        matching rebuild_aggregates(). Returns the archive file paths.
+        """
+        if before is None:
+            if self.retention_days is None:
+                raise ValueError("pass `before` or construct the manager with retention_days")
+            before = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        cutoff = iso_to_micros(before)
+
+        with self._get_connection() as conn:
+            expired = [name for name, _, end in self._partitions(conn.cursor()) if end <= cutoff]
+
+        paths = []
+        for name in reversed(expired):  # oldest first
+            path = os.path.join(self.archive_dir, f"{name}.jsonl.gz")
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                if not conn.in_transaction:
+                    # Hold the write lock so no row lands in the partition after it is read
+                    conn.execute("BEGIN IMMEDIATE")
+                reader = conn.execute(f"SELECT * FROM {name} ORDER BY timestamp")
+                write_archive(path, (row for rows in iter(lambda: reader.fetchmany(5000), [])
+                                     for row in self._codec.decode(cursor, rows)))
+                self._add_aggregates(cursor, name, "-")
+                cursor.execute(f"DROP TABLE {name}")
+                cursor.execute("DELETE FROM transaction_partitions WHERE name = ?", (name,))
+            paths.append(path)
+        return paths
+
+    def restore_archive(self, path: str) -> int:
+        """Load an archived partition back into the database. Returns the rows restored."""
+        return self.insert_transactions_bulk(read_archive(path))
+
+    # ── Aggregate Maintenance ──────────────────────────────────────
+
+    def _aggregate_delta_sql(self, row: str, sign: str) -> str:
+        """Statements applying one transaction row (NEW or OLD) to every aggregate with + or -."""
+        high = f"({row}.risk_level IS {self._codec.high_risk_sql})"
+        prob = f"COALESCE({row}.fraud_probability, 0.0)"
+        has_prob = f"({row}.fraud_probability IS NOT NULL)"
+        statements = [f"""
+            UPDATE fraud_stats SET
+                total_transactions = total_transactions {sign} 1,
+                high_risk_count = high_risk_count {sign} {high},
+                probability_sum = probability_sum {sign} {prob},
+                probability_count = probability_count {sign} {has_prob},
+                high_risk_probability_sum = high_risk_probability_sum {sign} {high} * {prob},
+                high_risk_probability_count = high_risk_probability_count {sign} ({high} AND {has_prob})
+            WHERE id = 1;
+        """]
+        for table, key in _ROLLUPS:
+            if sign == "+":
+                statements.append(f"""
+                    INSERT INTO {table} ({key}, total, fraud_count, probability_sum, probability_count)
+                    VALUES ({row}.{key}, 1, {high}, {prob}, {has_prob})
+                    ON CONFLICT({key}) DO UPDATE SET
+                        total = total + 1,
+                        fraud_count = fraud_count + excluded.fraud_count,
+                        probability_sum = probability_sum + excluded.probability_sum,
+                        probability_count = probability_count + excluded.probability_count;
+                """)
+            else:
+                statements.append(f"""
+                    UPDATE {table} SET
+                        total = total - 1,
+                        fraud_count = fraud_count - {high},
+                        probability_sum = probability_sum - {prob},
+                        probability_count = probability_count - {has_prob}
+                    WHERE {key} = {row}.{key};
+                """)
+        return "".join(statements)
+
+    def _create_aggregate_triggers(self, cursor, table: str = "transactions"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_aggregates_insert
+            AFTER INSERT ON {table}
+            BEGIN {self._aggregate_delta_sql("NEW", "+")} END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_aggregates_delete
+            AFTER DELETE ON {table}
+            BEGIN {self._aggregate_delta_sql("OLD", "-")} END
+        """)
+
+    @staticmethod
+    def _drop_aggregate_triggers(cursor, table: str = "transactions"):
+        names = [f"trg_{table}_aggregates_insert", f"trg_{table}_aggregates_delete"]
+        if table == "transactions":
+            names += ["trg_transactions_stats_insert", "trg_transactions_stats_delete"]
+        for name in names:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    def _add_aggregates(self, cursor, table: str, sign: str = "+"):
+        """Add (+) or subtract (-) every row of `table` to the aggregates in one pass per aggregate."""
+        high = f"risk_level IS {self._codec.high_risk_sql}"
+        cursor.execute(f"""
+            UPDATE fraud_stats SET
+                total_transactions = total_transactions {sign} d.total,
+                high_risk_count = high_risk_count {sign} d.high_risk,
+                probability_sum = probability_sum {sign} d.prob_sum,
+                probability_count = probability_count {sign} d.prob_count,
+                high_risk_probability_sum = high_risk_probability_sum {sign} d.high_prob_sum,
+                high_risk_probability_count = high_risk_probability_count {sign} d.high_prob_count
+            FROM (
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM({high}), 0) AS high_risk,
+                       COALESCE(SUM(fraud_probability), 0.0) AS prob_sum,
+                       COUNT(fraud_probability) AS prob_count,
+                       COALESCE(SUM(CASE WHEN {high} THEN fraud_probability END), 0.0)
+                           AS high_prob_sum,
+                       COUNT(CASE WHEN {high} THEN fraud_probability END) AS high_prob_count
+                FROM {table}
+            ) AS d
+            WHERE id = 1
+        """)
+        for rollup, key in _ROLLUPS:
+            grouped = f"""
+                SELECT {key}, COUNT(*) AS total, SUM({high}) AS fraud_count,
+                       COALESCE(SUM(fraud_probability), 0.0) AS probability_sum,
+                       COUNT(fraud_probability) AS probability_count
+                FROM {table} WHERE true GROUP BY {key}
+            """
+            if sign == "+":
+                cursor.execute(f"""
+                    INSERT INTO {rollup} ({key}, total, fraud_count, probability_sum, probability_count)
+                    {grouped}
+                    ON CONFLICT({key}) DO UPDATE SET
+                        total = total + excluded.total,
+                        fraud_count = fraud_count + excluded.fraud_count,
+                        probability_sum = probability_sum + excluded.probability_sum,
+                        probability_count = probability_count + excluded.probability_count
+                """)
+            else:
+                cursor.execute(f"""
+                    UPDATE {rollup} SET
+                        total = {rollup}.total - d.total,
+                        fraud_count = {rollup}.fraud_count - d.fraud_count,
+                        probability_sum = {rollup}.probability_sum - d.probability_sum,
+                        probability_count = {rollup}.probability_count - d.probability_count
+                    FROM ({grouped}) AS d
+                    WHERE {rollup}.{key} = d.{key}
+                """)
+
+    def _rebuild_aggregates(self, cursor):
+        cursor.execute("""
+            UPDATE fraud_stats SET
+                total_transactions = 0, high_risk_count = 0,
+                probability_sum = 0.0, probability_count = 0,
+                high_risk_probability_sum = 0.0, high_risk_probability_count = 0
+            WHERE id = 1
+        """)
+        for rollup, _ in _ROLLUPS:
+            cursor.execute(f"DELETE FROM {rollup}")
+        for table in self._all_tables(cursor):
+            self._add_aggregates(cursor, table)
+
+    def rebuild_aggregates(self) -> dict:
+        """
+        Recompute fraud_stats and every analytics rollup from the transactions
+        table (fixes drift). Returns the rebuilt fraud stats.
+        """
+        with self._get_connection() as conn:
+            self._rebuild_aggregates(conn.cursor())
+        return self.get_fraud_stats()
+
     # ── User Profiles ──────────────────────────────────────────────
 
+    @staticmethod
+    def _default_profile(user_id: int) -> dict:
+        return {
+            "user_id": user_id,
+            "avg_amount": 0.0,
+            "last_device": "",
+            "usual_location": "",
+            "transaction_count": 0,
+            "last_transaction_time": "",
+        }
+
     def get_user_profile(self, user_id: int) -> dict:
         """Fetch a user's behavioral profile. Returns defaults if new user."""
+        if self.profile_cache is not None:
+            return self.profile_cache.get(user_id)
+        return self._load_user_profile(user_id)
+
+    def _load_user_profile(self, user_id: int) -> dict:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM user_profiles WHERE user_id = ?", (user_id,))
@@ -87,103 +772,347 @@ class DatabaseManager:
             if row:
                 return dict(row)
             else:
-                return {
-                    "user_id": user_id,
-                    "avg_amount": 0.0,
-                    "last_device": "",
-                    "usual_location": "",
-                    "transaction_count": 0,
-                    "last_transaction_time": "",
-                }
+                return self._default_profile(user_id)
+
+    @staticmethod
+    def _upsert_profile(cursor, user_id: int, amount: float, device_id: str,
+                        location: str, timestamp: str):
+        # The running average is computed by SQLite from the stored row, so
+        # concurrent writers can't overwrite each other's avg_amount.
+        cursor.execute("""
+            INSERT INTO user_profiles (user_id, avg_amount, last_device, usual_location,
+                                       transaction_count, last_transaction_time)
+            VALUES (?, ?, ?, ?, 1, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                avg_amount = (avg_amount * transaction_count + excluded.avg_amount)
+                             / (transaction_count + 1),
+                last_device = excluded.last_device,
+                usual_location = excluded.usual_location,
+                transaction_count = transaction_count + 1,
+                last_transaction_time = excluded.last_transaction_time
+        """, (user_id, amount, device_id, location, timestamp))
 
     def update_user_profile(self, user_id: int, amount: float, device_id: str,
                             location: str, timestamp: str):
         """Update user profile with new transaction data using running average."""
+        if self.profile_cache is not None:
+            self.profile_cache.apply_transaction(user_id, amount, device_id, location, timestamp)
+            return
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            profile = self.get_user_profile(user_id)
-
-            count = profile["transaction_count"] + 1
-            new_avg = ((profile["avg_amount"] * profile["transaction_count"]) + amount) / count
+            self._upsert_profile(conn.cursor(), user_id, amount, device_id, location, timestamp)
 
-            cursor.execute("""
+    def _write_user_profiles(self, profiles: list):
+        """Write complete profiles (as held by the profile cache) in one transaction."""
+        with self._get_connection() as conn:
+            conn.executemany("""
                 INSERT INTO user_profiles (user_id, avg_amount, last_device, usual_location,
                                            transaction_count, last_transaction_time)
-                VALUES (?, ?, ?, ?, ?, ?)
+                VALUES (:user_id, :avg_amount, :last_device, :usual_location,
+                        :transaction_count, :last_transaction_time)
                 ON CONFLICT(user_id) DO UPDATE SET
-                    avg_amount = ?,
-                    last_device = ?,
-                    usual_location = ?,
-                    transaction_count = ?,
-                    last_transaction_time = ?
-            """, (user_id, new_avg, device_id, location, count, timestamp,
-                  new_avg, device_id, location, count, timestamp))
+                    avg_amount = excluded.avg_amount,
+                    last_device = excluded.last_device,
+                    usual_location = excluded.usual_location,
+                    transaction_count = excluded.transaction_count,
+                    last_transaction_time = excluded.last_transaction_time
+            """, profiles)
+
+    def get_user_profiles(self, user_ids) -> dict:
+        """Fetch many profiles at once. Returns user_id -> profile (defaults for new users)."""
+        user_ids = list(dict.fromkeys(user_ids))
+        if self.profile_cache is not None:
+            return self.profile_cache.get_many(user_ids)
+        return self._load_user_profiles(user_ids)
+
+    def _load_user_profiles(self, user_ids: list) -> dict:
+        profiles = {}
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for chunk in _chunks(user_ids, _MAX_QUERY_PARAMS):
+                cursor.execute(
+                    f"SELECT * FROM user_profiles WHERE user_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for row in cursor.fetchall():
+                    profiles[row["user_id"]] = dict(row)
+        return {uid: profiles.get(uid) or self._default_profile(uid) for uid in user_ids}
+
+    def upsert_user_profiles_bulk(self, profiles: list, chunk_size: int = 5000) -> int:
+        """
+        Write complete profiles (user_id, avg_amount, last_device, usual_location,
+        transaction_count, last_transaction_time) with executemany, committing
+        once per chunk. Returns the number of profiles written.
+        """
+        written = 0
+        for chunk in _chunks(profiles, chunk_size):
+            self._write_user_profiles(chunk)
+            written += len(chunk)
+        if self.profile_cache is not None:
+            self.profile_cache.store(profiles)
+        return written
+
+    def get_profile_cache_stats(self) -> dict:
+        """Hit/miss counters for the in-memory profile cache (empty if disabled)."""
+        return self.profile_cache.stats() if self.profile_cache is not None else {}
 
     # ── Transactions ───────────────────────────────────────────────
 
+    _INSERT_TRANSACTION_SQL = """
+        INSERT OR REPLACE INTO {table}
+            (transaction_id, user_id, amount, hour, device_id, location,
+             merchant_id, fraud_probability, risk_level, explanation, timestamp,
+             model_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def _transaction_params(self, cursor, transaction: dict) -> tuple:
+        return self._codec.encode(cursor, transaction)
+
+    def _insert_transaction_row(self, cursor, transaction: dict):
+        table = self._route(cursor, transaction["timestamp"])
+        cursor.execute(self._INSERT_TRANSACTION_SQL.format(table=table),
+                       self._transaction_params(cursor, transaction))
+
+    def _insert_transaction_rows(self, conn, transactions):
+        """executemany the transactions, one call per destination table."""
+        cursor = conn.cursor()
+        by_table = {}
+        for txn in transactions:
+            by_table.setdefault(self._route(cursor, txn["timestamp"]), []).append(
+                self._transaction_params(cursor, txn))
+        for table, params in by_table.items():
+            conn.executemany(self._INSERT_TRANSACTION_SQL.format(table=table), params)
+
     def insert_transaction(self, transaction: dict):
         """Insert a completed transaction record."""
+        with self._get_connection() as conn:
+            self._insert_transaction_row(conn.cursor(), transaction)
+        self._track_velocity(transaction)
+
+    def insert_transactions_bulk(self, transactions, chunk_size: int = 5000) -> int:
+        """
+        Insert many completed transactions with executemany, committing once
+        per chunk of `chunk_size` rows. Returns the number of rows inserted.
+        """
+        inserted = 0
+        for chunk in _chunks(transactions, chunk_size):
+            with self._get_connection() as conn:
+                self._insert_transaction_rows(conn, chunk)
+            for txn in chunk:
+                self._track_velocity(txn)
+            inserted += len(chunk)
+        return inserted
+
+    def get_user_activity(self, user_ids, since: str) -> dict:
+        """
+        Timestamps of each user's transactions at or after `since`.
+        Returns user_id -> ascending list of ISO timestamps.
+        """
+        activity = {uid: [] for uid in dict.fromkeys(user_ids)}
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO transactions
-                    (transaction_id, user_id, amount, hour, device_id, location,
-                     merchant_id, fraud_probability, risk_level, explanation, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                transaction["transaction_id"],
-                transaction["user_id"],
-                transaction["amount"],
-                transaction["hour"],
-                transaction["device_id"],
-                transaction["location"],
-                transaction["merchant_id"],
-                transaction.get("fraud_probability"),
-                transaction.get("risk_level"),
-                transaction.get("explanation", ""),
-                transaction["timestamp"],
-            ))
+            tables = self._tables_since(cursor, since)
+            for table in tables:
+                for chunk in _chunks(list(activity), _MAX_QUERY_PARAMS):
+                    cursor.execute(f"""
+                        SELECT user_id, timestamp FROM {table}
+                        WHERE user_id IN ({','.join('?' * len(chunk))}) AND timestamp >= ?
+                        ORDER BY timestamp
+                    """, (*chunk, self._codec.encode_time(since)))
+                    for user_id, timestamp in cursor.fetchall():
+                        activity[user_id].append(self._codec.decode_time(timestamp))
+        if len(tables) > 1:
+            for timestamps in activity.values():
+                timestamps.sort()
+        return activity
 
-    def get_recent_transactions(self, limit: int = 50) -> list:
-        """Get the most recent transactions."""
+    # ── Pipeline step ──────────────────────────────────────────────
+
+    def get_scoring_context(self, user_id: int, current_time: str,
+                            window_hours: int = 1) -> tuple:
+        """
+        Fetch everything needed to score a transaction in one query.
+
+        Returns:
+            (user_profile, transaction_velocity) — same values as
+            get_user_profile and get_transaction_velocity
+        """
+        if self.profile_cache is not None or self._tracks_velocity(window_hours):
+            # Either half is served from memory; no point joining them in SQL
+            return (self.get_user_profile(user_id),
+                    self.get_transaction_velocity(user_id, current_time, window_hours))
+
+        window_start = velocity_window_start(current_time, window_hours)
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM transactions ORDER BY timestamp DESC LIMIT ?",
-                (limit,)
+            tables = self._tables_since(cursor, window_start)
+            cursor.execute(f"""
+                SELECT p.*, {self._velocity_sql(tables, "q.uid")} AS _velocity
+                FROM (SELECT ? AS uid) q
+                LEFT JOIN user_profiles p ON p.user_id = q.uid
+            """, (*[self._codec.encode_time(window_start)] * len(tables), user_id))
+            row = dict(cursor.fetchone())
+
+        velocity = row.pop("_velocity")
+        profile = row if row["user_id"] is not None else self._default_profile(user_id)
+        return profile, velocity
+
+    def record_scored_transaction(self, transaction: dict):
+        """
+        Persist a scored transaction and fold it into the user's profile.
+        Both writes happen in a single transaction with one commit.
+        """
+        if self.profile_cache is not None:
+            self.insert_transaction(transaction)
+            self.profile_cache.apply_transaction(
+                transaction["user_id"], transaction["amount"], transaction["device_id"],
+                transaction["location"], transaction["timestamp"],
             )
-            return [dict(row) for row in cursor.fetchall()]
+            return
 
-    def get_fraud_alerts(self, limit: int = 20) -> list:
-        """Get recent high-risk transactions."""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM transactions
-                WHERE risk_level = 'HIGH RISK'
-                ORDER BY timestamp DESC LIMIT ?
-            """, (limit,))
-            return [dict(row) for row in cursor.fetchall()]
+            self._insert_transaction_row(cursor, transaction)
+            self._upsert_profile(
+                cursor,
+                user_id=transaction["user_id"],
+                amount=transaction["amount"],
+                device_id=transaction["device_id"],
+                location=transaction["location"],
+                timestamp=transaction["timestamp"],
+            )
+        self._track_velocity(transaction)
 
-    def get_fraud_stats(self) -> dict:
-        """Get aggregate fraud statistics."""
+    def record_scored_transactions_bulk(self, transactions: list, profiles: list):
+        """
+        Persist a batch of scored transactions and the resulting user profiles
+        (complete rows, as computed by the caller) in a single transaction.
+        """
+        with self._get_connection() as conn:
+            self._insert_transaction_rows(conn, transactions)
+            if self.profile_cache is None:
+                self._write_user_profiles(profiles)
+        if self.profile_cache is not None:
+            self.profile_cache.store(profiles, dirty=True)
+        for txn in transactions:
+            self._track_velocity(txn)
+
+    @staticmethod
+    def _velocity_sql(tables: list, user_id_sql: str) -> str:
+        """SQL expression counting a user's rows at or after `?` across tables (one `?` per table)."""
+        return " + ".join(
+            f"(SELECT COUNT(*) FROM {table} WHERE user_id = {user_id_sql} AND timestamp >= ?)"
+            for table in tables
+        )
+
+    def _latest_rows(self, where: str, limit: int, params: tuple = (), since: str = None,
+                     until: str = None) -> list:
+        """
+        Newest `limit` rows matching `where` (with `params` bound), ordered by
+        (timestamp, transaction_id) descending and reading partitions newest first
+        until filled. Partitions entirely before `since` or after `until` are skipped.
+        """
+        sql = f"SELECT * FROM {{}} {where} ORDER BY timestamp DESC, transaction_id DESC LIMIT ?"
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            tables = self._tables_since(cursor, since) if since else self._all_tables(cursor)
+            if until and self.partition_by is not None:
+                until = iso_to_micros(until)
+                newer = {name for name, start, _ in self._partitions(cursor) if start > until}
+                tables = [name for name in tables if name not in newer]
+            rows = []
+            for name in tables[:-1]:
+                if len(rows) >= limit:
+                    break
+                cursor.execute(sql.format(name), (*params, limit - len(rows)))
+                rows += cursor.fetchall()
+            cursor.execute(sql.format("transactions"), (*params, limit))
+            unpartitioned = cursor.fetchall()
+            if rows and unpartitioned:
+                rows = sorted(rows + unpartitioned, reverse=True,
+                              key=lambda row: (row["timestamp"], row["transaction_id"]))[:limit]
+            else:
+                rows = rows or unpartitioned
+            return self._codec.decode(cursor, rows)
 
-            cursor.execute("SELECT COUNT(*) as total FROM transactions")
-            total = cursor.fetchone()["total"]
+    def get_recent_transactions(self, limit: int = 50) -> list:
+        """Get the most recent transactions."""
+        return self._latest_rows("", limit)
 
-            cursor.execute("SELECT COUNT(*) as cnt FROM transactions WHERE risk_level = 'HIGH RISK'")
-            high_risk = cursor.fetchone()["cnt"]
+    def get_fraud_alerts(self, limit: int = 20) -> list:
+        """Get recent high-risk transactions."""
+        return self._latest_rows(f"WHERE risk_level = {self._codec.high_risk_sql}", limit)
 
-            cursor.execute("SELECT AVG(fraud_probability) as avg_prob FROM transactions")
-            avg_prob = cursor.fetchone()["avg_prob"] or 0.0
+    def get_transactions_page(self, after: tuple = None, limit: int = 100,
+                              high_risk_only: bool = False) -> tuple:
+        """
+        One page of transactions, newest first, by keyset pagination: each page
+        starts from the (timestamp, transaction_id) of the previous page's last
+        row, so every page costs one index range scan however deep it is.
 
-            cursor.execute("""
-                SELECT AVG(fraud_probability) as avg_prob
-                FROM transactions WHERE risk_level = 'HIGH RISK'
-            """)
-            avg_fraud_prob = cursor.fetchone()["avg_prob"] or 0.0
+        Args:
+            after: cursor returned with the previous page (None = newest page)
+            limit: rows per page
+            high_risk_only: only HIGH RISK transactions
+
+        Returns:
+            (rows, cursor for the next page, or None after the last page)
+        """
+        conditions, params = [], ()
+        if high_risk_only:
+            conditions.append(f"risk_level = {self._codec.high_risk_sql}")
+        if after is not None:
+            timestamp, transaction_id = after
+            encoded = self._codec.encode_time(timestamp)
+            # The timestamp <= ? bound lets the range use the timestamp index
+            conditions.append("timestamp <= ? AND (timestamp < ? OR transaction_id < ?)")
+            params = (encoded, encoded, transaction_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # One extra row tells whether there is another page
+        rows = self._latest_rows(where, limit + 1, params, until=after[0] if after else None)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]["timestamp"], rows[-1]["transaction_id"])
+
+    def get_transactions_since(self, since: str, limit: int = 1000,
+                               high_risk_only: bool = False) -> list:
+        """
+        Transactions stamped at or after `since`, newest first (at most `limit`).
+        Rows stamped exactly `since` are included, so callers polling with the last
+        timestamp they saw should drop the IDs they already have.
+        """
+        where = "WHERE timestamp >= ?"
+        if high_risk_only:
+            where += f" AND risk_level = {self._codec.high_risk_sql}"
+        return self._latest_rows(where, limit, (self._codec.encode_time(since),), since=since)
+
+    def get_data_version(self) -> tuple:
+        """
+        A cheap fingerprint of the stored transactions, read from the aggregate row:
+        (total_transactions, high_risk_count, probability_sum). Any insert, replace
+        or delete changes it, so readers can skip reloading while it is unchanged.
+        """
+        with self._get_connection() as conn:
+            row = conn.execute("""
+                SELECT total_transactions, high_risk_count, probability_sum
+                FROM fraud_stats WHERE id = 1
+            """).fetchone()
+            return tuple(row)
+
+    def get_fraud_stats(self) -> dict:
+        """Get aggregate fraud statistics."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM fraud_stats WHERE id = 1")
+            row = cursor.fetchone()
+
+            total = row["total_transactions"]
+            high_risk = row["high_risk_count"]
+            avg_prob = (row["probability_sum"] / row["probability_count"]
+                        if row["probability_count"] else 0.0)
+            avg_fraud_prob = (row["high_risk_probability_sum"] / row["high_risk_probability_count"]
+                              if row["high_risk_probability_count"] else 0.0)
 
             return {
                 "total_transactions": total,
@@ -195,29 +1124,71 @@ class DatabaseManager:
 
     def get_transaction_velocity(self, user_id: int, current_time: str, window_hours: int = 1) -> int:
         """Count transactions by a user in the last N hours."""
+        if self._tracks_velocity(window_hours):
+            try:
+                now = iso_to_micros(current_time)
+            except (ValueError, TypeError):
+                pass
+            else:
+                count = self.velocity_tracker.count(user_id, now, int(window_hours * 3600))
+                if count is not None:
+                    return count
+
+        window_start = velocity_window_start(current_time, window_hours)
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            tables = self._tables_since(cursor, window_start)
+            cursor.execute(f"SELECT {self._velocity_sql(tables, '?')} AS cnt",
+                           (user_id, self._codec.encode_time(window_start)) * len(tables))
+            return cursor.fetchone()["cnt"]
+
+    def get_velocity_counts(self, user_id: int, current_time: str) -> dict:
+        """Velocity for every tracked window at once, keyed by window size in seconds."""
+        windows = self.velocity_tracker.windows if self.velocity_tracker is not None else (3600,)
+        return {w: self.get_transaction_velocity(user_id, current_time, w / 3600) for w in windows}
+
+    def _tracks_velocity(self, window_hours) -> bool:
+        seconds = window_hours * 3600
+        return (self.velocity_tracker is not None and seconds == int(seconds)
+                and self.velocity_tracker.tracks(int(seconds)))
+
+    def _track_velocity(self, transaction: dict):
+        if self.velocity_tracker is not None:
             try:
-                dt = datetime.fromisoformat(current_time)
-                window_start = (dt - timedelta(hours=window_hours)).isoformat()
+                ts = iso_to_micros(transaction["timestamp"])
             except (ValueError, TypeError):
-                window_start = ""
+                return
+            self.velocity_tracker.record(transaction["user_id"], ts)
 
-            cursor.execute("""
-                SELECT COUNT(*) as cnt FROM transactions
-                WHERE user_id = ? AND timestamp >= ?
-            """, (user_id, window_start))
-            return cursor.fetchone()["cnt"]
+    def _warm_start_velocity(self):
+        """Load the largest window's worth of history (relative to the newest row) into the tracker."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            newest = " UNION ALL ".join(f"SELECT MAX(timestamp) AS latest FROM {table}"
+                                        for table in self._all_tables(cursor))
+            cursor.execute(f"SELECT MAX(latest) AS latest FROM ({newest})")
+            latest = self._codec.decode_time(cursor.fetchone()["latest"])
+            if not latest:
+                return
+            window_start = velocity_window_start(
+                latest, self.velocity_tracker.windows[-1] / 3600)
+            rows = []
+            for table in self._tables_since(cursor, window_start):
+                cursor.execute(f"""
+                    SELECT user_id, timestamp FROM {table}
+                    WHERE timestamp >= ? ORDER BY timestamp
+                """, (self._codec.encode_time(window_start),))
+                rows += [(uid, self._codec.decode_time(ts)) for uid, ts in cursor.fetchall()]
+            self.velocity_tracker.warm_start(rows, since=window_start)
 
     def get_hourly_fraud_distribution(self) -> list:
         """Get fraud counts grouped by hour for analytics."""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT hour, COUNT(*) as total,
-                       SUM(CASE WHEN risk_level = 'HIGH RISK' THEN 1 ELSE 0 END) as fraud_count
-                FROM transactions
-                GROUP BY hour ORDER BY hour
+                SELECT hour, total, fraud_count
+                FROM rollup_hourly
+                WHERE total > 0 ORDER BY hour
             """)
             return [dict(row) for row in cursor.fetchall()]
 
@@ -226,17 +1197,140 @@ class DatabaseManager:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT user_id, COUNT(*) as total_txn,
-                       AVG(fraud_probability) as avg_risk,
-                       SUM(CASE WHEN risk_level = 'HIGH RISK' THEN 1 ELSE 0 END) as fraud_count
-                FROM transactions
-                GROUP BY user_id ORDER BY avg_risk DESC LIMIT 20
+                SELECT user_id, total as total_txn,
+                       probability_sum / probability_count as avg_risk,
+                       fraud_count
+                FROM rollup_user
+                WHERE total > 0 ORDER BY avg_risk DESC LIMIT 20
             """)
             return [dict(row) for row in cursor.fetchall()]
 
+    def get_location_fraud_distribution(self) -> list:
+        """Get transaction and high-risk counts per location over the full history."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT location, total, fraud_count as high_risk,
+                       probability_sum / probability_count as avg_prob
+                FROM rollup_location
+                WHERE total > 0 ORDER BY location
+            """)
+            return self._decode_rollup(cursor, cursor.fetchall(), "location")
+
+    def get_merchant_fraud_distribution(self) -> list:
+        """Get transaction and high-risk counts per merchant over the full history."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT merchant_id, total, fraud_count as high_risk,
+                       probability_sum / probability_count as avg_prob
+                FROM rollup_merchant
+                WHERE total > 0 ORDER BY merchant_id
+            """)
+            return self._decode_rollup(cursor, cursor.fetchall(), "merchant_id")
+
+    def iter_transactions(self, batch_size: int = 5000):
+        """Yield every stored transaction, oldest partition first, reading `batch_size` rows at a time."""
+        with self._get_connection() as conn:
+            tables = self._all_tables(conn.cursor())
+        for table in ["transactions", *reversed(tables[:-1])]:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                reader = conn.execute(f"SELECT * FROM {table} ORDER BY timestamp")
+                while rows := reader.fetchmany(batch_size):
+                    yield from self._codec.decode(cursor, rows)
+
+    def iter_user_profiles(self, batch_size: int = 5000):
+        """Yield every stored user profile (flushing cached ones first)."""
+        if self.profile_cache is not None:
+            self.profile_cache.flush()
+        with self._get_connection() as conn:
+            reader = conn.execute("SELECT * FROM user_profiles ORDER BY user_id")
+            while rows := reader.fetchmany(batch_size):
+                yield from (dict(row) for row in rows)
+
+    def _decode_rollup(self, cursor, rows, key: str) -> list:
+        """Rollup rows with category codes turned back into names, ordered by name."""
+        rows = [dict(row) for row in rows]
+        if self._codec.compact:
+            for row in rows:
+                row[key] = self._codec.decode_value(cursor, key, row[key])
+            rows.sort(key=lambda row: str(row[key]))
+        return rows
+
+    # ── Query Plans ────────────────────────────────────────────────
+
+    def explain_hot_queries(self, user_id: int = 1001, current_time: str = None) -> dict:
+        """
+        Run every hot read path once and EXPLAIN QUERY PLAN the SQL it issues.
+
+        Returns:
+            dict mapping method name -> list of (sql, [plan detail lines])
+        """
+        current_time = current_time or datetime.now().isoformat()
+        # A plain manager: the profile cache and velocity tracker would skip the SQL
+        probe = DatabaseManager(self.db_path, journal_mode=self.journal_mode,
+                                synchronous=self.synchronous)
+        calls = {
+            "get_user_profile": lambda: probe.get_user_profile(user_id),
+            "get_user_profiles": lambda: probe.get_user_profiles([user_id, user_id + 1]),
+            "get_scoring_context": lambda: probe.get_scoring_context(user_id, current_time),
+            "get_transaction_velocity": lambda: probe.get_transaction_velocity(user_id, current_time),
+            "get_user_activity": lambda: probe.get_user_activity([user_id], current_time),
+            "get_recent_transactions": lambda: probe.get_recent_transactions(50),
+            "get_fraud_alerts": lambda: probe.get_fraud_alerts(20),
+            "get_transactions_page": lambda: probe.get_transactions_page(
+                (current_time, "TXN-FFFFFFFFFFFF"), 50),
+            "get_fraud_stats": probe.get_fraud_stats,
+            "get_hourly_fraud_distribution": probe.get_hourly_fraud_distribution,
+            "get_user_risk_summary": probe.get_user_risk_summary,
+            "get_location_fraud_distribution": probe.get_location_fraud_distribution,
+            "get_merchant_fraud_distribution": probe.get_merchant_fraud_distribution,
+        }
+
+        plans = {}
+        try:
+            conn = probe._thread_connection()
+            for name, call in calls.items():
+                statements = []
+                conn.set_trace_callback(statements.append)
+                try:
+                    call()
+                finally:
+                    conn.set_trace_callback(None)
+                plans[name] = [
+                    (sql, [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")])
+                    for sql in statements if sql.lstrip().upper().startswith("SELECT")
+                ]
+        finally:
+            probe.close()
+        return plans
+
+    @staticmethod
+    def find_full_scans(plans: dict) -> list:
+        """(method, sql, plan line) for every plan step that scans transactions without an index."""
+        return [
+            (name, sql, line)
+            for name, statements in plans.items()
+            for sql, lines in statements
+            for line in lines
+            if _FULL_SCAN.match(line)
+        ]
+
     def clear_all_data(self):
         """Clear all tables (for testing/reset)."""
+        if self.profile_cache is not None:
+            self.profile_cache.clear()
+        if self.velocity_tracker is not None:
+            self.velocity_tracker.clear()
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            # Skip the per-row aggregate triggers (and keep SQLite's fast truncate path)
+            self._drop_aggregate_triggers(cursor)
             cursor.execute("DELETE FROM transactions")
             cursor.execute("DELETE FROM user_profiles")
+            for name, _, _ in self._partitions(cursor):
+                cursor.execute(f"DROP TABLE {name}")
+            cursor.execute("DELETE FROM transaction_partitions")
+            self._rebuild_aggregates(cursor)
+            self._create_aggregate_triggers(cursor)
@@ -0,0 +1,154 @@
+"""
+db_admin.py — Maintenance commands for the fraud detection database.
+
+Run: python -m src.db_admin {migrate,explain,rebuild-aggregates,compact,storage-report,
+                             repartition,archive}
+         [--db database/fraud_detection.db] [--rows 100000]
+         [--partition-by {day,month}] [--retention-days N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from src.database_manager import DatabaseManager
+
+
+def rebuild_aggregates(db: DatabaseManager):
+    """Recompute fraud_stats and the analytics rollups from raw transactions."""
+    stats = db.rebuild_aggregates()
+    print(f"✅ Aggregates rebuilt: {stats['total_transactions']:,} transactions, "
+          f"{stats['high_risk_count']:,} high risk ({stats['fraud_rate']:.2f}%)")
+
+
+def migrate(db: DatabaseManager):
+    """Opening the database applies pending migrations; report the resulting version."""
+    print(f"✅ Schema at version {db.get_schema_version()}")
+
+
+def explain(db: DatabaseManager):
+    """Print the query plan of every hot query and fail if any scans transactions."""
+    plans = db.explain_hot_queries()
+    for name, statements in plans.items():
+        for _, lines in statements:
+            print(f"{name}: {' | '.join(lines)}")
+    full_scans = db.find_full_scans(plans)
+    for name, _, line in full_scans:
+        print(f"❌ {name} falls back to a full scan: {line}")
+    if full_scans:
+        raise SystemExit(1)
+    print("✅ No hot query scans the transactions table")
+
+
+def _print_storage(label: str, stats: dict):
+    print(f"{label:<10} {stats['bytes'] / 2**20:8.1f} MB  {stats['bytes_per_row']:6.1f} B/row  "
+          f"{stats['mb_per_million_rows']:7.1f} MB per million rows")
+
+
+def compact(db: DatabaseManager):
+    """Convert the database to the compact layout and report the size change."""
+    if db.storage == "compact":
+        print("✅ Already using compact storage")
+        return
+    result = db.migrate_to_compact()
+    _print_storage("standard", result["before"])
+    _print_storage("compact", result["after"])
+    print(f"✅ Converted {result['after']['rows']:,} transactions to compact storage")
+
+
+def storage_report(db: DatabaseManager, rows: int = 100_000):
+    """
+    Score `rows` simulated transactions into a scratch database, then measure
+    its size in the standard layout and again after migrating it to compact.
+    """
+    from src.simulator import (USER_PROFILES_SEED, generate_normal_transaction,
+                               inject_fraud_patterns, process_transaction_batch)
+
+    rng_state = random.getstate()
+    random.seed(42)
+    start = datetime(2024, 1, 1)
+    with tempfile.TemporaryDirectory() as scratch:
+        probe = DatabaseManager(os.path.join(scratch, "storage_report.db"))
+        try:
+            for offset in range(0, rows, 5000):
+                batch = []
+                for i in range(offset, min(offset + 5000, rows)):
+                    seed = random.choice(USER_PROFILES_SEED)
+                    txn = generate_normal_transaction(seed)
+                    if random.random() < 0.10:
+                        txn = inject_fraud_patterns(txn, seed)
+                    txn["timestamp"] = (start + timedelta(seconds=i)).isoformat()
+                    batch.append(txn)
+                process_transaction_batch(probe, batch)
+            probe.vacuum()
+            result = probe.migrate_to_compact()
+        finally:
+            probe.close()
+            random.setstate(rng_state)
+
+    _print_storage("standard", result["before"])
+    _print_storage("compact", result["after"])
+    saved = 1 - result["after"]["bytes"] / result["before"]["bytes"]
+    print(f"✅ Compact storage is {saved:.0%} smaller ({rows:,} simulated transactions)")
+
+
+def repartition(db: DatabaseManager):
+    """Move rows from before partitioning was enabled into their partitions."""
+    moved = db.repartition()
+    print(f"✅ Moved {moved:,} transactions into {len(db.get_partitions())} "
+          f"{db.partition_by} partitions")
+
+
+def archive(db: DatabaseManager):
+    """Archive partitions older than the retention period and drop their tables."""
+    paths = db.archive_partitions()
+    for path in paths:
+        print(f"  archived {path}")
+    print(f"✅ {len(paths)} partitions archived, {len(db.get_partitions())} kept")
+
+
+COMMANDS = {
+    "migrate": migrate,
+    "explain": explain,
+    "rebuild-aggregates": rebuild_aggregates,
+    "compact": compact,
+    "storage-report": storage_report,
+    "repartition": repartition,
+    "archive": archive,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fraud detection database maintenance.")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--db", dest="db_path", default=None,
+                        help="SQLite database path (default: database/fraud_detection.db)")
+    parser.add_argument("--rows", type=int, default=100_000,
+                        help="simulated transactions for storage-report (default: 100000)")
+    parser.add_argument("--partition-by", choices=("day", "month"), default=None,
+                        help="enable partitioning (repartition) or check it matches the database")
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help="archive partitions that ended more than this many days ago")
+    args = parser.parse_args(argv)
+    if args.command == "archive" and args.retention_days is None:
+        parser.error("archive needs --retention-days")
+    if args.command == "repartition" and args.partition_by is None:
+        parser.error("repartition needs --partition-by")
+
+    db = DatabaseManager(db_path=args.db_path, partition_by=args.partition_by,
+                         retention_days=args.retention_days)
+    try:
+        if args.command == "storage-report":
+            storage_report(db, args.rows)
+        else:
+            COMMANDS[args.command](db)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,46 +1,69 @@
 """
 fraud_prediction.py — Prediction engine with explainable AI.
-Loads the pre-trained model bundle and provides fraud probability + risk classification.
+Scores transactions with the registry's active model version and provides
+fraud probability + risk classification.
+
+The scoring path needs only NumPy: each model is read from a compiled artifact
+(plain arrays + JSON sidecar) when one matches its bundle, and sklearn, joblib
+and pandas are imported only to fall back to the joblib bundle.
+
+Run: python -m src.fraud_prediction compile   # write the artifact next to the bundle
+     python -m src.fraud_prediction warmup    # report cold-start timings
 """
 
-import os
-import joblib
-import numpy as np
-import pandas as pd
+import argparse
+import sys
+import time
 
+from src import metrics
 from src.data_processing import (
     compute_behavioral_features,
+    compute_feature_matrix,
+    compute_feature_rows,
+    feature_rows_to_dicts,
     build_feature_dataframe,
     generate_explanation,
     FEATURE_COLUMNS,
 )
+from src.model_registry import (
+    ARTIFACT_PATH,
+    MODEL_PATH,
+    compile_model_artifact,
+    get_registry,
+    _sidecar_path,
+)
 
-# ── Load model bundle once at module level ────────────────────────
-MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
-MODEL_PATH = os.path.join(MODEL_DIR, "fraud_detection_model.joblib")
-
-_bundle = None
 
+def warmup() -> dict:
+    """
+    Load the model and score one synthetic transaction through the single and
+    batch paths, so the first real transaction pays for neither. Call it at
+    startup; later calls are cheap.
 
-def _load_model():
-    """Lazy-load the model bundle."""
-    global _bundle
-    if _bundle is None:
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(f"Model not found at {MODEL_PATH}")
-        _bundle = joblib.load(MODEL_PATH)
-    return _bundle
+    Returns:
+        dict with version, source ("artifact" or "joblib"), load_ms and first_score_ms
+    """
+    started = time.perf_counter()
+    active, _, _ = get_registry().current()
+    loaded = time.perf_counter()
+    transaction = {"user_id": 1001, "amount": 250.0, "hour": 14, "device_id": "Android_A",
+                   "location": "Mumbai", "merchant_id": "paytm@upi"}
+    profile = {"avg_amount": 250.0, "last_device": "Android_A", "usual_location": "Mumbai",
+               "transaction_count": 10}
+    predict_fraud(transaction, profile, 1)
+    batch_predict_rows([transaction], [profile], [1])
+    return {"version": active.version, "source": active.source, "load_ms": (loaded - started) * 1000,
+            "first_score_ms": (time.perf_counter() - loaded) * 1000}
 
 
 def get_model_info() -> dict:
-    """Return model metadata."""
-    bundle = _load_model()
+    """Return metadata of the active model (and the shadow version, if any)."""
+    active, shadow, _ = get_registry().current()
     return {
-        "model_type": type(bundle["model"]).__name__,
-        "scaler_type": type(bundle["scaler"]).__name__,
-        "threshold": bundle["threshold"],
-        "n_features": len(bundle["feature_columns"]),
-        "feature_columns": bundle["feature_columns"],
+        **active.info(),
+        "n_features": len(FEATURE_COLUMNS),
+        "feature_columns": FEATURE_COLUMNS,
+        "shadow_version": shadow.version if shadow else None,
     }
 
 
@@ -55,37 +78,72 @@ def predict_fraud(transaction: dict, user_profile: dict,
         transaction_velocity: recent transaction count for this user
 
     Returns:
-        dict with fraud_probability, risk_level, explanation, and computed features
+        dict with fraud_probability, risk_level, explanation, computed features and
+        the model_version that scored it; plus the shadow model's result when one is set
     """
-    bundle = _load_model()
-    model = bundle["model"]
-    scaler = bundle["scaler"]
-    threshold = bundle["threshold"]
+    registry = get_registry()
+    model, shadow, _ = registry.current()
+    threshold = model.threshold
+    timer = metrics.timer()
 
     # Step 1: Compute behavioral features
     features = compute_behavioral_features(transaction, user_profile, transaction_velocity)
-
-    # Step 2: Build aligned DataFrame
-    features_df = build_feature_dataframe(features)
-
-    # Step 3: Scale features (use .values to avoid feature name warning)
-    features_scaled = scaler.transform(features_df.values)
-
-    # Step 4: Predict probability
-    proba = model.predict_proba(features_scaled)[0]
-    fraud_probability = float(proba[1])  # Probability of class 1 (fraud)
+    if timer:
+        timer.lap("predict.features")
+
+    if model.scorer is not None:
+        # Steps 2-4: folded scaler + model, one dot product on a preallocated vector
+        fraud_probability = model.scorer.score_transaction(features, transaction)
+        if timer:
+            timer.lap("predict.score")
+    else:
+        # Step 2: Build aligned DataFrame
+        features_df = build_feature_dataframe(features)
+        if timer:
+            timer.lap("predict.dataframe")
+
+        # Step 3: Scale features (use .values to avoid feature name warning)
+        features_scaled = model.scaler.transform(features_df.values)
+        if timer:
+            timer.lap("predict.scale")
+
+        # Step 4: Predict probability
+        proba = model.model.predict_proba(features_scaled)[0]
+        fraud_probability = float(proba[1])  # Probability of class 1 (fraud)
+        if timer:
+            timer.lap("predict.predict")
 
     # Step 5: Classify risk
     risk_level = "HIGH RISK" if fraud_probability >= threshold else "LOW RISK"
+    if timer:
+        timer.lap("predict.classify")
 
     # Step 6: Generate explanation
     explanation = generate_explanation(features, fraud_probability, threshold)
+    if timer:
+        timer.lap("predict.explain")
 
-    return {
+    result = {
         "fraud_probability": round(fraud_probability, 4),
         "risk_level": risk_level,
         "explanation": explanation,
         "features": features,
+        "model_version": model.version,
+    }
+    if shadow is not None:
+        shadow_probability = shadow.score_transaction(features, transaction)
+        registry.record_shadow(shadow, [fraud_probability], [shadow_probability], threshold)
+        result["shadow"] = _shadow_result(shadow, shadow_probability)
+        if timer:
+            timer.lap("predict.shadow")
+    return result
+
+
+def _shadow_result(shadow, fraud_probability: float) -> dict:
+    return {
+        "model_version": shadow.version,
+        "fraud_probability": round(fraud_probability, 4),
+        "risk_level": "HIGH RISK" if fraud_probability >= shadow.threshold else "LOW RISK",
     }
 
 
@@ -102,14 +160,82 @@ def batch_predict(transactions: list, user_profiles: dict,
     Returns:
         list of prediction result dicts
     """
+    if not transactions:
+        return []
+
+    # Features for the whole batch in one (N, 24) matrix, then one scale + one predict
+    return _score_feature_matrix(compute_feature_matrix(transactions, user_profiles, velocities))
+
+
+def batch_predict_rows(transactions: list, profiles: list, velocities: list) -> list:
+    """
+    Predict fraud for multiple transactions, given the profile and velocity
+    each one should be scored against (same order as transactions).
+    """
+    if not transactions:
+        return []
+    return _score_feature_matrix(compute_feature_rows(transactions, profiles, velocities))
+
+
+def _score_feature_matrix(matrix) -> list:
+    registry = get_registry()
+    model, shadow, paired = registry.current()
+    threshold = model.threshold
+    timer = metrics.timer()
+
+    shadow_probabilities = None
+    if paired is not None:
+        # Active and shadow weights side by side: both scores from one matrix product
+        both = paired.score_matrix(matrix)
+        probabilities, shadow_probabilities = both[:, 0], both[:, 1]
+    else:
+        probabilities = model.score_matrix(matrix)
+        if shadow is not None:
+            shadow_probabilities = shadow.score_matrix(matrix)
+    if timer:
+        timer.lap("batch_predict.score")
+
     results = []
-    for txn in transactions:
-        uid = txn["user_id"]
-        profile = user_profiles.get(uid, {
-            "avg_amount": 0.0, "last_device": "", "usual_location": "",
-            "transaction_count": 0
+    for features, fraud_probability in zip(feature_rows_to_dicts(matrix), probabilities.tolist()):
+        results.append({
+            "fraud_probability": round(fraud_probability, 4),
+            "risk_level": "HIGH RISK" if fraud_probability >= threshold else "LOW RISK",
+            "explanation": generate_explanation(features, fraud_probability, threshold),
+            "features": features,
+            "model_version": model.version,
         })
-        velocity = (velocities or {}).get(uid, 1)
-        result = predict_fraud(txn, profile, velocity)
-        results.append(result)
+    if shadow_probabilities is not None:
+        registry.record_shadow(shadow, probabilities, shadow_probabilities, threshold)
+        for result, shadow_probability in zip(results, shadow_probabilities.tolist()):
+            result["shadow"] = _shadow_result(shadow, shadow_probability)
+    if timer:
+        timer.lap("batch_predict.explain")
     return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile or warm up the fraud model.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="write the NumPy artifact for the bundle")
+    compile_parser.add_argument("--bundle", default=MODEL_PATH, help="joblib bundle to compile")
+    compile_parser.add_argument("--output", default=ARTIFACT_PATH, help="artifact .npy path")
+    commands.add_parser("warmup", help="load the model, score once and report the timings")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        meta = compile_model_artifact(args.bundle, args.output)
+        print(f"✅ Wrote {args.output} and {_sidecar_path(args.output)} "
+              f"({meta['model_type']}, {len(meta['feature_columns'])} features, "
+              f"threshold {meta['threshold']})")
+        return 0
+
+    timings = warmup()
+    print(f"✅ Model {timings['version']} loaded from the {timings['source']} "
+          f"in {timings['load_ms']:.1f} ms, first score in {timings['first_score_ms']:.1f} ms")
+    heavy = [name for name in ("pandas", "sklearn", "joblib") if name in sys.modules]
+    print(f"   imported: {', '.join(heavy) if heavy else 'no pandas, sklearn or joblib'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+live_feed.py — In-process publish/subscribe channel for newly scored transactions.
+The pipeline publishes every record it scores into a fixed-size ring buffer
+attached to the DatabaseManager (see its live_feed_size argument); subscribers
+such as the dashboard read what is new since their last read instead of
+querying the database.
+"""
+
+import threading
+
+
+class LiveFeed:
+    """
+    Ring buffer of the last `capacity` scored records, numbered 1, 2, 3, ...
+    Publishing never blocks on subscribers: a subscriber that falls more than
+    `capacity` records behind is told it missed some and should resync.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._buffer = [None] * capacity
+        self._sequence = 0  # number of the newest record
+        self._changed = threading.Condition()
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    def publish(self, records: list):
+        """Append scored records (dicts, in processing order) and wake any waiting readers."""
+        if not records:
+            return
+        with self._changed:
+            # Records that would be overwritten within this call are only counted
+            self._sequence += max(0, len(records) - self.capacity)
+            for record in records[-self.capacity:]:
+                self._sequence += 1
+                self._buffer[self._sequence % self.capacity] = record
+            self._changed.notify_all()
+
+    def read(self, after: int = 0, limit: int = None) -> tuple:
+        """
+        Records published after sequence number `after`, oldest first.
+
+        Returns:
+            (records, sequence of the last record returned, missed) where missed is
+            True if records after `after` were already overwritten
+        """
+        with self._changed:
+            newest = self._sequence
+            oldest = max(1, newest - self.capacity + 1)
+            start = max(after + 1, oldest)
+            end = newest if limit is None else min(newest, start + limit - 1)
+            records = [self._buffer[n % self.capacity] for n in range(start, end + 1)]
+            return records, max(end, after), after + 1 < oldest and newest > after
+
+    def wait(self, after: int, timeout: float = None) -> bool:
+        """Block until something is published after `after`. Returns False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._sequence > after, timeout)
+
+    def subscribe(self, from_start: bool = False) -> "Subscription":
+        """A reader positioned at the newest record (or the oldest still buffered)."""
+        return Subscription(self, 0 if from_start else self._sequence)
+
+
+class Subscription:
+    """One reader's position in a LiveFeed."""
+
+    def __init__(self, feed: LiveFeed, position: int):
+        self.feed = feed
+        self.position = position
+        self.missed = False  # set when a poll skipped overwritten records
+
+    def poll(self, limit: int = None) -> list:
+        """Records published since the last poll, oldest first (never blocks)."""
+        records, self.position, missed = self.feed.read(self.position, limit)
+        self.missed = self.missed or missed
+        return records
+
+    def wait(self, timeout: float = None) -> list:
+        """Like poll(), but first waits up to `timeout` seconds for something new."""
+        self.feed.wait(self.position, timeout)
+        return self.poll()
+
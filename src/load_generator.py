@@ -0,0 +1,293 @@
+"""
+load_generator.py — Vectorized load generation for throughput and latency testing.
+Builds transactions in NumPy chunks from a synthetic population of any size, with
+Poisson arrivals at a target rate, and feeds them to the pipeline or a stream file.
+
+Run: python -m src.load_generator --users 1000000 --transactions 1000000 --rate 20000
+     python -m src.load_generator --transactions 5000000 --output load.npz
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from src.database_manager import DatabaseManager
+from src.simulator import DEVICES, HOUR_WEIGHTS, LOCATIONS, MERCHANTS, process_transaction_batch
+from src.stream_file import StreamWriter, columns_to_transactions
+from src.timestamps import iso_to_micros
+
+_HOUR_P = np.array(HOUR_WEIGHTS, dtype=np.float64) / sum(HOUR_WEIGHTS)
+_DEVICES = np.array(DEVICES)
+_LOCATIONS = np.array(LOCATIONS)
+_MERCHANTS = np.array(MERCHANTS)
+_BLOCK_SIZE = 8192
+
+
+class SyntheticPopulation:
+    """
+    Users with a home location, usual device and average spend, like
+    USER_PROFILES_SEED but generated for any number of users. Activity is
+    skewed: a minority of users account for most transactions.
+    """
+
+    def __init__(self, num_users: int = 1_000_000, seed: int = 0, first_user_id: int = 1001):
+        """
+        Args:
+            num_users: population size
+            seed: random seed for the users' attributes
+            first_user_id: IDs are consecutive from here. The model takes user_id as a
+                feature, so IDs far beyond the training range mostly score HIGH RISK.
+        """
+        rng = np.random.default_rng([seed, 0])
+        self.num_users = num_users
+        self.user_ids = np.arange(first_user_id, first_user_id + num_users, dtype=np.int64)
+        self.usual_location = rng.integers(len(LOCATIONS), size=num_users)
+        self.usual_device = rng.integers(len(DEVICES), size=num_users)
+        # Median around the seed users' spend (₹100-900), with a long tail
+        self.avg_spend = np.clip(np.round(rng.lognormal(np.log(320), 0.6, num_users)), 50, 20_000)
+        activity = rng.lognormal(0.0, 1.0, num_users)
+        self._cdf = np.cumsum(activity / activity.sum())
+
+    def sample(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        """Indexes of `count` users drawn in proportion to their activity."""
+        return np.minimum(np.searchsorted(self._cdf, rng.random(count)), self.num_users - 1)
+
+
+class LoadGenerator:
+    """
+    Deterministic stream of transactions from a SyntheticPopulation. The same
+    seeds always yield the same stream, whatever chunk sizes it is drawn in.
+
+    Arrivals are a Poisson process at `rate` per second of simulated time,
+    starting at `start_time`; timestamps are those arrival times.
+    """
+
+    def __init__(self, population: SyntheticPopulation, rate: float = 1000.0,
+                 fraud_ratio: float = 0.10, seed: int = 0, start_time: datetime = None,
+                 id_prefix: str = "LOAD"):
+        """
+        Args:
+            population: users to draw from
+            rate: mean transactions per second of simulated time
+            fraud_ratio: fraction of transactions with injected fraud patterns
+            seed: random seed; with the population seed it fixes the whole stream
+            start_time: timestamp of the stream start (default 2024-01-01)
+            id_prefix: transaction IDs are `<id_prefix>-<sequence number>`
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.population = population
+        self.rate = rate
+        self.fraud_ratio = fraud_ratio
+        self.id_prefix = id_prefix
+        self.seed = seed
+        self.start_micros = iso_to_micros((start_time or datetime(2024, 1, 1)).isoformat())
+        self.generated = 0
+        self._clock = float(self.start_micros)
+        self._blocks = 0
+        self._buffer = None
+
+    def generate(self, count: int) -> dict:
+        """
+        The next `count` transactions as column arrays (see stream_file), plus an
+        `injected_fraud` boolean column with the ground truth.
+        """
+        if count <= 0:
+            # Empty columns typed like real ones; buffering a block doesn't change the stream
+            if self._buffer is None:
+                self._buffer = self._next_block()
+            return {"transaction_id": np.array([], dtype=str),
+                    **{name: values[:0] for name, values in self._buffer.items()}}
+        parts = [self._buffer] if self._buffer is not None else []
+        available = len(self._buffer["user_id"]) if parts else 0
+        while available < count:
+            parts.append(self._next_block())
+            available += _BLOCK_SIZE
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        self._buffer = {name: values[count:] for name, values in columns.items()}
+
+        sequence = np.arange(self.generated, self.generated + count).astype(str)
+        self.generated += count
+        return {
+            "transaction_id": np.char.add(f"{self.id_prefix}-", np.char.zfill(sequence, 10)),
+            **{name: values[:count] for name, values in columns.items()},
+        }
+
+    def _next_block(self) -> dict:
+        # Each block has its own random stream, so chunking can't change the output
+        rng, pop = np.random.default_rng([self.seed, 1, self._blocks]), self.population
+        self._blocks += 1
+        count = _BLOCK_SIZE
+        users = pop.sample(rng, count)
+        avg = pop.avg_spend[users]
+
+        amount = np.maximum(5.0, np.round(rng.normal(avg, avg * 0.3), 2))
+        hour = rng.choice(24, size=count, p=_HOUR_P).astype(np.int8)
+        device = pop.usual_device[users]
+        location = pop.usual_location[users]
+        merchant = rng.integers(len(MERCHANTS), size=count)
+
+        # Same patterns as inject_fraud_patterns
+        fraud = rng.random(count) < self.fraud_ratio
+        if fraud.any():
+            amount[fraud] = np.round(avg[fraud] * rng.uniform(5, 12, fraud.sum()), 2)
+            night = fraud & (rng.random(count) < 0.7)
+            hour[night] = rng.integers(0, 6, night.sum())
+            # Adding 1..n-1 modulo n always picks a different device / location
+            moved = fraud & (rng.random(count) < 0.6)
+            device = np.where(moved, (device + rng.integers(1, len(DEVICES), count)) % len(DEVICES),
+                              device)
+            moved = fraud & (rng.random(count) < 0.5)
+            location = np.where(moved, (location + rng.integers(1, len(LOCATIONS), count))
+                                % len(LOCATIONS), location)
+
+        arrivals = self._clock + np.cumsum(rng.exponential(1e6 / self.rate, count))
+        self._clock = float(arrivals[-1])
+        return {
+            "user_id": pop.user_ids[users],
+            "amount": amount,
+            "hour": hour,
+            "device_id": _DEVICES[device],
+            "location": _LOCATIONS[location],
+            "merchant_id": _MERCHANTS[merchant],
+            "timestamp": arrivals.astype(np.int64),
+            "injected_fraud": fraud,
+        }
+
+    def seconds_since_start(self, timestamps: np.ndarray) -> np.ndarray:
+        """Simulated seconds from the stream start to each timestamp (micros)."""
+        return (timestamps - self.start_micros) / 1e6
+
+
+def write_stream(path: str, generator: LoadGenerator, total: int, chunk_size: int = 100_000) -> dict:
+    """
+    Generate `total` transactions into a stream file for replay.
+
+    Returns:
+        dict with rows, seconds and rows_per_second
+    """
+    started = time.perf_counter()
+    metadata = {"source": "load_generator", "users": generator.population.num_users,
+                "rate": generator.rate, "fraud_ratio": generator.fraud_ratio}
+    with StreamWriter(path, metadata=metadata) as writer:
+        while writer.rows < total:
+            writer.write_columns(generator.generate(min(chunk_size, total - writer.rows)))
+    seconds = time.perf_counter() - started
+    return {"rows": writer.rows, "seconds": seconds,
+            "rows_per_second": writer.rows / seconds if seconds > 0 else 0.0}
+
+
+def drive(db: DatabaseManager, generator: LoadGenerator, total: int, batch_size: int = 5000,
+          paced: bool = False, callback=None) -> dict:
+    """
+    Score and store `total` generated transactions with process_transaction_batch.
+
+    Paced (open-loop): each transaction is released when its arrival time comes
+    due on the wall clock, whether or not earlier batches have finished, and
+    whatever is due is scored together (up to batch_size). Latency is measured
+    from the scheduled arrival, so time spent queued behind a slow batch counts.
+    Unpaced: batches of batch_size are scored back to back, as fast as possible.
+
+    Args:
+        callback: optional function called with (rows_done, high_risk_so_far) per batch
+
+    Returns:
+        dict with rows, high_risk, seconds, rows_per_second and, when paced,
+        target_rate, latency_p50_ms and latency_p99_ms
+    """
+    rows = high_risk = 0
+    latencies = []
+    started = time.perf_counter()
+    while rows < total:
+        columns = generator.generate(min(max(batch_size, 10_000), total - rows))
+        transactions = columns_to_transactions(columns)
+        arrivals = generator.seconds_since_start(columns["timestamp"])
+        i = 0
+        while i < len(transactions):
+            if paced:
+                now = time.perf_counter() - started
+                due = int(np.searchsorted(arrivals, now, side="right"))
+                if due <= i:
+                    time.sleep(arrivals[i] - now)
+                    continue
+                j = min(due, i + batch_size)
+            else:
+                j = i + batch_size
+            records = process_transaction_batch(db, transactions[i:j])
+            if paced:
+                latencies.append(time.perf_counter() - started - arrivals[i:j])
+            rows += len(records)
+            high_risk += sum(r["risk_level"] == "HIGH RISK" for r in records)
+            i = j
+            if callback:
+                callback(rows, high_risk)
+
+    seconds = time.perf_counter() - started
+    summary = {
+        "rows": rows,
+        "high_risk": high_risk,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else 0.0,
+    }
+    if paced:
+        latency = np.concatenate(latencies) * 1000
+        summary.update(target_rate=generator.rate,
+                       latency_p50_ms=float(np.percentile(latency, 50)),
+                       latency_p99_ms=float(np.percentile(latency, 99)))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic load for the scoring pipeline.")
+    parser.add_argument("--users", type=int, default=1_000_000,
+                        help="synthetic population size (default: 1000000)")
+    parser.add_argument("--transactions", type=int, default=100_000,
+                        help="transactions to generate (default: 100000)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="open-loop target rate in transactions/s; transactions are released "
+                             "on that schedule (default: as fast as possible)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--fraud-ratio", type=float, default=0.10,
+                        help="fraction of transactions with fraud patterns (default: 0.10)")
+    parser.add_argument("--start-time", type=datetime.fromisoformat, default=None,
+                        help="timestamp of the first transaction (default: 2024-01-01T00:00:00)")
+    parser.add_argument("--batch-size", type=int, default=5000,
+                        help="most transactions scored per batch (default: 5000)")
+    parser.add_argument("--output", default=None,
+                        help="write the stream to this file for replay instead of scoring it")
+    parser.add_argument("--db", dest="db_path", default=None,
+                        help="SQLite database path (default: database/fraud_detection.db)")
+    args = parser.parse_args(argv)
+
+    population = SyntheticPopulation(args.users, seed=args.seed)
+    # Unpaced streams still need timestamps; space them at a nominal 1000/s
+    generator = LoadGenerator(population, rate=args.rate or 1000.0, fraud_ratio=args.fraud_ratio,
+                              seed=args.seed, start_time=args.start_time)
+
+    if args.output:
+        summary = write_stream(args.output, generator, args.transactions)
+        print(f"✅ Wrote {summary['rows']:,} transactions to {args.output} in "
+              f"{summary['seconds']:.1f}s ({summary['rows_per_second']:,.0f} rows/s)")
+        return 0
+
+    db = DatabaseManager(db_path=args.db_path)
+
+    def progress(rows, high_risk):
+        print(f"\r  {rows:,} transactions scored, {high_risk:,} high risk", end="", flush=True)
+
+    summary = drive(db, generator, args.transactions, batch_size=args.batch_size,
+                    paced=args.rate is not None, callback=progress)
+    db.close()
+    print(f"\n✅ Scored {summary['rows']:,} transactions in {summary['seconds']:.1f}s "
+          f"({summary['rows_per_second']:,.0f}/s), {summary['high_risk']:,} high risk")
+    if "latency_p50_ms" in summary:
+        print(f"   target {summary['target_rate']:,.0f}/s, latency from arrival: "
+              f"p50 {summary['latency_p50_ms']:.1f} ms, p99 {summary['latency_p99_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+metrics.py — Opt-in latency histograms and counters for the scoring pipeline.
+Disabled by default: the instrumented code then pays one function call per
+transaction. Enabled, each pipeline stage is timed into a histogram that can be
+exported in Prometheus text format.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, 1 µs to 10 s (1 / 2.5 / 5 steps)
+DEFAULT_BUCKETS = tuple(float(f"{m}e{e}") for e in range(-6, 1) for m in (1, 2.5, 5)) + (10.0,)
+
+STAGE_METRIC = "fraud_stage_seconds"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus expects."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class StageTimer:
+    """Times consecutive stages: each lap() records the time since the previous one."""
+
+    __slots__ = ("registry", "started", "last")
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.started = self.last = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.registry.observe(stage, now - self.last)
+        self.last = now
+
+    def total(self, stage: str):
+        """Record the time since the timer was created."""
+        self.registry.observe(stage, time.perf_counter() - self.started)
+
+
+class Registry:
+    """Stage histograms and labelled counters."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.stages = {}    # stage -> Histogram
+        self.counters = {}  # (name, ((label, value), ...)) -> count
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def timer(self) -> StageTimer:
+        return StageTimer(self)
+
+    def snapshot(self) -> dict:
+        """Per-stage count, total and p50/p99 (estimated from the buckets), in ms."""
+        with self._lock:
+            histograms, counts = sorted(self.stages.items()), sorted(self.counters.items())
+        stages = {
+            stage: {"count": h.count, "total_ms": h.sum * 1000,
+                    "p50_ms": h.quantile(0.5) * 1000, "p99_ms": h.quantile(0.99) * 1000}
+            for stage, h in histograms
+        }
+        counters = {f"{name}{_labels(labels)}": value for (name, labels), value in counts}
+        return {"stages": stages, "counters": counters}
+
+
+# ── Global switch ─────────────────────────────────────────────────
+
+_registry = None
+
+
+def enable(buckets=DEFAULT_BUCKETS) -> Registry:
+    """Start recording (keeps the current registry if already enabled). Returns the registry."""
+    global _registry
+    if _registry is None:
+        _registry = Registry(buckets)
+    return _registry
+
+
+def disable():
+    global _registry
+    _registry = None
+
+
+def get_registry():
+    """The active Registry, or None when metrics are off."""
+    return _registry
+
+
+def timer():
+    """A StageTimer when metrics are on, else None (check with `if t:` before lap())."""
+    registry = _registry
+    return registry.timer() if registry is not None else None
+
+
+# ── Export ────────────────────────────────────────────────────────
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus(registry: Registry) -> str:
+    """The registry in Prometheus text exposition format (version 0.0.4)."""
+    with registry._lock:
+        stages, counters = sorted(registry.stages.items()), sorted(registry.counters.items())
+    lines = [f"# HELP {STAGE_METRIC} Time spent in each scoring pipeline stage.",
+             f"# TYPE {STAGE_METRIC} histogram"]
+    for stage, h in stages:
+        with h._lock:
+            counts, count, total = list(h.counts), h.count, h.sum
+        cumulative = 0
+        for bound, n in zip((*h.buckets, "+Inf"), counts):
+            cumulative += n
+            le = bound if isinstance(bound, str) else repr(float(bound))
+            lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'{STAGE_METRIC}_sum{{stage="{stage}"}} {total!r}')
+        lines.append(f'{STAGE_METRIC}_count{{stage="{stage}"}} {count}')
+
+    declared = set()
+    for (name, labels), value in counters:
+        if name not in declared:
+            lines.append(f"# TYPE {name} counter")
+            declared.add(name)
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusFileExporter:
+    """
+    Writes the registry to a .prom file (e.g. for node_exporter's textfile
+    collector), replacing it atomically so scrapers never see a partial file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, registry: Registry):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        partial = f"{self.path}.partial"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(render_prometheus(registry))
+        os.replace(partial, self.path)
+
+
+class PeriodicExporter:
+    """
+    Calls `exporter(registry)` every `interval` seconds on a daemon thread, and
+    once more on stop(). Any callable taking a Registry works as an exporter.
+    """
+
+    def __init__(self, exporter, interval: float = 15.0, registry: Registry = None):
+        self.exporter = exporter
+        self.interval = interval
+        self.registry = registry or enable()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.exporter(self.registry)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.exporter(self.registry)
@@ -0,0 +1,587 @@
+"""
+model_registry.py — Versioned fraud models, hot-swappable while scoring runs.
+
+The shipped bundle (model/fraud_detection_model.joblib) is version "v1"; more
+versions live in model/versions/<version>.joblib, each with its compiled NumPy
+artifact. model/registry.json names the active version and, optionally, a
+shadow version scored alongside it for comparison. Every process polls that
+file and swaps models without restarting; a swap replaces one reference, so
+each call or batch is scored entirely by one model.
+
+Run: python -m src.model_registry list
+     python -m src.model_registry register path/to/bundle.joblib v2 [--activate]
+     python -m src.model_registry activate v2
+     python -m src.model_registry shadow v3        # or: shadow --off
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from operator import itemgetter
+
+import numpy as np
+
+from src.data_processing import build_feature_dataframe, ENCODER, FEATURE_COLUMNS
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+MODEL_PATH = os.path.join(MODEL_DIR, "fraud_detection_model.joblib")
+# Compiled artifact: rows coef, scaler mean, scaler scale; the sidecar holds the rest
+ARTIFACT_PATH = os.path.join(MODEL_DIR, "fraud_detection_model.npy")
+ARTIFACT_FORMAT = 1
+
+# Version name of the bundle at MODEL_PATH
+BASE_VERSION = "v1"
+_VERSION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+_feature_values = itemgetter(*FEATURE_COLUMNS)
+
+
+# ── Compiled scoring ──────────────────────────────────────────────
+
+class CompiledScorer:
+    """
+    Logistic regression with the standard scaler folded into its weights.
+
+    Scaling is linear, so ((x - mean) / scale) . coef + b is rewritten once as
+    x . (coef / scale) + (b - sum(coef * mean / scale)). Scoring is then one
+    dot product and a sigmoid, with no pandas or sklearn input validation.
+    """
+
+    def __init__(self, weights: np.ndarray, intercept: float):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.intercept = float(intercept)
+        self._local = threading.local()
+
+    @classmethod
+    def from_arrays(cls, coef, mean, scale, intercept: float):
+        """Fold StandardScaler statistics into logistic regression coefficients."""
+        weights = np.asarray(coef, dtype=np.float64) / np.asarray(scale, dtype=np.float64)
+        return cls(weights, float(intercept) - float(np.dot(weights, mean)))
+
+    @classmethod
+    def from_bundle(cls, bundle: dict):
+        """Fold a bundle's scaler into its model. Returns None if the bundle can't be folded."""
+        arrays = _bundle_arrays(bundle)
+        return cls.from_arrays(*arrays) if arrays is not None else None
+
+    def _buffer(self) -> np.ndarray:
+        # One preallocated feature vector per thread (dashboard + simulator share the scorer)
+        buf = getattr(self._local, "buffer", None)
+        if buf is None:
+            buf = self._local.buffer = np.zeros(len(self.weights), dtype=np.float64)
+        return buf
+
+    def score_features(self, features: dict) -> float:
+        """Fraud probability for one feature dict from compute_behavioral_features."""
+        buf = self._buffer()
+        buf[:] = _feature_values(features)
+        z = float(buf @ self.weights) + self.intercept
+        try:
+            return 1.0 / (1.0 + math.exp(-z))
+        except OverflowError:
+            return 0.0
+
+    def score_transaction(self, features: dict, transaction: dict, encoder=ENCODER) -> float:
+        """
+        score_features without reading the one-hot part of `features`: the
+        non-categorical values are copied into the preallocated row and each of
+        the transaction's categories is set in place by its column offset.
+        """
+        buf = self._buffer()
+        buf.fill(0.0)
+        buf[encoder.dense_columns] = encoder.dense_values(features)
+        z = float(encoder.encode_row(buf, transaction) @ self.weights) + self.intercept
+        try:
+            return 1.0 / (1.0 + math.exp(-z))
+        except OverflowError:
+            return 0.0
+
+    def score_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """Fraud probabilities for an (N, 24) feature matrix."""
+        z = matrix @ self.weights + self.intercept
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-z))
+
+    def score_sparse(self, dense: np.ndarray, active: np.ndarray, encoder=ENCODER) -> np.ndarray:
+        """
+        Fraud probabilities for features in the sparse form of
+        compute_sparse_feature_rows. A one-hot column contributes its weight
+        when set and nothing otherwise, so the categorical part of each score
+        is a sum of one gathered weight per field, whatever the vocabulary size.
+        """
+        # Index -1 (unknown value) lands on the appended zero weight
+        padded = np.append(self.weights, 0.0)
+        z = dense @ self.weights[encoder.dense_columns] + padded[active].sum(axis=1)
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-(z + self.intercept)))
+
+
+# ── Artifacts ─────────────────────────────────────────────────────
+
+def _bundle_arrays(bundle: dict):
+    """(coef, mean, scale, intercept) of a LogisticRegression + StandardScaler bundle, else None."""
+    model, scaler = bundle["model"], bundle["scaler"]
+    coef = getattr(model, "coef_", None)
+    if (coef is None or coef.shape[0] != 1 or len(getattr(model, "classes_", ())) != 2
+            or type(scaler).__name__ != "StandardScaler"
+            or list(bundle["feature_columns"]) != FEATURE_COLUMNS):
+        return None
+
+    coef = coef[0].astype(np.float64)
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros_like(coef)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones_like(coef)
+    return coef, np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64), \
+        float(model.intercept_[0])
+
+
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _sidecar_path(artifact_path: str) -> str:
+    return os.path.splitext(artifact_path)[0] + ".json"
+
+
+def load_bundle(path: str = MODEL_PATH) -> dict:
+    """The full joblib bundle (sklearn model and scaler). Imports joblib and sklearn."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model not found at {path}")
+    import joblib
+    return joblib.load(path)
+
+
+def compile_model_artifact(bundle_path: str = MODEL_PATH,
+                           artifact_path: str = ARTIFACT_PATH) -> dict:
+    """
+    Write the bundle's coefficients and scaler statistics as one .npy array
+    and its intercept, threshold and metadata as a JSON sidecar. The sidecar records the bundle's SHA-256, so an artifact left
+    over from an older bundle is ignored.
+
+    Returns:
+        the sidecar metadata
+
+    Raises:
+        ValueError: if the bundle isn't a LogisticRegression + StandardScaler pair
+    """
+    bundle = load_bundle(bundle_path)
+    arrays = _bundle_arrays(bundle)
+    if arrays is None:
+        raise ValueError("only LogisticRegression + StandardScaler bundles can be compiled")
+    coef, mean, scale, intercept = arrays
+
+    meta = {
+        "format": ARTIFACT_FORMAT,
+        "intercept": intercept,
+        "threshold": float(bundle["threshold"]),
+        "feature_columns": list(bundle["feature_columns"]),
+        "model_type": type(bundle["model"]).__name__,
+        "scaler_type": type(bundle["scaler"]).__name__,
+        "source_sha256": _file_digest(bundle_path),
+    }
+    np.save(artifact_path, np.vstack([coef, mean, scale]))
+    with open(_sidecar_path(artifact_path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _load_artifact(artifact_path: str = ARTIFACT_PATH, bundle_path: str = MODEL_PATH):
+    """(sidecar metadata, CompiledScorer) from a compiled artifact; None if missing or stale."""
+    sidecar = _sidecar_path(artifact_path)
+    if not (os.path.exists(artifact_path) and os.path.exists(sidecar)):
+        return None
+    with open(sidecar, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != ARTIFACT_FORMAT or meta["feature_columns"] != FEATURE_COLUMNS:
+        return None
+    if os.path.exists(bundle_path) and meta["source_sha256"] != _file_digest(bundle_path):
+        return None  # compiled from a different bundle
+
+    coef, mean, scale = np.load(artifact_path)
+    return meta, CompiledScorer.from_arrays(coef, mean, scale, meta["intercept"])
+
+
+# ── Versions ──────────────────────────────────────────────────────
+
+class ModelVersion:
+    """
+    One loaded model version: its compiled scorer, plus the sklearn model and
+    scaler when it was loaded from the joblib bundle (needed if it can't be compiled).
+    """
+
+    def __init__(self, version: str, threshold: float, model_type: str, scaler_type: str,
+                 source: str, scorer: CompiledScorer = None, model=None, scaler=None):
+        self.version = version
+        self.threshold = float(threshold)
+        self.model_type = model_type
+        self.scaler_type = scaler_type
+        self.source = source  # "artifact" or "joblib"
+        self.scorer = scorer
+        self.model = model
+        self.scaler = scaler
+
+    def score_features(self, features: dict) -> float:
+        """Fraud probability for one feature dict."""
+        if self.scorer is not None:
+            return self.scorer.score_features(features)
+        scaled = self.scaler.transform(build_feature_dataframe(features).values)
+        return float(self.model.predict_proba(scaled)[0][1])
+
+    def score_transaction(self, features: dict, transaction: dict) -> float:
+        """Fraud probability for one transaction and its feature dict."""
+        if self.scorer is not None:
+            return self.scorer.score_transaction(features, transaction)
+        return self.score_features(features)
+
+    def score_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """Fraud probabilities for an (N, 24) feature matrix."""
+        if self.scorer is not None:
+            return self.scorer.score_matrix(matrix)
+        return self.model.predict_proba(self.scaler.transform(matrix))[:, 1]
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "model_type": self.model_type,
+            "scaler_type": self.scaler_type,
+            "threshold": self.threshold,
+            "source": self.source,
+        }
+
+
+class PairedScorer:
+    """
+    An active and a shadow CompiledScorer stacked into one (24, 2) weight
+    matrix, so a batch is scored by both models in a single matrix product.
+    """
+
+    def __init__(self, active: CompiledScorer, shadow: CompiledScorer):
+        self.weights = np.column_stack([active.weights, shadow.weights])
+        self.intercepts = np.array([active.intercept, shadow.intercept])
+
+    def score_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """(N, 2) fraud probabilities: column 0 active, column 1 shadow."""
+        z = matrix @ self.weights + self.intercepts
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-z))
+
+
+def load_version(version: str, bundle_path: str, artifact_path: str) -> ModelVersion:
+    """
+    Load a model version from its compiled artifact when it matches the bundle,
+    otherwise from the joblib bundle.
+
+    Raises:
+        FileNotFoundError: if there is no bundle (and no artifact) at the paths
+        ValueError: if the bundle was trained on different feature columns
+    """
+    loaded = _load_artifact(artifact_path, bundle_path)
+    if loaded is not None:
+        meta, scorer = loaded
+        return ModelVersion(version, meta["threshold"], meta["model_type"], meta["scaler_type"],
+                            "artifact", scorer)
+
+    bundle = load_bundle(bundle_path)
+    if list(bundle["feature_columns"]) != FEATURE_COLUMNS:
+        raise ValueError(f"model {version} expects different feature columns")
+    return ModelVersion(version, bundle["threshold"], type(bundle["model"]).__name__,
+                        type(bundle["scaler"]).__name__, "joblib",
+                        CompiledScorer.from_bundle(bundle), bundle["model"], bundle["scaler"])
+
+
+# ── Registry ──────────────────────────────────────────────────────
+
+class ModelRegistry:
+    """
+    Model versions under `directory`, one of them active and optionally one
+    scored in shadow.
+
+    Scoring code takes current() once per call or batch and uses what it
+    returns throughout. activate(), set_shadow() and poll() load the new model
+    first and then replace the (active, shadow, paired) tuple in one
+    assignment, so scoring never waits on a load or sees half a swap. With
+    persist=True the choice is written to registry.json, which every process
+    checks at most every `poll_interval` seconds.
+    """
+
+    def __init__(self, directory: str = MODEL_DIR, poll_interval: float = 2.0):
+        """
+        Args:
+            directory: holds the base bundle, registry.json and versions/
+            poll_interval: seconds between checks of registry.json (None: never check)
+        """
+        self.directory = directory
+        self.versions_dir = os.path.join(directory, "versions")
+        self.manifest_path = os.path.join(directory, "registry.json")
+        self.poll_interval = poll_interval
+        self.error = None  # why the last registry.json change couldn't be applied
+        self._models = {}  # version -> ModelVersion
+        self._lock = threading.RLock()  # guards swaps of _current and registry.json
+        self._load_lock = threading.Lock()  # guards loads into _models
+        self._current = None  # (active, shadow or None, PairedScorer or None)
+        self._manifest_stamp = None
+        self._next_poll = 0.0
+        self._shadow_stats = {}  # shadow version -> [scored, disagreements, sum of |difference|]
+
+    def paths(self, version: str) -> tuple:
+        """(bundle path, artifact path) of a version."""
+        if version == BASE_VERSION and not os.path.exists(
+                os.path.join(self.versions_dir, f"{version}.joblib")):
+            return (os.path.join(self.directory, os.path.basename(MODEL_PATH)),
+                    os.path.join(self.directory, os.path.basename(ARTIFACT_PATH)))
+        return (os.path.join(self.versions_dir, f"{version}.joblib"),
+                os.path.join(self.versions_dir, f"{version}.npy"))
+
+    def versions(self) -> list:
+        """Names of the versions on disk, base version first."""
+        names = []
+        if os.path.isdir(self.versions_dir):
+            names = sorted(name[:-len(".joblib")] for name in os.listdir(self.versions_dir)
+                           if name.endswith(".joblib"))
+        if BASE_VERSION not in names and os.path.exists(self.paths(BASE_VERSION)[0]):
+            names.insert(0, BASE_VERSION)
+        return names
+
+    def get(self, version: str) -> ModelVersion:
+        """A version, loaded on first use and kept in memory."""
+        model = self._models.get(version)
+        if model is None:
+            with self._load_lock:
+                model = self._models.get(version)
+                if model is None:
+                    if version not in self.versions():
+                        raise ValueError(f"unknown model version {version!r}")
+                    model = self._models[version] = load_version(version, *self.paths(version))
+        return model
+
+    def register(self, bundle_path: str, version: str, activate: bool = False) -> ModelVersion:
+        """
+        Copy a joblib bundle into versions/ as `version`, compile its artifact
+        and load it. With activate=True it also becomes the active version in
+        registry.json.
+
+        Raises:
+            ValueError: if the name is invalid or taken, or the bundle doesn't fit the features
+        """
+        if not _VERSION_NAME.fullmatch(version):
+            raise ValueError(f"invalid version name {version!r}")
+        if version in self.versions():
+            raise ValueError(f"model version {version!r} already exists")
+        bundle, artifact = self.paths(version)
+        os.makedirs(self.versions_dir, exist_ok=True)
+        shutil.copyfile(bundle_path, bundle)
+        try:
+            try:
+                compile_model_artifact(bundle, artifact)
+            except ValueError:
+                pass  # not a LogisticRegression + StandardScaler pair: scored through sklearn
+            model = self.get(version)
+        except Exception:
+            os.remove(bundle)
+            raise
+        if activate:
+            self.activate(version, persist=True)
+        return model
+
+    # ── Swapping ──────────────────────────────────────────────────
+
+    def current(self) -> tuple:
+        """(active ModelVersion, shadow ModelVersion or None, PairedScorer or None)."""
+        if self.poll_interval is not None and time.monotonic() >= self._next_poll:
+            self.poll()
+        current = self._current
+        if current is None:
+            with self._lock:
+                if self._current is None:
+                    manifest = self._read_manifest()
+                    self._swap(manifest.get("active") or BASE_VERSION, manifest.get("shadow"))
+                current = self._current
+        return current
+
+    def activate(self, version: str, persist: bool = False):
+        """Score with `version` from now on (clears the shadow if it was `version`)."""
+        self.get(version)  # load before taking the lock
+        with self._lock:
+            # current() loads registry.json first, so a fresh process keeps its shadow
+            shadow = self.current()[1]
+            shadow = shadow.version if shadow else None
+            self._swap(version, None if shadow == version else shadow)
+            if persist:
+                self._write_manifest()
+
+    def set_shadow(self, version: str = None, persist: bool = False):
+        """Score `version` alongside the active model without acting on it (None: stop)."""
+        if version:
+            self.get(version)  # load before taking the lock
+        with self._lock:
+            active = self.current()[0]
+            if version == active.version:
+                raise ValueError(f"{version} is the active version")
+            self._swap(active.version, version)
+            if persist:
+                self._write_manifest()
+
+    def _load(self, active: str, shadow: str = None) -> tuple:
+        """The (active, shadow, paired) tuple for two versions, loading them if needed."""
+        active_model = self.get(active)
+        shadow_model = self.get(shadow) if shadow else None
+        paired = None
+        if shadow_model is not None and active_model.scorer and shadow_model.scorer:
+            paired = PairedScorer(active_model.scorer, shadow_model.scorer)
+        return active_model, shadow_model, paired
+
+    def _swap(self, active: str, shadow: str = None):
+        self._current = self._load(active, shadow)
+
+    def poll(self):
+        """
+        Apply registry.json if it changed since the last look. The models are
+        loaded before taking the lock, which is held only to swap them in.
+        """
+        self._next_poll = time.monotonic() + (self.poll_interval or 0.0)
+        seen = self._manifest_stamp
+        stamp = _file_stamp(self.manifest_path)
+        if stamp == seen:
+            return
+        if self._current is None and stamp is None:
+            self._manifest_stamp = stamp
+            return  # nothing loaded yet and nothing to apply
+        manifest = self._read_manifest()
+        current, error = None, None
+        try:
+            current = self._load(manifest.get("active") or BASE_VERSION, manifest.get("shadow"))
+        except (OSError, ValueError) as e:
+            # Keep scoring with the current models rather than failing every call
+            error = f"{self.manifest_path}: {e}"
+        with self._lock:
+            if self._manifest_stamp != seen:
+                return  # a concurrent poll, activate() or set_shadow() got there first
+            self._manifest_stamp = stamp
+            self.error = error
+            if current is not None:
+                self._current = current
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            self.error = f"{self.manifest_path}: {e}"
+            return {}
+
+    def _write_manifest(self):
+        active, shadow, _ = self._current
+        manifest = {"active": active.version, "shadow": shadow.version if shadow else None}
+        partial = f"{self.manifest_path}.partial"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(partial, self.manifest_path)
+        self._manifest_stamp = _file_stamp(self.manifest_path)
+
+    # ── Shadow results ────────────────────────────────────────────
+
+    def record_shadow(self, shadow: ModelVersion, active_probabilities, shadow_probabilities,
+                      threshold: float):
+        """Tally how a shadow model's scores differ from the active model's."""
+        active_probabilities = np.asarray(active_probabilities, dtype=np.float64)
+        shadow_probabilities = np.asarray(shadow_probabilities, dtype=np.float64)
+        disagreements = int(np.count_nonzero((active_probabilities >= threshold)
+                                             != (shadow_probabilities >= shadow.threshold)))
+        difference = float(np.abs(active_probabilities - shadow_probabilities).sum())
+        with self._lock:
+            stats = self._shadow_stats.setdefault(shadow.version, [0, 0, 0.0])
+            stats[0] += len(active_probabilities)
+            stats[1] += disagreements
+            stats[2] += difference
+
+    def shadow_stats(self) -> dict:
+        """Per shadow version: scored, disagreements (different risk level), mean_abs_diff."""
+        with self._lock:
+            return {
+                version: {"scored": scored, "disagreements": disagreements,
+                          "mean_abs_diff": difference / scored if scored else 0.0}
+                for version, (scored, disagreements, difference) in self._shadow_stats.items()
+            }
+
+    def status(self) -> dict:
+        active, shadow, _ = self.current()
+        return {"versions": self.versions(), "active": active.info(),
+                "shadow": shadow.info() if shadow else None,
+                "shadow_stats": self.shadow_stats(), "error": self.error}
+
+
+def _file_stamp(path: str):
+    """
+    The file's contents, None if it doesn't exist. registry.json is a few
+    dozen bytes; inode, mtime and size can all repeat across two quick rewrites.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """The process-wide registry over model/, created on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned fraud models.")
+    parser.add_argument("--dir", default=MODEL_DIR, help="model directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list versions, the active one and the shadow")
+    register_parser = commands.add_parser("register", help="add a joblib bundle as a new version")
+    register_parser.add_argument("bundle", help="joblib bundle to add")
+    register_parser.add_argument("version", help="name for the new version, e.g. v2")
+    register_parser.add_argument("--activate", action="store_true", help="make it active now")
+    activate_parser = commands.add_parser("activate", help="switch every process to a version")
+    activate_parser.add_argument("version")
+    shadow_parser = commands.add_parser("shadow", help="score a version in shadow")
+    shadow_parser.add_argument("version", nargs="?")
+    shadow_parser.add_argument("--off", action="store_true", help="stop shadow scoring")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.dir, poll_interval=None)
+    if args.command == "register":
+        model = registry.register(args.bundle, args.version, activate=args.activate)
+        print(f"✅ Registered {model.version} ({model.model_type}, threshold {model.threshold}, "
+              f"loads from the {model.source})" + (", now active" if args.activate else ""))
+    elif args.command == "activate":
+        registry.activate(args.version, persist=True)
+        print(f"✅ {args.version} is active; running processes switch within a few seconds")
+    elif args.command == "shadow":
+        if not args.off and not args.version:
+            parser.error("shadow needs a version or --off")
+        registry.set_shadow(None if args.off else args.version, persist=True)
+        print("✅ Shadow scoring off" if args.off else f"✅ Scoring {args.version} in shadow")
+    else:
+        active, shadow, _ = registry.current()
+        for version in registry.versions():
+            role = ("active" if version == active.version
+                    else "shadow" if shadow and version == shadow.version else "")
+            print(f"{version:<12} {role}".rstrip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+partitions.py — Time periods for partitioned transaction storage, and partition archives.
+A partition holds one day or one month of transactions in its own table; archived
+partitions are written out as gzip-compressed JSON lines.
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+GRANULARITIES = ("day", "month")
+
+# Every partition table name starts with this, followed by the period (YYYYMM or YYYYMMDD)
+PARTITION_PREFIX = "transactions_p"
+
+
+def partition_period(timestamp: str, granularity: str):
+    """
+    The partition a timestamp belongs to.
+
+    Returns:
+        (table name, period start, period end) with ISO-8601 bounds, end
+        exclusive; None if the timestamp can't be parsed
+    """
+    try:
+        dt = datetime.fromisoformat(timestamp)
+    except (ValueError, TypeError):
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+    if granularity == "day":
+        start = datetime(dt.year, dt.month, dt.day)
+        end = start + timedelta(days=1)
+        name = f"{PARTITION_PREFIX}{start:%Y%m%d}"
+    elif granularity == "month":
+        start = datetime(dt.year, dt.month, 1)
+        end = datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1)
+        name = f"{PARTITION_PREFIX}{start:%Y%m}"
+    else:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}, got {granularity!r}")
+    return name, start.isoformat(), end.isoformat()
+
+
+def write_archive(path: str, rows) -> int:
+    """
+    Write transaction dicts to a gzip-compressed JSON-lines file.
+    The file appears under its final name only once it is complete.
+    Returns the number of rows written.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    partial = f"{path}.partial"
+    count = 0
+    with gzip.open(partial, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    os.replace(partial, path)
+    return count
+
+
+def read_archive(path: str):
+    """Yield the transaction dicts stored in an archive written by write_archive."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
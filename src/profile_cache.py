@@ -0,0 +1,255 @@
+"""
+profile_cache.py — In-memory user profile store with write-behind to SQLite.
+Serves profile reads from an LRU cache and batches profile writes in the background.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ProfileCache:
+    """
+    Bounded LRU cache of user behavioral profiles.
+
+    Reads are served from memory; misses fall through to `loader`. Updates are
+    applied in memory and marked dirty; dirty profiles are handed to `writer`
+    in batches, either every `flush_interval` seconds or as soon as
+    `flush_threshold` users are dirty. A dirty profile evicted from the LRU is
+    kept until it has been written, so no update is lost.
+    """
+
+    def __init__(self, loader, writer, max_users: int = 100_000,
+                 flush_interval: float = 1.0, flush_threshold: int = 1000,
+                 bulk_loader=None):
+        """
+        Args:
+            loader: function(user_id) -> profile dict, used on a cache miss
+            writer: function(list of profile dicts), persists a batch of profiles
+            bulk_loader: function(list of user_ids) -> {user_id: profile}, used by
+                get_many() to load all of its misses at once (default: loader per user)
+            max_users: number of profiles kept in memory
+            flush_interval: seconds between background flushes (None = no
+                background thread; flush when the threshold is reached)
+            flush_threshold: dirty-profile count that triggers an early flush
+        """
+        self._loader = loader
+        self._writer = writer
+        self._bulk_loader = bulk_loader
+        self.max_users = max_users
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+
+        self._entries = OrderedDict()  # user_id -> profile, least recently used first
+        self._dirty = {}               # user_id -> profile awaiting write
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.profiles_written = 0
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        if flush_interval is not None:
+            self._thread = threading.Thread(target=self._flush_loop, name="profile-cache-flush",
+                                            daemon=True)
+            self._thread.start()
+
+    # ── Reads ──────────────────────────────────────────────────────
+
+    def _lookup(self, user_id):
+        """Return the cached profile (not a copy) or None. Caller holds the lock."""
+        profile = self._entries.get(user_id)
+        if profile is not None:
+            self._entries.move_to_end(user_id)
+            return profile
+        profile = self._dirty.get(user_id)
+        if profile is not None:
+            self._insert(user_id, profile)
+        return profile
+
+    def _insert(self, user_id, profile):
+        self._entries[user_id] = profile
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _get_or_load(self, user_id, count_lookup: bool = True) -> dict:
+        with self._lock:
+            profile = self._lookup(user_id)
+            if count_lookup:
+                if profile is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if profile is not None:
+                return profile
+
+        loaded = self._loader(user_id)
+        with self._lock:
+            # Another thread may have loaded or updated this user meanwhile
+            profile = self._lookup(user_id)
+            if profile is None:
+                profile = loaded
+                self._insert(user_id, profile)
+            return profile
+
+    def get(self, user_id: int) -> dict:
+        """Return a copy of the user's profile, loading it on a miss."""
+        profile = self._get_or_load(user_id)
+        with self._lock:
+            return dict(profile)
+
+    def get_many(self, user_ids) -> dict:
+        """Copies of several users' profiles, loading every miss in one bulk_loader call."""
+        found, missing = {}, []
+        with self._lock:
+            for uid in user_ids:
+                profile = self._lookup(uid)
+                if profile is not None:
+                    self.hits += 1
+                    found[uid] = dict(profile)
+                else:
+                    self.misses += 1
+                    missing.append(uid)
+        if not missing:
+            return found
+
+        if self._bulk_loader is not None:
+            loaded = self._bulk_loader(missing)
+        else:
+            loaded = {uid: self._loader(uid) for uid in missing}
+        with self._lock:
+            for uid in missing:
+                # Another thread may have loaded or updated this user meanwhile
+                profile = self._lookup(uid)
+                if profile is None:
+                    profile = loaded[uid]
+                    self._insert(uid, profile)
+                found[uid] = dict(profile)
+        return found
+
+    # ── Writes ─────────────────────────────────────────────────────
+
+    def apply_transaction(self, user_id: int, amount: float, device_id: str,
+                          location: str, timestamp: str) -> dict:
+        """Fold a transaction into the user's profile (running average) and mark it dirty."""
+        # Scoring already counted this user's lookup; don't count the write as a hit
+        loaded = self._get_or_load(user_id, count_lookup=False)
+        with self._lock:
+            profile = self._lookup(user_id)
+            if profile is None:  # evicted between the load and now
+                profile = loaded
+                self._insert(user_id, profile)
+            count = profile["transaction_count"] + 1
+            profile["avg_amount"] = ((profile["avg_amount"] * profile["transaction_count"])
+                                     + amount) / count
+            profile["last_device"] = device_id
+            profile["usual_location"] = location
+            profile["transaction_count"] = count
+            profile["last_transaction_time"] = timestamp
+            self._dirty[user_id] = profile
+            n_dirty = len(self._dirty)
+            updated = dict(profile)
+
+        if n_dirty >= self.flush_threshold:
+            if self._thread is not None:
+                self._wakeup.set()
+            else:
+                self.flush()
+        return updated
+
+    def store(self, profiles: list, dirty: bool = False):
+        """
+        Replace cached profiles with complete ones computed elsewhere (bulk paths).
+        With dirty=False the caller has already persisted them.
+        """
+        with self._lock:
+            for profile in profiles:
+                uid = profile["user_id"]
+                current = self._entries.get(uid) or self._dirty.get(uid)
+                if current is not None:
+                    current.update(profile)
+                else:
+                    current = dict(profile)
+                    self._insert(uid, current)
+                if dirty:
+                    self._dirty[uid] = current
+                else:
+                    self._dirty.pop(uid, None)
+            n_dirty = len(self._dirty)
+
+        if n_dirty >= self.flush_threshold:
+            if self._thread is not None:
+                self._wakeup.set()
+            else:
+                self.flush()
+
+    def flush(self) -> int:
+        """Write all dirty profiles. Returns the number of profiles written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                batch = {uid: dict(p) for uid, p in self._dirty.items()}
+                self._dirty.clear()
+            try:
+                self._writer(list(batch.values()))
+            except Exception:
+                with self._lock:
+                    # Put back anything not re-dirtied since, so the next flush retries it
+                    for uid, snapshot in batch.items():
+                        if uid not in self._dirty:
+                            self._dirty[uid] = self._entries.get(uid, snapshot)
+                raise
+            with self._lock:
+                self.flushes += 1
+                self.profiles_written += len(batch)
+            return len(batch)
+
+    def _flush_loop(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the profiles dirty and retry on the next tick
+                pass
+
+    # ── Lifecycle ──────────────────────────────────────────────────
+
+    def clear(self):
+        """Drop all cached and pending profiles without writing them."""
+        with self._flush_lock, self._lock:
+            self._entries.clear()
+            self._dirty.clear()
+
+    def close(self):
+        """Stop the background flusher and write everything still dirty."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and cache occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_users": self.max_users,
+                "dirty": len(self._dirty),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "miss_rate": self.misses / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "flushes": self.flushes,
+                "profiles_written": self.profiles_written,
+            }
@@ -0,0 +1,310 @@
+"""
+replay.py — Record transaction streams to stream files and replay them in simulated time.
+Replays feed the recorded transactions, with their recorded timestamps, through
+process_transaction into a fresh database, so runs are reproducible and comparable.
+
+Run: python -m src.replay record stream.npz --simulate 10000 --seed 1
+     python -m src.replay run stream.npz --speed 10 --scores scores.npz
+     python -m src.replay compare baseline_scores.npz scores.npz
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src import metrics
+from src.database_manager import DatabaseManager
+from src.fraud_prediction import warmup
+from src.simulator import (USER_PROFILES_SEED, generate_normal_transaction,
+                           inject_fraud_patterns, process_transaction, process_transaction_batch)
+from src.stream_file import StreamWriter, columns_to_transactions, read_columns, read_metadata
+
+
+# ── Recording ─────────────────────────────────────────────────────
+
+def simulated_transactions(count: int, fraud_ratio: float = 0.10, seed: int = 0,
+                           start_time: datetime = None, interval_seconds: float = 1.0):
+    """
+    Yield simulator transactions on a simulated clock: the n-th is stamped
+    start_time + n * interval_seconds and gets ID SIM-<n>. Seeded, so the same
+    arguments always give the same stream.
+    """
+    outer_state = random.getstate()
+    random.seed(seed)
+    seeded_state = random.getstate()
+    random.setstate(outer_state)
+
+    start_time = start_time or datetime(2024, 1, 1)
+    step = timedelta(seconds=interval_seconds)
+    for chunk_start in range(0, count, 10_000):
+        # Draw from the seeded state, leaving the caller's random state untouched
+        outer_state = random.getstate()
+        random.setstate(seeded_state)
+        chunk = []
+        try:
+            for i in range(chunk_start, min(chunk_start + 10_000, count)):
+                user_seed = random.choice(USER_PROFILES_SEED)
+                txn = generate_normal_transaction(user_seed, now=start_time + step * i)
+                if random.random() < fraud_ratio:
+                    txn = inject_fraud_patterns(txn, user_seed)
+                txn["transaction_id"] = f"SIM-{i:09d}"
+                chunk.append(txn)
+        finally:
+            seeded_state = random.getstate()
+            random.setstate(outer_state)
+        yield from chunk
+
+
+def record(path: str, transactions, chunk_size: int = 50_000, metadata: dict = None) -> int:
+    """
+    Write an iterable of transaction dicts (generated, stored or real) to a stream file.
+    Only the raw fields are kept; scores are recomputed on replay.
+    Returns the number of transactions written.
+    """
+    with StreamWriter(path, metadata=metadata) as writer:
+        chunk = []
+        for txn in transactions:
+            chunk.append(txn)
+            if len(chunk) >= chunk_size:
+                writer.write(chunk)
+                chunk = []
+        writer.write(chunk)
+    return writer.rows
+
+
+# ── Replay ────────────────────────────────────────────────────────
+
+def replay(db: DatabaseManager, path: str, speed: float = None, batch_size: int = 1,
+           limit: int = None, scores_path: str = None, callback=None) -> dict:
+    """
+    Replay a stream file through the pipeline in simulated time.
+
+    Transactions keep their recorded timestamps, so velocity and profiles
+    evolve exactly as they did when recorded. With `speed`, transaction n is
+    released (recorded gap from the first transaction) / speed seconds after
+    the start, e.g. speed=10 replays an hour in six minutes; without it the
+    stream is replayed as fast as possible.
+
+    Args:
+        db: database to replay into; start from an empty one for comparable runs
+        path: stream file written by record() or load_generator
+        speed: simulated seconds per wall-clock second (None = as fast as possible)
+        batch_size: 1 replays through process_transaction; more uses
+            process_transaction_batch (same scores, fewer commits)
+        limit: stop after this many transactions
+        scores_path: also save transaction_id, fraud_probability and risk_level
+            per transaction here, for compare_scores()
+        callback: optional function called with (rows_done, high_risk_so_far) per batch
+
+    Returns:
+        dict with rows, high_risk, seconds, rows_per_second, latency_p50_ms,
+        latency_p99_ms and score_digest (equal digests mean identical scores).
+        Latency is per transaction: processing time, plus, when paced, any time
+        spent behind schedule.
+    """
+    total = read_metadata(path)["rows"]
+    limit = total if limit is None else min(limit, total)
+    warmup()  # load the model up front so it isn't timed as the first transaction
+    rows = high_risk = 0
+    latencies, ids, probabilities, risks = [], [], [], []
+    digest = hashlib.sha256()
+    first = None
+    started = time.perf_counter()
+
+    for columns in read_columns(path):
+        if rows >= limit:
+            break
+        columns = {name: values[:limit - rows] for name, values in columns.items()}
+        transactions = columns_to_transactions(columns)
+        if first is None:
+            first = int(columns["timestamp"][0])
+        due = (columns["timestamp"] - first) / 1e6 / speed if speed else None
+
+        for i in range(0, len(transactions), batch_size):
+            batch = transactions[i:i + batch_size]
+            if due is not None:
+                release = due[i + len(batch) - 1]
+                wait = release - (time.perf_counter() - started)
+                if wait > 0:
+                    time.sleep(wait)
+            batch_started = time.perf_counter()
+            if batch_size == 1:
+                records = [process_transaction(db, batch[0])]
+            else:
+                records = process_transaction_batch(db, batch)
+            finished = time.perf_counter()
+            if due is not None:
+                latencies.append(finished - started - due[i:i + len(batch)])
+            else:
+                latencies.append(np.full(len(batch), finished - batch_started))
+
+            for record in records:
+                digest.update(f"{record['transaction_id']}|{record['fraud_probability']!r}|"
+                              f"{record['risk_level']}\n".encode())
+            if scores_path:
+                ids.extend(r["transaction_id"] for r in records)
+                probabilities.extend(r["fraud_probability"] for r in records)
+                risks.extend(r["risk_level"] == "HIGH RISK" for r in records)
+            rows += len(records)
+            high_risk += sum(r["risk_level"] == "HIGH RISK" for r in records)
+            if callback:
+                callback(rows, high_risk)
+
+    seconds = time.perf_counter() - started
+    if scores_path:
+        np.savez_compressed(scores_path, transaction_id=np.array(ids, dtype=str),
+                            fraud_probability=np.array(probabilities, dtype=np.float64),
+                            high_risk=np.array(risks, dtype=bool))
+
+    latency = np.concatenate(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "rows": rows,
+        "high_risk": high_risk,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else 0.0,
+        "latency_p50_ms": float(np.percentile(latency, 50)),
+        "latency_p99_ms": float(np.percentile(latency, 99)),
+        "score_digest": digest.hexdigest(),
+    }
+
+
+def compare_scores(baseline_path: str, candidate_path: str, tolerance: float = 1e-6) -> dict:
+    """
+    Compare two score files saved by replay(), matching rows by transaction_id.
+
+    Returns:
+        dict with rows, missing (in one file only), probability_changed (more
+        than `tolerance` apart), risk_changed and max_probability_diff
+    """
+    with np.load(baseline_path) as a, np.load(candidate_path) as b:
+        a = {name: a[name] for name in a.files}
+        b = {name: b[name] for name in b.files}
+    common, ia, ib = np.intersect1d(a["transaction_id"], b["transaction_id"],
+                                    assume_unique=True, return_indices=True)
+    diff = np.abs(a["fraud_probability"][ia] - b["fraud_probability"][ib])
+    return {
+        "rows": len(common),
+        "missing": len(a["transaction_id"]) + len(b["transaction_id"]) - 2 * len(common),
+        "probability_changed": int(np.count_nonzero(diff > tolerance)),
+        "risk_changed": int(np.count_nonzero(a["high_risk"][ia] != b["high_risk"][ib])),
+        "max_probability_diff": float(diff.max()) if len(diff) else 0.0,
+    }
+
+
+# ── CLI ───────────────────────────────────────────────────────────
+
+def _record_command(args) -> int:
+    if args.simulate:
+        transactions = simulated_transactions(args.simulate, args.fraud_ratio, args.seed,
+                                              args.start_time, args.interval_seconds)
+        metadata = {"source": "simulator", "seed": args.seed}
+    elif args.from_csv:
+        from src.ingest import read_transactions
+        transactions = read_transactions(args.from_csv, args.start_time or datetime(2024, 1, 1),
+                                         args.interval_seconds)
+        metadata = {"source": os.path.basename(args.from_csv)}
+    else:
+        source = DatabaseManager(db_path=args.from_db)
+        try:
+            rows = record(args.path, source.iter_transactions(),
+                          metadata={"source": os.path.basename(source.db_path)})
+        finally:
+            source.close()
+        print(f"✅ Recorded {rows:,} transactions to {args.path}")
+        return 0
+    rows = record(args.path, transactions, metadata=metadata)
+    print(f"✅ Recorded {rows:,} transactions to {args.path}")
+    return 0
+
+
+def _run_command(args) -> int:
+    def progress(rows, high_risk):
+        if rows % 1000 < args.batch_size:  # printing every transaction would slow the replay
+            print(f"\r  {rows:,} transactions replayed, {high_risk:,} high risk", end="", flush=True)
+
+    registry = metrics.enable() if args.metrics else None
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(db_path=args.db_path or os.path.join(tmp, "replay.db"))
+        try:
+            summary = replay(db, args.path, speed=args.speed, batch_size=args.batch_size,
+                             limit=args.limit, scores_path=args.scores, callback=progress)
+        finally:
+            db.close()
+
+    print(f"\n✅ Replayed {summary['rows']:,} transactions in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_second']:,.0f}/s), {summary['high_risk']:,} high risk")
+    print(f"   latency p50 {summary['latency_p50_ms']:.2f} ms, p99 {summary['latency_p99_ms']:.2f} ms")
+    print(f"   score digest {summary['score_digest']}")
+    if registry is not None:
+        print(f"\n   {'stage':<24} {'count':>9} {'total ms':>10} {'p50 ms':>9} {'p99 ms':>9}")
+        for stage, s in registry.snapshot()["stages"].items():
+            print(f"   {stage:<24} {s['count']:>9,} {s['total_ms']:>10.1f} "
+                  f"{s['p50_ms']:>9.3f} {s['p99_ms']:>9.3f}")
+    return 0
+
+
+def _compare_command(args) -> int:
+    result = compare_scores(args.baseline, args.candidate, args.tolerance)
+    print(f"{result['rows']:,} transactions compared, {result['missing']:,} in one file only")
+    print(f"  probability changed: {result['probability_changed']:,} "
+          f"(max diff {result['max_probability_diff']:.3g})")
+    print(f"  risk level changed:  {result['risk_changed']:,}")
+    return 0 if not (result["missing"] or result["probability_changed"]
+                     or result["risk_changed"]) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and replay transaction streams.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rec = commands.add_parser("record", help="write a transaction stream to a stream file")
+    rec.add_argument("path", help="stream file to create")
+    source = rec.add_mutually_exclusive_group(required=True)
+    source.add_argument("--simulate", type=int, metavar="N",
+                        help="record N simulator transactions on a simulated clock")
+    source.add_argument("--from-db", metavar="DB", help="record every transaction in a database")
+    source.add_argument("--from-csv", metavar="CSV", help="record a CSV file (see src.ingest)")
+    rec.add_argument("--seed", type=int, default=0, help="simulator seed (default: 0)")
+    rec.add_argument("--fraud-ratio", type=float, default=0.10,
+                     help="simulator fraud ratio (default: 0.10)")
+    rec.add_argument("--start-time", type=datetime.fromisoformat, default=None,
+                     help="first simulated/synthesized timestamp (default: 2024-01-01T00:00:00)")
+    rec.add_argument("--interval-seconds", type=float, default=1.0,
+                     help="spacing of simulated/synthesized timestamps (default: 1.0)")
+    rec.set_defaults(handler=_record_command)
+
+    run = commands.add_parser("run", help="replay a stream file through the pipeline")
+    run.add_argument("path", help="stream file to replay")
+    run.add_argument("--speed", type=float, default=None,
+                     help="simulated seconds per real second (default: as fast as possible)")
+    run.add_argument("--batch-size", type=int, default=1,
+                     help="1 = process_transaction per transaction, more = "
+                          "process_transaction_batch (default: 1)")
+    run.add_argument("--limit", type=int, default=None, help="stop after this many transactions")
+    run.add_argument("--scores", default=None, help="save per-transaction scores to this .npz")
+    run.add_argument("--db", dest="db_path", default=None,
+                     help="replay into this database (default: a temporary one)")
+    run.add_argument("--metrics", action="store_true",
+                     help="time every pipeline stage and print the breakdown")
+    run.set_defaults(handler=_run_command)
+
+    cmp = commands.add_parser("compare", help="compare two score files saved by run --scores")
+    cmp.add_argument("baseline")
+    cmp.add_argument("candidate")
+    cmp.add_argument("--tolerance", type=float, default=1e-6,
+                     help="largest probability difference treated as equal (default: 1e-6)")
+    cmp.set_defaults(handler=_compare_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
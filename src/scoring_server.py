@@ -0,0 +1,361 @@
+"""
+scoring_server.py — Asyncio JSON scoring service with micro-batching.
+Concurrent requests are grouped into small batches, scored with one vectorized
+call and stored with one DB write; each request gets its own record back.
+
+Run: python -m src.scoring_server --port 8765 [--unix-socket /tmp/fraud_scoring.sock]
+
+    curl -s localhost:8765/score -d '{"user_id": 1001, "amount": 250, "hour": 14,
+        "device_id": "Android_A", "location": "Mumbai", "merchant_id": "gpay@upi"}'
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from src import metrics
+from src.database_manager import DatabaseManager
+from src.fraud_prediction import warmup
+from src.simulator import process_transaction_batch
+
+# Request field -> type it is coerced to
+REQUIRED_FIELDS = {
+    "user_id": int,
+    "amount": float,
+    "hour": int,
+    "device_id": str,
+    "location": str,
+    "merchant_id": str,
+}
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class Overloaded(Exception):
+    """Raised by MicroBatcher.submit when too many transactions are already waiting."""
+
+
+def normalize_transaction(payload) -> dict:
+    """
+    Validate a request body and fill in transaction_id and timestamp when absent.
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("transaction must be a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if field not in payload]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+
+    txn = {"transaction_id": str(payload.get("transaction_id")
+                                 or f"TXN-{uuid.uuid4().hex[:12].upper()}")}
+    for field, cast in REQUIRED_FIELDS.items():
+        try:
+            txn[field] = cast(payload[field])
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be {cast.__name__}") from None
+    if not 0 <= txn["hour"] <= 23:
+        raise ValueError("hour must be between 0 and 23")
+
+    timestamp = payload.get("timestamp") or datetime.now().isoformat()
+    try:
+        datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        raise ValueError("timestamp must be ISO-8601") from None
+    txn["timestamp"] = timestamp
+    return txn
+
+
+class MicroBatcher:
+    """
+    Collects submitted transactions into batches of up to `max_batch_size`,
+    waiting at most `max_wait` seconds after the first one arrives, and runs
+    each batch through process_transaction_batch on a single worker thread.
+
+    Batches are processed one at a time in arrival order, so results are the
+    same as calling process_transaction on each transaction in turn. While a
+    batch is being scored the next one keeps filling up.
+    """
+
+    def __init__(self, db: DatabaseManager, max_batch_size: int = 64, max_wait: float = 0.002,
+                 max_pending: int = 10_000, window_hours: int = 1):
+        """
+        Args:
+            db: DatabaseManager the batches are scored against and written to
+            max_batch_size: most transactions scored in one call
+            max_wait: seconds to wait for a batch to fill once it has one item
+            max_pending: queued transactions beyond which submit() raises Overloaded,
+                which bounds the latency a request can accumulate in the queue
+            window_hours: velocity window passed to process_transaction_batch
+        """
+        self.db = db
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.window_hours = window_hours
+
+        self._queue = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring-batch")
+
+        self.batches = 0
+        self.transactions = 0
+        self.rejected = 0
+        self.failed_batches = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Score everything already submitted, then stop the worker."""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, transaction: dict) -> dict:
+        """Queue a validated transaction and wait for its scored record."""
+        if self._queue.qsize() >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(f"{self._queue.qsize()} transactions already waiting")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((transaction, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._score(batch)
+
+    async def _score(self, batch: list):
+        transactions = [txn for txn, _ in batch]
+        try:
+            records = await asyncio.get_running_loop().run_in_executor(
+                self._executor, process_transaction_batch, self.db, transactions,
+                self.window_hours)
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.transactions += len(records)
+        for (_, future), record in zip(batch, records):
+            if not future.done():  # the client may have gone away
+                future.set_result(record)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "transactions": self.transactions,
+            "avg_batch_size": self.transactions / self.batches if self.batches else 0.0,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+        }
+
+
+class ScoringServer:
+    """
+    Minimal HTTP/1.1 JSON server (TCP or Unix socket) in front of a MicroBatcher.
+
+    POST /score    one transaction object, or a list of them → scored record(s)
+    GET  /health   batcher counters
+    GET  /metrics  stage latency histograms in Prometheus text format (when enabled)
+    """
+
+    def __init__(self, batcher: MicroBatcher, host: str = "127.0.0.1", port: int = 8765,
+                 unix_socket: str = None):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self._server = None
+
+    async def start(self):
+        await self.batcher.start()
+        if self.unix_socket:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            # Port 0 asks the OS for a free port; report the real one
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode("latin-1").split(maxsplit=2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": f"body exceeds {MAX_BODY_BYTES} bytes"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length)
+                    status, payload = await self._dispatch(method, path, body)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = (connection == "keep-alive" if version.startswith("HTTP/1.0")
+                                  else connection != "close")
+
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                        f"Content-Type: {content_type}\r\n"
+                        f"Content-Length: {len(data)}\r\n")
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write(head.encode() + b"\r\n" + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # malformed request or client went away; drop the connection
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> tuple:
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, {"status": "ok", **self.batcher.stats()}
+        if path == "/metrics":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            registry = metrics.get_registry()
+            if registry is None:
+                return 404, {"error": "metrics are disabled (start the server with --metrics)"}
+            return 200, metrics.render_prometheus(registry)
+        if path != "/score":
+            return 404, {"error": f"no route {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        try:
+            payload = json.loads(body or b"null")
+            many = isinstance(payload, list)
+            transactions = [normalize_transaction(p) for p in (payload if many else [payload])]
+        except ValueError as e:  # includes JSONDecodeError
+            return 400, {"error": str(e)}
+
+        try:
+            records = await asyncio.gather(*(self.batcher.submit(t) for t in transactions))
+        except Overloaded as e:
+            return 503, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"scoring failed: {e}"}
+        return 200, records if many else records[0]
+
+
+async def serve(db: DatabaseManager, host: str = "127.0.0.1", port: int = 8765,
+                unix_socket: str = None, max_batch_size: int = 64, max_wait: float = 0.002):
+    """Run a scoring server until cancelled."""
+    model = warmup()  # load and score once so the first request isn't slow
+    server = ScoringServer(MicroBatcher(db, max_batch_size=max_batch_size, max_wait=max_wait),
+                           host=host, port=port, unix_socket=unix_socket)
+    await server.start()
+    where = server.unix_socket or f"http://{server.host}:{server.port}"
+    print(f"🛡️  Scoring server listening on {where} "
+          f"(batches of ≤{max_batch_size}, ≤{max_wait * 1000:g} ms wait, "
+          f"model {model['version']} from the {model['source']} in {model['load_ms']:.1f} ms)")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fraud scoring over HTTP with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", default=None,
+                        help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--db", dest="db_path", default=None,
+                        help="SQLite database path (default: database/fraud_detection.db)")
+    parser.add_argument("--max-batch", type=int, default=64,
+                        help="most transactions scored per batch (default: 64)")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="how long a batch waits to fill, in ms (default: 2)")
+    parser.add_argument("--profile-cache-size", type=int, default=0,
+                        help="user profiles kept in memory with write-behind (default: 0 = off). "
+                             "Only for a database this server writes alone: another "
+                             "process caching profiles too (e.g. the dashboard) loses updates")
+    parser.add_argument("--metrics", action="store_true",
+                        help="time every pipeline stage and serve histograms at GET /metrics")
+    parser.add_argument("--metrics-file", default=None,
+                        help="also write the metrics to this .prom file every 15 s "
+                             "(implies --metrics)")
+    args = parser.parse_args(argv)
+
+    exporter = None
+    if args.metrics or args.metrics_file:
+        metrics.enable()
+    if args.metrics_file:
+        exporter = metrics.PeriodicExporter(metrics.PrometheusFileExporter(args.metrics_file)).start()
+
+    db = DatabaseManager(db_path=args.db_path, profile_cache_size=args.profile_cache_size)
+    try:
+        asyncio.run(serve(db, args.host, args.port, args.unix_socket,
+                          args.max_batch, args.max_wait_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+        if exporter is not None:
+            exporter.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+sharded_workers.py — Multi-process scoring with users sharded across worker processes.
+Each worker owns the profiles and velocity history of the users hashed to it, in
+its own shard database, so per-user order is preserved without any locking.
+
+Run: python -m src.sharded_workers --workers 1,2,4 --transactions 100000
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from src.database_manager import DB_DIR, DatabaseManager, _chunks
+
+SHARD_DIR = os.path.join(DB_DIR, "shards")
+
+# How often a wait for worker results checks that every worker is still alive
+_LIVENESS_CHECK_SECONDS = 1.0
+# How long close() waits for the survivors once a worker has died
+_DEAD_WORKER_GRACE_SECONDS = 10.0
+
+
+def shard_for(user_id, num_shards: int) -> int:
+    """Shard owning a user. Stable across processes and runs (unlike hash() of a str)."""
+    return zlib.crc32(str(user_id).encode()) % num_shards
+
+
+def shard_paths(shard_dir: str, num_shards: int) -> list:
+    """Shard database files for a given worker count; each count gets its own set."""
+    return [os.path.join(shard_dir, f"shard_{i}_of_{num_shards}.db") for i in range(num_shards)]
+
+
+def _worker_main(shard: int, db_path: str, inbox, outbox, profile_cache_size: int):
+    """Worker process: score batches for its shard until it receives None."""
+    from src.fraud_prediction import warmup
+    from src.simulator import process_transaction_batch
+
+    try:
+        db = DatabaseManager(db_path=db_path, profile_cache_size=profile_cache_size)
+        warmup()  # load the model and score once before reporting ready
+    except Exception as e:
+        # Reported to the parent like a batch error, rather than as a child traceback
+        outbox.put(("ready", shard, RuntimeError(f"shard {shard}: {e!r}")))
+        return
+    outbox.put(("ready", shard, None))
+    try:
+        while (item := inbox.get()) is not None:
+            batch_id, transactions = item
+            try:
+                outbox.put((batch_id, shard, process_transaction_batch(db, transactions)))
+            except Exception as e:
+                outbox.put((batch_id, shard, RuntimeError(f"shard {shard}: {e!r}")))
+    finally:
+        db.close()
+
+
+class ShardedScorer:
+    """
+    Pool of worker processes, one per shard. Transactions are routed by
+    shard_for(user_id), so every transaction of a user is scored by the same
+    worker, in submission order, against that worker's shard database.
+    Records come back in input order, the same as process_transaction on each.
+    """
+
+    def __init__(self, num_workers: int = None, shard_dir: str = None,
+                 batch_size: int = 256, profile_cache_size: int = 100_000):
+        """
+        Args:
+            num_workers: worker processes / shards (default: one per CPU core)
+            shard_dir: directory for the shard databases (default: database/shards)
+            batch_size: transactions per message sent to a worker
+            profile_cache_size: profiles each worker keeps in memory
+        """
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.shard_dir = shard_dir or SHARD_DIR
+        self.batch_size = batch_size
+        self.profile_cache_size = profile_cache_size
+        self.paths = shard_paths(self.shard_dir, self.num_workers)
+
+        self._context = multiprocessing.get_context("spawn")
+        self._inboxes = []
+        self._outbox = None
+        self._processes = []
+        self._batch_ids = itertools.count()
+
+    def start(self):
+        """Start the workers and wait until each has loaded the model."""
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self._outbox = self._context.Queue()
+        for shard, path in enumerate(self.paths):
+            inbox = self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main, name=f"scoring-shard-{shard}", daemon=True,
+                args=(shard, path, inbox, self._outbox, self.profile_cache_size),
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        try:
+            for _ in self._processes:
+                _, _, error = self._receive()
+                if error is not None:
+                    raise error
+        except RuntimeError:
+            self.close()
+            raise
+
+    def close(self):
+        """Let the workers finish queued batches, flush their profiles and exit."""
+        timeout = None
+        for inbox, process in zip(self._inboxes, self._processes):
+            inbox.put(None)
+            if not process.is_alive():
+                # Nobody will drain a dead worker's inbox; don't block exit flushing it
+                inbox.cancel_join_thread()
+                timeout = _DEAD_WORKER_GRACE_SECONDS
+        for process in self._processes:
+            # A killed worker can die holding the shared outbox's write lock, which
+            # leaves the others unable to exit; stop them rather than wait forever
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._inboxes, self._processes = [], []
+
+    def _receive(self) -> tuple:
+        """
+        Next message from the workers. Raises RuntimeError naming the shard if a
+        worker has exited, instead of waiting forever for its results.
+        """
+        while True:
+            try:
+                return self._outbox.get(timeout=_LIVENESS_CHECK_SECONDS)
+            except queue.Empty:
+                pass
+            for shard, process in enumerate(self._processes):
+                if not process.is_alive():
+                    raise RuntimeError(f"shard {shard} worker ({process.name}) exited "
+                                       f"with code {process.exitcode}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def process(self, transactions: list) -> list:
+        """Score and store transactions across the workers. Returns records in input order."""
+        by_shard = [[] for _ in range(self.num_workers)]
+        for i, txn in enumerate(transactions):
+            by_shard[shard_for(txn["user_id"], self.num_workers)].append(i)
+
+        pending = {}
+        for shard, indexes in enumerate(by_shard):
+            for chunk in _chunks(indexes, self.batch_size):
+                batch_id = next(self._batch_ids)
+                pending[batch_id] = chunk
+                self._inboxes[shard].put((batch_id, [transactions[i] for i in chunk]))
+
+        records = [None] * len(transactions)
+        error = None
+        while pending:
+            batch_id, _, payload = self._receive()
+            indexes = pending.pop(batch_id)
+            if isinstance(payload, Exception):
+                error = error or payload
+                continue
+            for i, record in zip(indexes, payload):
+                records[i] = record
+        if error is not None:
+            raise error
+        return records
+
+    def merge_into(self, db: DatabaseManager) -> int:
+        """
+        Copy every shard's transactions and profiles into one database (e.g. the
+        dashboard's). Idempotent: re-merging replaces rows. Returns rows copied.
+        """
+        copied = 0
+        for path in self.paths:
+            if not os.path.exists(path):
+                continue
+            shard = DatabaseManager(db_path=path)
+            try:
+                copied += db.insert_transactions_bulk(shard.iter_transactions())
+                db.upsert_user_profiles_bulk(list(shard.iter_user_profiles()))
+            finally:
+                shard.close()
+        return copied
+
+
+def synthetic_transactions(count: int, num_users: int = 100_000, seed: int = 7) -> list:
+    """Simulator-style transactions spread over `num_users` users, one second apart."""
+    from src.simulator import USER_PROFILES_SEED, generate_normal_transaction, inject_fraud_patterns
+
+    rng_state = random.getstate()
+    random.seed(seed)
+    start = datetime(2024, 1, 1)
+    transactions = []
+    try:
+        for i in range(count):
+            user_seed = random.choice(USER_PROFILES_SEED)
+            txn = generate_normal_transaction(user_seed)
+            if random.random() < 0.10:
+                txn = inject_fraud_patterns(txn, user_seed)
+            txn["user_id"] = random.randrange(num_users)
+            txn["transaction_id"] = f"SHARD-{i:09d}"
+            txn["timestamp"] = (start + timedelta(seconds=i)).isoformat()
+            transactions.append(txn)
+    finally:
+        random.setstate(rng_state)
+    return transactions
+
+
+def scaling_report(worker_counts, num_transactions: int = 100_000, batch_size: int = 256) -> list:
+    """
+    Score the same synthetic stream with each worker count (fresh shards each
+    time) and measure steady-state throughput, excluding worker start-up.
+    Speedup and efficiency are relative to a measured 1-worker run, which
+    always goes first (added if `worker_counts` doesn't include it).
+
+    Returns:
+        list of dicts with workers, seconds, per_second, speedup and efficiency
+    """
+    transactions = synthetic_transactions(num_transactions)
+    worker_counts = [1] + [n for n in worker_counts if n != 1]
+    rows = []
+    single = None  # measured 1-worker throughput
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as shard_dir:
+            with ShardedScorer(workers, shard_dir, batch_size=batch_size) as scorer:
+                started = time.perf_counter()
+                scorer.process(transactions)
+                seconds = time.perf_counter() - started
+        per_second = num_transactions / seconds
+        if workers == 1:
+            single = per_second
+        rows.append({
+            "workers": workers,
+            "seconds": seconds,
+            "per_second": per_second,
+            "speedup": per_second / single,
+            "efficiency": per_second / single / workers,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure sharded multi-process scoring throughput.")
+    parser.add_argument("--workers", default=None,
+                        help="comma-separated worker counts to compare (default: 1..CPU count "
+                             "in powers of two)")
+    parser.add_argument("--transactions", type=int, default=100_000,
+                        help="synthetic transactions scored per run (default: 100000)")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="transactions per message to a worker (default: 256)")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        counts = [int(n) for n in args.workers.split(",")]
+    else:
+        cores = os.cpu_count() or 1
+        counts = sorted({1, cores, *(2 ** k for k in range(cores.bit_length()) if 2 ** k <= cores)})
+
+    print(f"🛡️  Sharded scoring: {args.transactions:,} transactions, "
+          f"{os.cpu_count()} CPU cores available\n")
+    print(f"{'workers':>8} {'seconds':>9} {'txn/s':>10} {'speedup':>8} {'efficiency':>11}")
+    for row in scaling_report(counts, args.transactions, args.batch_size):
+        print(f"{row['workers']:>8} {row['seconds']:>9.2f} {row['per_second']:>10,.0f} "
+              f"{row['speedup']:>7.2f}x {row['efficiency']:>10.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,17 +5,22 @@ Feeds through the full prediction pipeline and stores results in SQLite.
 """
 
 import random
+import threading
 import time
 import uuid
+from bisect import bisect_left, insort
 from datetime import datetime
 
-from src.database_manager import DatabaseManager
-from src.fraud_prediction import predict_fraud
+from src import metrics
+from src.database_manager import DatabaseManager, velocity_window_start
+from src.fraud_prediction import predict_fraud, batch_predict_rows
 
 # ── Constants ─────────────────────────────────────────────────────
 LOCATIONS = ["Mumbai", "Delhi", "Kolkata", "Lucknow", "Bangalore"]
 DEVICES = ["Android_A", "Android_B", "iPhone_X", "iPhone_Y"]
 MERCHANTS = ["paytm@upi", "phonepe@upi", "flipkart@upi", "gpay@upi", "amazon@upi"]
+# Relative frequency of each hour of the day (0-23) for normal transactions
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 5, 8, 10, 12, 12, 14, 12, 10, 8, 8, 10, 12, 10, 8, 5, 3, 2]
 
 # Synthetic user pool with preset behavioral patterns
 USER_PROFILES_SEED = [
@@ -42,17 +47,13 @@ USER_PROFILES_SEED = [
 ]
 
 
-def generate_normal_transaction(user_seed: dict) -> dict:
-    """Generate a realistic normal transaction for a user."""
+def generate_normal_transaction(user_seed: dict, now: datetime = None) -> dict:
+    """Generate a realistic normal transaction for a user, stamped `now` (default: wall clock)."""
     avg = user_seed["avg_spend"]
     amount = round(random.gauss(avg, avg * 0.3), 2)
     amount = max(5.0, amount)  # minimum ₹5
 
-    hour = random.choices(
-        range(24),
-        weights=[1, 1, 1, 1, 1, 1, 2, 5, 8, 10, 12, 12, 14, 12, 10, 8, 8, 10, 12, 10, 8, 5, 3, 2],
-        k=1
-    )[0]
+    hour = random.choices(range(24), weights=HOUR_WEIGHTS, k=1)[0]
 
     return {
         "transaction_id": f"TXN-{uuid.uuid4().hex[:12].upper()}",
@@ -62,7 +63,7 @@ def generate_normal_transaction(user_seed: dict) -> dict:
         "device_id": user_seed["usual_device"],
         "location": user_seed["usual_location"],
         "merchant_id": random.choice(MERCHANTS),
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": (now or datetime.now()).isoformat(),
     }
 
 
@@ -94,13 +95,17 @@ def process_transaction(db: DatabaseManager, transaction: dict) -> dict:
     fetch profile → predict → store → update profile.
     """
     user_id = transaction["user_id"]
+    timer = metrics.timer()
 
-    # Fetch user behavioral profile
-    user_profile = db.get_user_profile(user_id)
-    velocity = db.get_transaction_velocity(user_id, transaction["timestamp"])
+    # Fetch user behavioral profile and recent velocity in one query
+    user_profile, velocity = db.get_scoring_context(user_id, transaction["timestamp"])
+    if timer:
+        timer.lap("pipeline.context")
 
     # Predict fraud
     result = predict_fraud(transaction, user_profile, velocity)
+    if timer:
+        timer.lap("pipeline.predict")
 
     # Merge prediction results into transaction record
     full_record = {
@@ -108,23 +113,107 @@ def process_transaction(db: DatabaseManager, transaction: dict) -> dict:
         "fraud_probability": result["fraud_probability"],
         "risk_level": result["risk_level"],
         "explanation": result["explanation"],
+        "model_version": result["model_version"],
     }
 
-    # Store transaction
-    db.insert_transaction(full_record)
+    # Store transaction and update user profile in one commit
+    db.record_scored_transaction(full_record)
+    if timer:
+        timer.lap("pipeline.store")
+        timer.total("pipeline.total")
+        timer.registry.inc("fraud_transactions_total", risk_level=result["risk_level"])
 
-    # Update user profile
-    db.update_user_profile(
-        user_id=user_id,
-        amount=transaction["amount"],
-        device_id=transaction["device_id"],
-        location=transaction["location"],
-        timestamp=transaction["timestamp"],
-    )
+    # Push to live subscribers (the dashboard) once the record is committed
+    if db.live_feed is not None:
+        db.live_feed.publish([full_record])
 
     return full_record
 
 
+def process_transaction_batch(db: DatabaseManager, transactions: list,
+                              window_hours: int = 1) -> list:
+    """
+    Run a batch of transactions through the pipeline with one vectorized
+    scoring call and one DB write.
+
+    Transactions are applied in list order: a user's second transaction in the
+    batch sees the profile and velocity left by the first, exactly as if
+    process_transaction had been called on each in turn.
+    """
+    if not transactions:
+        return []
+    timer = metrics.timer()
+
+    user_ids = list(dict.fromkeys(txn["user_id"] for txn in transactions))
+    profiles = {uid: dict(p) for uid, p in db.get_user_profiles(user_ids).items()}
+    if timer:
+        timer.lap("batch.profiles")
+
+    window_starts = [velocity_window_start(txn["timestamp"], window_hours)
+                     for txn in transactions]
+    history = db.get_user_activity(user_ids, min(window_starts))
+    if timer:
+        timer.lap("batch.activity")
+
+    # Walk the batch in order, snapshotting each user's state before each transaction
+    row_profiles, row_velocities = [], []
+    for txn, window_start in zip(transactions, window_starts):
+        uid = txn["user_id"]
+        timestamps = history[uid]
+        row_velocities.append(len(timestamps) - bisect_left(timestamps, window_start))
+        insort(timestamps, txn["timestamp"])
+
+        profile = profiles[uid]
+        row_profiles.append(dict(profile))
+        count = profile["transaction_count"] + 1
+        profile["avg_amount"] = ((profile["avg_amount"] * profile["transaction_count"])
+                                 + txn["amount"]) / count
+        profile["last_device"] = txn["device_id"]
+        profile["usual_location"] = txn["location"]
+        profile["transaction_count"] = count
+        profile["last_transaction_time"] = txn["timestamp"]
+
+    if timer:
+        timer.lap("batch.walk")
+
+    results = batch_predict_rows(transactions, row_profiles, row_velocities)
+    if timer:
+        timer.lap("batch.predict")
+
+    records = [
+        {
+            **txn,
+            "fraud_probability": result["fraud_probability"],
+            "risk_level": result["risk_level"],
+            "explanation": result["explanation"],
+            "model_version": result["model_version"],
+        }
+        for txn, result in zip(transactions, results)
+    ]
+    db.record_scored_transactions_bulk(records, list(profiles.values()))
+    if timer:
+        timer.lap("batch.store")
+        timer.total("batch.total")
+        high_risk = sum(r["risk_level"] == "HIGH RISK" for r in records)
+        timer.registry.inc("fraud_batches_total")
+        timer.registry.inc("fraud_transactions_total", high_risk, risk_level="HIGH RISK")
+        timer.registry.inc("fraud_transactions_total", len(records) - high_risk,
+                           risk_level="LOW RISK")
+
+    if db.live_feed is not None:
+        db.live_feed.publish(records)
+    return records
+
+
+def simulate_transaction(fraud_ratio: float = 0.10) -> dict:
+    """A transaction from a random seed user, with fraud patterns injected at `fraud_ratio`."""
+    user_seed = random.choice(USER_PROFILES_SEED)
+    txn = generate_normal_transaction(user_seed)
+    if random.random() < fraud_ratio:
+        txn = inject_fraud_patterns(txn, user_seed)
+    return txn
+
+
 def run_simulator(db: DatabaseManager, num_transactions: int = 100,
                   delay: float = 0.5, fraud_ratio: float = 0.10,
                   callback=None):
@@ -140,15 +229,8 @@ def run_simulator(db: DatabaseManager, num_transactions: int = 100,
     """
     count = 0
     while num_transactions == 0 or count < num_transactions:
-        # Pick a random user
-        user_seed = random.choice(USER_PROFILES_SEED)
-
-        # Generate transaction
-        txn = generate_normal_transaction(user_seed)
-
-        # Inject fraud patterns randomly
-        if random.random() < fraud_ratio:
-            txn = inject_fraud_patterns(txn, user_seed)
+        # Generate a transaction, injecting fraud patterns randomly
+        txn = simulate_transaction(fraud_ratio)
 
         # Process through pipeline
         result = process_transaction(db, txn)
@@ -160,3 +242,117 @@ def run_simulator(db: DatabaseManager, num_transactions: int = 100,
         time.sleep(delay)
 
     return count
+
+
+class SimulatorWorker:
+    """
+    Runs the simulator on a background thread so the caller (e.g. the
+    dashboard) stays responsive. It can be paused, resumed and stopped, and
+    started again once a run has ended. Progress is read with status().
+    """
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self._thread = None
+        self._stop = threading.Event()
+        self._resume = threading.Event()  # cleared while paused
+        self._lock = threading.Lock()
+        self._active_since = None  # when the run last started or resumed; None while paused
+        self._status = {"state": "idle", "processed": 0, "target": 0, "high_risk": 0,
+                        "last": None, "error": None, "started_at": None, "seconds": 0.0}
+
+    @property
+    def running(self) -> bool:
+        """True from start() until the run ends, including while paused."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, num_transactions: int = 100, delay: float = 0.5,
+              fraud_ratio: float = 0.10):
+        """
+        Start a run in the background (arguments as for run_simulator).
+
+        Raises:
+            RuntimeError: if a run is already in progress
+        """
+        if self.running:
+            raise RuntimeError("the simulator is already running")
+        self._stop.clear()
+        self._resume.set()
+        with self._lock:
+            self._status.update(state="running", processed=0, target=num_transactions,
+                                high_risk=0, last=None, error=None,
+                                started_at=time.time(), seconds=0.0)
+            self._active_since = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="simulator", daemon=True,
+                                        args=(num_transactions, delay, fraud_ratio))
+        self._thread.start()
+
+    def pause(self):
+        if self.running:
+            self._resume.clear()
+            with self._lock:
+                self._accumulate()
+                self._status["state"] = "paused"
+
+    def resume(self):
+        if self.running:
+            with self._lock:
+                if self._active_since is None:
+                    self._active_since = time.perf_counter()
+                self._status["state"] = "running"
+            self._resume.set()
+
+    def stop(self, timeout: float = None):
+        """Stop after the transaction in progress and wait for the thread to finish."""
+        self._stop.set()
+        self._resume.set()
+        self.join(timeout)
+
+    def join(self, timeout: float = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> dict:
+        """
+        Returns:
+            dict with state ("idle", "running", "paused", "stopped", "finished" or
+            "failed"), processed, target (0 = until stopped), high_risk, last (the
+            latest scored record), error, started_at, seconds (not counting pauses)
+            and rate (per second)
+        """
+        with self._lock:
+            status = dict(self._status)
+            if self._active_since is not None:
+                status["seconds"] += time.perf_counter() - self._active_since
+        status["rate"] = status["processed"] / status["seconds"] if status["seconds"] else 0.0
+        return status
+
+    def _accumulate(self):
+        # Caller holds self._lock
+        if self._active_since is not None:
+            self._status["seconds"] += time.perf_counter() - self._active_since
+            self._active_since = None
+
+    def _run(self, num_transactions: int, delay: float, fraud_ratio: float):
+        state, error = "finished", None
+        processed = 0
+        try:
+            while num_transactions == 0 or processed < num_transactions:
+                self._resume.wait()
+                if self._stop.is_set():
+                    state = "stopped"
+                    break
+                result = process_transaction(self.db, simulate_transaction(fraud_ratio))
+                processed += 1
+                with self._lock:
+                    self._status["processed"] = processed
+                    self._status["high_risk"] += result["risk_level"] == "HIGH RISK"
+                    self._status["last"] = result
+                if delay > 0 and self._stop.wait(delay):
+                    state = "stopped"
+                    break
+        except Exception as e:
+            state, error = "failed", f"{type(e).__name__}: {e}"
+        with self._lock:
+            self._accumulate()
+            self._status.update(state=state, error=error)
@@ -0,0 +1,152 @@
+"""
+stream_file.py — Columnar files of transaction streams, for load tests and replay.
+A stream file is a zip of NumPy arrays (readable with np.load) written in chunks:
+epoch-microsecond timestamps, numeric columns as they are, categories dictionary-coded.
+"""
+
+import json
+import zipfile
+
+import numpy as np
+
+from src.timestamps import iso_to_micros
+
+FORMAT = "fintechai-transaction-stream"
+FORMAT_VERSION = 1
+
+# Column -> stored dtype. Categorical columns are stored as codes into a per-chunk
+# vocabulary; transaction IDs as fixed-width strings.
+NUMERIC_COLUMNS = {"user_id": np.int64, "amount": np.float64, "hour": np.int8,
+                   "timestamp": np.int64}
+CATEGORICAL_COLUMNS = ("device_id", "location", "merchant_id")
+COLUMNS = ("transaction_id", "user_id", "amount", "hour", "device_id", "location",
+           "merchant_id", "timestamp")
+
+
+def micros_to_iso_array(micros: np.ndarray) -> np.ndarray:
+    """Epoch microseconds to the strings datetime.isoformat() produces (no .000000 suffix)."""
+    micros = np.asarray(micros, dtype=np.int64)
+    strings = np.datetime_as_string(micros.astype("datetime64[us]"), unit="us")
+    whole = micros % 1_000_000 == 0
+    if whole.any():
+        strings = strings.astype(object)
+        strings[whole] = np.datetime_as_string(micros[whole].astype("datetime64[us]"), unit="s")
+    return strings
+
+
+def transactions_to_columns(transactions: list) -> dict:
+    """A list of transaction dicts as a dict of column arrays."""
+    columns = {name: np.array([t[name] for t in transactions], dtype=dtype)
+               for name, dtype in NUMERIC_COLUMNS.items() if name != "timestamp"}
+    for name in ("transaction_id", *CATEGORICAL_COLUMNS):
+        columns[name] = np.array([str(t[name]) for t in transactions])
+    columns["timestamp"] = np.array([iso_to_micros(t["timestamp"]) for t in transactions],
+                                    dtype=np.int64)
+    return columns
+
+
+def columns_to_transactions(columns: dict) -> list:
+    """Column arrays back to transaction dicts, ready for process_transaction(_batch)."""
+    values = [columns[name].tolist() for name in COLUMNS[:-1]]
+    values.append(micros_to_iso_array(columns["timestamp"]).tolist())
+    return [dict(zip(COLUMNS, row)) for row in zip(*values)]
+
+
+class StreamWriter:
+    """
+    Appends chunks of transactions to a stream file. The file is complete (and
+    readable) once close() has written its metadata.
+
+        with StreamWriter("load.npz") as writer:
+            writer.write_columns(columns)   # or writer.write(list_of_dicts)
+    """
+
+    def __init__(self, path: str, compress: bool = True, metadata: dict = None):
+        """
+        Args:
+            path: file to create (overwritten if it exists)
+            compress: deflate the arrays (about 3x smaller, slower to write)
+            metadata: extra JSON-serializable details stored with the stream
+        """
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.rows = 0
+        self.chunks = 0
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED if compress
+                                    else zipfile.ZIP_STORED, allowZip64=True)
+
+    def _put(self, name: str, array: np.ndarray):
+        with self._zip.open(f"{name}.npy", "w", force_zip64=True) as f:
+            np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+
+    def write_columns(self, columns: dict) -> int:
+        """Append one chunk of column arrays (see transactions_to_columns). Returns rows written."""
+        rows = len(columns["user_id"])
+        if rows == 0:
+            return 0
+        prefix = f"c{self.chunks:06d}"
+        for name, dtype in NUMERIC_COLUMNS.items():
+            self._put(f"{prefix}_{name}", np.asarray(columns[name], dtype=dtype))
+        self._put(f"{prefix}_transaction_id", np.asarray(columns["transaction_id"]).astype(str))
+        for name in CATEGORICAL_COLUMNS:
+            values, codes = np.unique(np.asarray(columns[name]).astype(str), return_inverse=True)
+            self._put(f"{prefix}_{name}_values", values)
+            self._put(f"{prefix}_{name}_codes", codes.astype(np.int32))
+        self.rows += rows
+        self.chunks += 1
+        return rows
+
+    def write(self, transactions: list) -> int:
+        """Append one chunk of transaction dicts. Returns rows written."""
+        return self.write_columns(transactions_to_columns(transactions)) if transactions else 0
+
+    def close(self):
+        if self._zip is None:
+            return
+        meta = {"format": FORMAT, "version": FORMAT_VERSION, "rows": self.rows,
+                "chunks": self.chunks, **self.metadata}
+        self._zip.writestr("meta.json", json.dumps(meta, indent=2))
+        self._zip.close()
+        self._zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_metadata(path: str) -> dict:
+    """The metadata of a stream file. Raises ValueError if it isn't one."""
+    with zipfile.ZipFile(path) as zf:
+        try:
+            meta = json.loads(zf.read("meta.json"))
+        except KeyError:
+            raise ValueError(f"{path} is not a complete transaction stream file") from None
+    if meta.get("format") != FORMAT or meta.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported stream format "
+                         f"{meta.get('format')!r} v{meta.get('version')}")
+    return meta
+
+
+def read_columns(path: str):
+    """Yield the chunks of a stream file as dicts of column arrays, in write order."""
+    meta = read_metadata(path)
+    with zipfile.ZipFile(path) as zf:
+        def get(name):
+            with zf.open(f"{name}.npy") as f:
+                return np.lib.format.read_array(f, allow_pickle=False)
+
+        for chunk in range(meta["chunks"]):
+            prefix = f"c{chunk:06d}"
+            columns = {name: get(f"{prefix}_{name}") for name in NUMERIC_COLUMNS}
+            columns["transaction_id"] = get(f"{prefix}_transaction_id")
+            for name in CATEGORICAL_COLUMNS:
+                columns[name] = get(f"{prefix}_{name}_values")[get(f"{prefix}_{name}_codes")]
+            yield columns
+
+
+def read_transactions(path: str):
+    """Yield the transactions of a stream file as dicts, one chunk at a time."""
+    for columns in read_columns(path):
+        yield from columns_to_transactions(columns)
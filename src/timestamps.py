@@ -0,0 +1,22 @@
+"""
+timestamps.py — Conversions between ISO-8601 timestamp strings and epoch microseconds.
+Naive timestamps are treated as wall-clock values, matching how they are stored in SQLite.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def iso_to_micros(timestamp: str) -> int:
+    """Convert an ISO-8601 string to integer microseconds since the epoch."""
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def micros_to_iso(micros: int) -> str:
+    """Convert epoch microseconds back to the ISO-8601 form produced by datetime.isoformat()."""
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
@@ -0,0 +1,124 @@
+"""
+velocity_tracker.py — Streaming per-user transaction velocity over sliding time windows.
+Replaces per-transaction COUNT(*) scans with in-memory timestamp queues.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import deque
+
+from src.timestamps import iso_to_micros
+
+DEFAULT_WINDOWS = (600, 3600, 86400)  # 10 minutes, 1 hour, 24 hours (seconds)
+
+
+class VelocityTracker:
+    """
+    Sliding-window transaction counts per user, for several windows at once.
+
+    Each user keeps one queue of timestamps per window. Recording a transaction
+    appends to every queue and drops entries that fell out of that window, so a
+    record/count pair costs O(1) amortized regardless of the user's history.
+    Timestamps are epoch microseconds; counts match
+    `COUNT(*) WHERE user_id = ? AND timestamp >= now - window`.
+    """
+
+    def __init__(self, windows=DEFAULT_WINDOWS):
+        """
+        Args:
+            windows: window sizes in seconds to track
+        """
+        self.windows = tuple(sorted(set(int(w) for w in windows)))
+        if not self.windows:
+            raise ValueError("At least one window is required")
+        self._window_micros = [w * 1_000_000 for w in self.windows]
+        self._slot = {w: i for i, w in enumerate(self.windows)}
+        self._users = {}  # user_id -> [deque per window]
+        self._floor = float("-inf")  # history before this point was never loaded
+        self._lock = threading.Lock()
+
+    def tracks(self, window_seconds: int) -> bool:
+        """True if counts for this window size are maintained."""
+        return window_seconds in self._slot
+
+    def record(self, user_id: int, ts: int):
+        """Add one transaction at `ts` (epoch microseconds) for a user."""
+        with self._lock:
+            queues = self._users.get(user_id)
+            if queues is None:
+                queues = self._users[user_id] = [deque() for _ in self.windows]
+            for queue, span in zip(queues, self._window_micros):
+                if not queue or queue[-1] <= ts:
+                    queue.append(ts)
+                else:
+                    # Out-of-order arrival: insert from the right, where it almost always lands
+                    i = len(queue)
+                    while i > 0 and queue[i - 1] > ts:
+                        i -= 1
+                    queue.insert(i, ts)
+                cutoff = queue[-1] - span
+                while queue[0] < cutoff:
+                    queue.popleft()
+
+    def count(self, user_id: int, now: int, window_seconds: int = 3600):
+        """
+        Number of the user's transactions with timestamp >= now - window.
+
+        Returns None when the answer depends on history the tracker no longer
+        holds (a query far in the past), so the caller can fall back to SQL.
+        """
+        slot = self._slot[window_seconds]
+        span = self._window_micros[slot]
+        cutoff = now - span
+        with self._lock:
+            if cutoff < self._floor:
+                return None
+            queues = self._users.get(user_id)
+            if queues is None:
+                return 0
+            queue = queues[slot]
+            if queue and cutoff < queue[-1] - span:
+                # Entries older than the user's newest minus the window were dropped
+                return None
+            # Entries older than the cutoff are only dropped on record(), so counts
+            # stay correct for queries that are not monotonic in time. The queue is
+            # sorted, so the stale ones are found by binary search.
+            return len(queue) - bisect_left(queue, cutoff)
+
+    def counts(self, user_id: int, now: int) -> dict:
+        """Counts for every tracked window, keyed by window size in seconds (None = unknown)."""
+        return {w: self.count(user_id, now, w) for w in self.windows}
+
+    def warm_start(self, rows, since: str = None):
+        """
+        Seed the tracker from (user_id, iso_timestamp) rows, e.g. recent DB history.
+
+        Args:
+            rows: iterable of (user_id, timestamp) pairs in any order
+            since: the rows are complete from this ISO timestamp on; counts
+                reaching further back are refused
+        """
+        if since:
+            self._floor = iso_to_micros(since)
+        for user_id, timestamp in rows:
+            try:
+                self.record(user_id, iso_to_micros(timestamp))
+            except (ValueError, TypeError):
+                continue
+
+    def prune(self, now: int) -> int:
+        """Forget users with no activity inside the largest window. Returns users dropped."""
+        cutoff = now - self._window_micros[-1]
+        with self._lock:
+            idle = [uid for uid, queues in self._users.items() if queues[-1][-1] < cutoff]
+            for uid in idle:
+                del self._users[uid]
+        return len(idle)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._floor = float("-inf")
+
+    def __len__(self):
+        return len(self._users)
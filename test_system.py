@@ -17,7 +17,7 @@ def test_database():
     print("TEST 1: Database Operations")
     print("=" * 60)
 
-    from src.database_manager import DatabaseManager
+    from src.database_manager import DatabaseManager, SCHEMA_VERSION
 
     # Use temp database
     db = DatabaseManager(db_path="database/test_fraud.db")
@@ -67,7 +67,200 @@ def test_database():
     assert velocity >= 1
     print("  ✅ Get transaction velocity")
 
+    # Combined read and atomic write used by the pipeline
+    now = datetime.now().isoformat()
+    profile, velocity = db.get_scoring_context(9999, now)
+    assert profile == db.get_user_profile(9999)
+    assert velocity == db.get_transaction_velocity(9999, now)
+    assert db.get_scoring_context(4242, now) == (db.get_user_profile(4242), 0)
+    db.record_scored_transaction({**txn, "transaction_id": "TEST-002", "amount": 1000.0,
+                                  "device_id": "iPhone_X", "timestamp": now})
+    profile = db.get_user_profile(9999)
+    assert profile["transaction_count"] == 2
+    assert profile["avg_amount"] == 750.0
+    assert profile["last_device"] == "iPhone_X"
+    assert len(db.get_recent_transactions(limit=10)) == 2
+    print("  ✅ Scoring context and atomic record")
+
+    # Persistent per-thread connections in WAL mode
+    with db._get_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        with db._get_connection() as inner:
+            assert inner is conn
+
+    # A thread that reuses a dead thread's ident closes the connection left behind
+    import sqlite3
+    import threading
+    stale = db._connect()
+
+    def reuse_ident():
+        db._connections[threading.get_ident()] = stale
+        db.get_user_profile(9999)
+
+    worker = threading.Thread(target=reuse_ident)
+    worker.start()
+    worker.join()
+    try:
+        stale.execute("SELECT 1")
+        assert False, "the dead thread's connection should be closed"
+    except sqlite3.ProgrammingError:
+        pass
+    print("  ✅ WAL mode with persistent per-thread connection")
+
+    # A reader thread and a writer thread must not hit "database is locked"
+    errors = []
+
+    def writer():
+        try:
+            for i in range(50):
+                db.insert_transaction({**txn, "transaction_id": f"TEST-W{i}"})
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(50):
+                db.get_fraud_stats()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors, errors
+    assert db.get_fraud_stats()["total_transactions"] == 52
+    print("  ✅ Concurrent reader and writer")
+
     db.clear_all_data()
+    db.close()
+
+    # Profile cache with write-behind
+    db = DatabaseManager(db_path="database/test_fraud.db", profile_cache_size=2,
+                         profile_flush_interval=None, profile_flush_threshold=100)
+    for uid in (1, 2, 3):
+        db.update_user_profile(uid, 100.0 * uid, "Android_A", "Mumbai", datetime.now().isoformat())
+    db.update_user_profile(1, 300.0, "iPhone_X", "Delhi", datetime.now().isoformat())
+    assert db.get_user_profile(1)["avg_amount"] == 200.0  # evicted while dirty, still served
+    with db._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM user_profiles").fetchone()[0] == 0
+    cache_stats = db.get_profile_cache_stats()
+    assert cache_stats["dirty"] == 3 and cache_stats["evictions"] >= 1
+    db.close()  # clean flush on shutdown
+    db = DatabaseManager(db_path="database/test_fraud.db")
+    assert db.get_user_profile(1)["transaction_count"] == 2
+    assert db.get_user_profile(3)["avg_amount"] == 300.0
+    db.clear_all_data()
+    print(f"  ✅ Profile cache write-behind (hit rate {cache_stats['hit_rate']:.0%})")
+
+    # Incrementally maintained stats match a full aggregate, including replaced rows
+    db.insert_transaction({**txn, "transaction_id": "TEST-S1", "risk_level": "HIGH RISK",
+                           "fraud_probability": 0.9})
+    db.insert_transaction({**txn, "transaction_id": "TEST-S1", "risk_level": "HIGH RISK",
+                           "fraud_probability": 0.7})
+    db.insert_transaction({**txn, "transaction_id": "TEST-S2", "fraud_probability": None,
+                           "risk_level": None})
+    with db._get_connection() as conn:
+        expected = conn.execute("""
+            SELECT COUNT(*), SUM(risk_level = 'HIGH RISK'), AVG(fraud_probability),
+                   (SELECT AVG(fraud_probability) FROM transactions WHERE risk_level = 'HIGH RISK')
+            FROM transactions
+        """).fetchone()
+        conn.execute("UPDATE fraud_stats SET total_transactions = 0")  # simulate drift
+    assert db.get_fraud_stats()["total_transactions"] == 0
+    stats = db.rebuild_aggregates()
+    assert stats["total_transactions"] == expected[0]
+    assert stats["high_risk_count"] == expected[1]
+    assert abs(stats["avg_probability"] - expected[2]) < 1e-9
+    assert abs(stats["avg_fraud_probability"] - expected[3]) < 1e-9
+    db.insert_transaction({**txn, "transaction_id": "TEST-S3"})
+    assert db.get_fraud_stats()["total_transactions"] == expected[0] + 1
+    print("  ✅ O(1) fraud stats from maintained counters, rebuild fixes drift")
+
+    # Rollups match GROUP BY scans over the raw table
+    def scan(sql):
+        with db._get_connection() as conn:
+            return [tuple(row) for row in conn.execute(sql).fetchall()]
+
+    assert [tuple(r.values()) for r in db.get_hourly_fraud_distribution()] == scan("""
+        SELECT hour, COUNT(*), SUM(risk_level = 'HIGH RISK') FROM transactions
+        GROUP BY hour ORDER BY hour""")
+    assert [(r["user_id"], r["total_txn"], r["fraud_count"]) for r in db.get_user_risk_summary()] == \
+        scan("""SELECT user_id, COUNT(*), SUM(risk_level = 'HIGH RISK') FROM transactions
+                GROUP BY user_id ORDER BY AVG(fraud_probability) DESC LIMIT 20""")
+    assert [(r["location"], r["total"], r["high_risk"]) for r in db.get_location_fraud_distribution()] == \
+        scan("""SELECT location, COUNT(*), SUM(risk_level = 'HIGH RISK') FROM transactions
+                GROUP BY location ORDER BY location""")
+    assert [(r["merchant_id"], r["total"], r["high_risk"]) for r in db.get_merchant_fraud_distribution()] == \
+        scan("""SELECT merchant_id, COUNT(*), SUM(risk_level = 'HIGH RISK') FROM transactions
+                GROUP BY merchant_id ORDER BY merchant_id""")
+    print("  ✅ Hourly, user, location and merchant rollups")
+    db.clear_all_data()
+    assert db.get_fraud_stats()["total_transactions"] == 0
+    assert db.get_location_fraud_distribution() == []
+
+    # Streaming velocity tracker agrees with the COUNT(*) query
+    from datetime import timedelta
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    for i in range(40):
+        db.insert_transaction({**txn, "transaction_id": f"TEST-V{i}", "user_id": 7000 + i % 3,
+                               "timestamp": (base + timedelta(minutes=37 * i)).isoformat()})
+    tracked = DatabaseManager(db_path="database/test_fraud.db", velocity_windows=(600, 3600, 86400))
+    for i in range(40, 60):
+        tracked.insert_transaction({**txn, "transaction_id": f"TEST-V{i}", "user_id": 7000 + i % 3,
+                                    "timestamp": (base + timedelta(minutes=37 * i)).isoformat()})
+    for minutes in (0, 600, 1400, 2220, 2300, 4000):
+        now = (base + timedelta(minutes=minutes)).isoformat()
+        for uid in (7000, 7001, 7002, 7003):
+            for hours in (1 / 6, 1, 24):
+                assert tracked.get_transaction_velocity(uid, now, hours) == \
+                    db.get_transaction_velocity(uid, now, hours), (uid, now, hours)
+    assert set(tracked.get_velocity_counts(7000, now)) == {600, 3600, 86400}
+    from src.timestamps import iso_to_micros
+    assert tracked.velocity_tracker.count(7000, iso_to_micros(now), 3600) is not None
+    tracked.clear_all_data()
+    tracked.close()
+    print("  ✅ Streaming velocity tracker matches SQL counts")
+
+    # Every hot query is served by an index, never a full scan of transactions
+    plans = db.explain_hot_queries(user_id=9999)
+    full_scans = db.find_full_scans(plans)
+    assert not full_scans, f"Hot queries fall back to full scans: {full_scans}"
+    assert db.find_full_scans({"probe": [("SELECT ...", ["SCAN transactions"])]})
+    print(f"  ✅ Query plans: {len(plans)} hot queries, no full scans")
+
+    # Migration of a database created before the composite/partial indexes
+    import sqlite3
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        legacy = sqlite3.connect(legacy_path)
+        legacy.execute("""CREATE TABLE transactions (transaction_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL, amount REAL NOT NULL, hour INTEGER NOT NULL,
+            device_id TEXT NOT NULL, location TEXT NOT NULL, merchant_id TEXT NOT NULL,
+            fraud_probability REAL, risk_level TEXT, explanation TEXT, timestamp TEXT NOT NULL)""")
+        legacy.execute("CREATE INDEX idx_transactions_user ON transactions(user_id)")
+        legacy.execute("INSERT INTO transactions VALUES ('OLD-1', 1, 10.0, 3, 'Android_A', "
+                       "'Delhi', 'gpay@upi', 0.9, 'HIGH RISK', '', '2025-01-01T03:00:00')")
+        legacy.commit()
+        legacy.close()
+        migrated = DatabaseManager(db_path=legacy_path)
+        with migrated._get_connection() as conn:
+            indexes = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'transactions'")}
+        assert {"idx_transactions_user_time", "idx_transactions_high_risk"} <= indexes
+        assert "idx_transactions_user" not in indexes
+        assert migrated.get_schema_version() == SCHEMA_VERSION
+        assert migrated.get_fraud_stats()["high_risk_count"] == 1
+        old = migrated.get_fraud_alerts()[0]
+        assert old["transaction_id"] == "OLD-1" and old["model_version"] is None
+        migrated.close()
+    print("  ✅ Legacy database migrated")
+
+    # Connection-per-call mode still works
+    db = DatabaseManager(db_path="database/test_fraud.db", persistent_connections=False)
+    assert db.get_fraud_stats()["total_transactions"] == 0
     print("  ✅ Clear database")
     print("  ✅ All database tests passed!\n")
     return True
@@ -79,10 +272,12 @@ def test_feature_engineering():
     print("TEST 2: Feature Engineering")
     print("=" * 60)
 
+    import numpy as np
     from src.data_processing import (
         compute_behavioral_features,
         build_feature_dataframe,
         generate_explanation,
+        CategoryEncoder,
         FEATURE_COLUMNS,
     )
 
@@ -117,8 +312,22 @@ def test_feature_engineering():
     assert features["location_Mumbai"] == 0
     assert features["device_id_iPhone_X"] == 1
     assert features["merchant_id_gpay@upi"] == 1
+    assert list(features) == FEATURE_COLUMNS
     print("  ✅ One-hot encoding correct")
 
+    # Precomputed offsets scale to large vocabularies, dense or sparse
+    merchants = [f"m{i}@upi" for i in range(5000)]
+    columns = ["amount"] + [f"merchant_id_{m}" for m in merchants]
+    encoder = CategoryEncoder(columns, {"merchant_id": merchants})
+    records = [{"merchant_id": m} for m in ("m4999@upi", "m0@upi", "unknown@upi")]
+    assert encoder.active_columns(records).tolist() == [[5000], [1], [-1]]
+    matrix = encoder.encode_rows(np.zeros((3, len(columns))), records)
+    assert matrix.sum(axis=1).tolist() == [1, 1, 0] and matrix[0, 5000] == 1
+    for record, row in zip(records, matrix):
+        assert (encoder.encode_row(np.zeros(len(columns)), record) == row).all()
+    assert encoder.dense_columns.tolist() == [0]
+    print("  ✅ 5,000-merchant encoder: dense rows and sparse columns agree")
+
     # Build DataFrame
     df = build_feature_dataframe(features)
     assert list(df.columns) == FEATURE_COLUMNS
@@ -186,10 +395,1173 @@ def test_prediction():
     print(f"  Suspicious txn → Prob: {result2['fraud_probability']:.3f}, Risk: {result2['risk_level']}")
     print(f"  Explanation:\n{result2['explanation']}")
     print("  ✅ Suspicious transaction predicted")
+
+    # Compiled scorer (scaler folded into the model) must agree with sklearn
+    from src.data_processing import compute_behavioral_features, build_feature_dataframe
+    from src.model_registry import get_registry, load_bundle
+    scorer = get_registry().current()[0].scorer
+    bundle = load_bundle()
+    assert scorer is not None, "LogisticRegression + StandardScaler bundle should compile"
+    for txn, velocity in ((normal_txn, 1), (suspicious_txn, 8)):
+        features = compute_behavioral_features(txn, normal_profile, velocity)
+        scaled = bundle["scaler"].transform(build_feature_dataframe(features).values)
+        expected = bundle["model"].predict_proba(scaled)[0][1]
+        assert abs(scorer.score_features(features) - expected) < 1e-12
+    print("  ✅ Compiled scorer matches sklearn predict_proba")
     print("  ✅ All prediction tests passed!\n")
     return True
 
 
+def test_batch_prediction():
+    """Test the vectorized batch scoring path against the per-transaction path."""
+    print("=" * 60)
+    print("TEST 5: Batch Prediction")
+    print("=" * 60)
+
+    import random
+    import time
+    from src.fraud_prediction import predict_fraud, batch_predict
+    from src.simulator import USER_PROFILES_SEED, generate_normal_transaction, inject_fraud_patterns
+
+    random.seed(7)
+    transactions = []
+    for _ in range(200):
+        seed = random.choice(USER_PROFILES_SEED)
+        txn = generate_normal_transaction(seed)
+        if random.random() < 0.3:
+            txn = inject_fraud_patterns(txn, seed)
+        transactions.append(txn)
+    # Unknown categories must encode to all-zero one-hot blocks, as in the single path
+    transactions[0] = {**transactions[0], "location": "Chennai", "merchant_id": "bhim@upi"}
+
+    user_profiles = {
+        seed["user_id"]: {
+            "avg_amount": float(seed["avg_spend"]),
+            "last_device": seed["usual_device"],
+            "usual_location": seed["usual_location"],
+            "transaction_count": 10,
+        }
+        for seed in USER_PROFILES_SEED[::2]
+    }
+    velocities = {seed["user_id"]: i % 9 for i, seed in enumerate(USER_PROFILES_SEED)}
+
+    default = {"avg_amount": 0.0, "last_device": "", "usual_location": "", "transaction_count": 0}
+
+    def score_batch(transactions):
+        return batch_predict(transactions, user_profiles, velocities)
+
+    def score_single(transactions):
+        return [predict_fraud(txn, user_profiles.get(txn["user_id"], default),
+                              velocities.get(txn["user_id"], 1))
+                for txn in transactions]
+
+    batch, single = score_batch(transactions), score_single(transactions)
+    assert len(batch) == len(single)
+    for b, s in zip(batch, single):
+        assert b == s, f"Batch result differs from single result:\n{b}\n{s}"
+    print(f"  ✅ {len(batch)} batch results match the per-transaction path")
+
+    # CPU time, best of several alternating runs over 1,000 rows: other processes
+    # on a busy machine can't skew the ratio
+    timed = transactions * 5
+    batch_time = single_time = float("inf")
+    for _ in range(5):
+        start = time.process_time()
+        score_batch(timed)
+        batch_time = min(batch_time, time.process_time() - start)
+        start = time.process_time()
+        score_single(timed)
+        single_time = min(single_time, time.process_time() - start)
+    speedup = single_time / batch_time
+    assert speedup >= 1.2, f"batch path is only {speedup:.2f}x the per-row path"
+    print(f"  ✅ Batch: {batch_time * 1000:.1f} ms, per-row: {single_time * 1000:.1f} ms "
+          f"({speedup:.1f}x)")
+
+    # Sparse form (one active column per field) scores the same as dense rows
+    from src.data_processing import compute_feature_rows, compute_sparse_feature_rows
+    from src.model_registry import get_registry
+    scorer = get_registry().current()[0].scorer
+    profiles = [user_profiles.get(txn["user_id"], default) for txn in transactions]
+    row_velocities = [velocities.get(txn["user_id"], 1) for txn in transactions]
+    dense, active = compute_sparse_feature_rows(transactions, profiles, row_velocities)
+    matrix = compute_feature_rows(transactions, profiles, row_velocities)
+    assert active.shape == (len(transactions), 3) and (active[0, [0, 2]] == -1).all()
+    assert abs(scorer.score_sparse(dense, active) - scorer.score_matrix(matrix)).max() < 1e-12
+    print("  ✅ Sparse one-hot scoring matches the dense matrix")
+
+    assert batch_predict([], user_profiles) == []
+    print("  ✅ Empty batch handled")
+    print("  ✅ All batch prediction tests passed!\n")
+    return True
+
+
+def test_bulk_ingestion():
+    """Test bulk insert, batched pipeline and CSV ingestion."""
+    print("=" * 60)
+    print("TEST 6: Bulk Ingestion")
+    print("=" * 60)
+
+    import csv
+    import random
+    import tempfile
+    from datetime import timedelta
+    from src.database_manager import DatabaseManager
+    from src.ingest import ingest_csv
+    from src.simulator import (
+        USER_PROFILES_SEED, generate_normal_transaction, inject_fraud_patterns,
+        process_transaction, process_transaction_batch,
+    )
+
+    random.seed(11)
+    base = datetime(2026, 3, 1, 9, 0, 0)
+    transactions = []
+    for i in range(300):
+        seed = random.choice(USER_PROFILES_SEED[:5])
+        txn = generate_normal_transaction(seed)
+        if random.random() < 0.2:
+            txn = inject_fraud_patterns(txn, seed)
+        txn["transaction_id"] = f"BULK-{i:04d}"
+        txn["timestamp"] = (base + timedelta(minutes=3 * i)).isoformat()
+        transactions.append(txn)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Batched pipeline must match one-at-a-time processing exactly
+        sequential = DatabaseManager(db_path=os.path.join(tmp, "sequential.db"))
+        expected = [process_transaction(sequential, txn) for txn in transactions]
+
+        db = DatabaseManager(db_path="database/test_fraud.db")
+        db.clear_all_data()
+        batched = []
+        for start in range(0, len(transactions), 64):
+            batched += process_transaction_batch(db, transactions[start:start + 64])
+        assert batched == expected
+        for uid in (1001, 1003, 1005):
+            assert db.get_user_profile(uid) == sequential.get_user_profile(uid)
+        print(f"  ✅ Batched pipeline matches sequential processing ({len(batched)} txns)")
+
+        # Bulk insert and profile upsert
+        db.clear_all_data()
+        assert db.insert_transactions_bulk(expected, chunk_size=70) == len(expected)
+        assert db.get_fraud_stats()["total_transactions"] == len(expected)
+        profiles = [sequential.get_user_profile(uid) for uid in (1001, 1002, 1003)]
+        assert db.upsert_user_profiles_bulk(profiles, chunk_size=2) == 3
+        assert db.get_user_profiles([1001, 1002, 1003, 4242]) == {
+            **{p["user_id"]: p for p in profiles}, 4242: db.get_user_profile(4242)}
+        print("  ✅ executemany bulk insert and profile upsert")
+        sequential.close()
+
+        # CSV ingestion in chunks, in the training dataset's column layout
+        csv_path = os.path.join(tmp, "history.csv")
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["amount", "hour", "user_id", "avg_user_amount", "amount_deviation",
+                             "is_night", "is_new_device", "location_change_flag",
+                             "is_new_merchant", "transaction_velocity", "location",
+                             "device_id", "merchant_id", "fraud_label"])
+            for txn in transactions:
+                writer.writerow([txn["amount"], txn["hour"], txn["user_id"], 0, 0, 0, 0, 0, 0, 1,
+                                 txn["location"], txn["device_id"], txn["merchant_id"], 0])
+        db.clear_all_data()
+        summary = ingest_csv(db, csv_path, chunk_size=100, start_time=base, interval_seconds=180)
+        assert summary["rows"] == len(transactions)
+        assert db.get_fraud_stats()["total_transactions"] == len(transactions)
+        ingested = {t["transaction_id"]: t for t in db.get_recent_transactions(limit=1000)}
+        assert ingested["HIST-000000299"]["timestamp"] == transactions[-1]["timestamp"]
+        assert ingested["HIST-000000299"]["fraud_probability"] == expected[-1]["fraud_probability"]
+        print(f"  ✅ CSV ingestion: {summary['rows']} rows, "
+              f"{summary['rows_per_second']:,.0f} rows/s")
+
+    db.clear_all_data()
+    print("  ✅ All bulk ingestion tests passed!\n")
+    return True
+
+
+def test_compact_storage():
+    """Test the compact transactions layout and the migration into it."""
+    print("=" * 60)
+    print("TEST 7: Compact Storage")
+    print("=" * 60)
+
+    import random
+    import tempfile
+    from datetime import timedelta
+    from src.compact_storage import encode_explanation, render_explanation
+    from src.data_processing import generate_explanation
+    from src.database_manager import DatabaseManager
+    from src.simulator import (
+        USER_PROFILES_SEED, generate_normal_transaction, inject_fraud_patterns,
+        process_transaction_batch,
+    )
+
+    # Explanations reduce to reason codes and render back byte for byte
+    features = {"amount_deviation": 7.25, "is_new_device": 1, "is_night": 1, "hour": 3,
+                "location_change_flag": 1, "is_new_merchant": 1, "transaction_velocity": 9}
+    for probability in (0.0, 0.4321, 0.97, 1.0):
+        text = generate_explanation(features, probability, 0.65)
+        code = encode_explanation(text, 3)
+        assert isinstance(code, int) and render_explanation(code, 3) == text
+    assert encode_explanation("Test transaction", 3) == "Test transaction"
+    print("  ✅ Explanations round-trip through reason codes")
+
+    random.seed(23)
+    base = datetime(2026, 4, 1, 8, 0, 0)
+    transactions = []
+    for i in range(400):
+        seed = random.choice(USER_PROFILES_SEED)
+        txn = generate_normal_transaction(seed)
+        if random.random() < 0.2:
+            txn = inject_fraud_patterns(txn, seed)
+        txn["transaction_id"] = f"CMP-{i:04d}"
+        txn["timestamp"] = (base + timedelta(seconds=45 * i)).isoformat()
+        transactions.append(txn)
+    now = (base + timedelta(seconds=45 * 400)).isoformat()
+
+    def snapshot(db):
+        return (db.get_recent_transactions(limit=1000), db.get_fraud_alerts(limit=1000),
+                db.get_location_fraud_distribution(), db.get_merchant_fraud_distribution(),
+                db.get_hourly_fraud_distribution(), db.get_fraud_stats()["high_risk_count"],
+                db.get_transaction_velocity(1001, now),
+                db.get_user_activity([1001, 1002], transactions[200]["timestamp"]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        standard = DatabaseManager(db_path=os.path.join(tmp, "standard.db"))
+        compact = DatabaseManager(db_path=os.path.join(tmp, "compact.db"), storage="compact")
+        assert (standard.storage, compact.storage) == ("standard", "compact")
+        records = process_transaction_batch(standard, transactions)
+        assert process_transaction_batch(compact, transactions) == records
+        standard.insert_transaction({**transactions[0], "transaction_id": "CMP-FREE",
+                                     "explanation": "Test transaction"})
+        compact.insert_transaction({**transactions[0], "transaction_id": "CMP-FREE",
+                                    "explanation": "Test transaction"})
+        expected = snapshot(standard)
+        assert snapshot(compact) == expected
+        assert not compact.find_full_scans(compact.explain_hot_queries())
+        print("  ✅ Compact database returns the same rows as the standard one")
+
+        result = standard.migrate_to_compact()
+        assert standard.storage == "compact"
+        assert snapshot(standard) == expected
+        assert result["after"]["rows"] == len(transactions) + 1
+        assert result["after"]["bytes"] < result["before"]["bytes"]
+        standard.close()
+        reopened = DatabaseManager(db_path=os.path.join(tmp, "standard.db"))
+        assert reopened.storage == "compact" and snapshot(reopened) == expected
+        reopened.close()
+        try:
+            DatabaseManager(db_path=os.path.join(tmp, "standard.db"), storage="standard")
+            raise AssertionError("opening a compact database as standard should fail")
+        except ValueError:
+            pass
+        compact.close()
+        print(f"  ✅ Migration: {result['before']['bytes_per_row']:.0f} → "
+              f"{result['after']['bytes_per_row']:.0f} bytes per row")
+
+    print("  ✅ All compact storage tests passed!\n")
+    return True
+
+
+def test_partitioned_storage():
+    """Test day partitions, retention archival and repartitioning."""
+    print("=" * 60)
+    print("TEST 8: Partitioned Storage")
+    print("=" * 60)
+
+    import random
+    import tempfile
+    from datetime import timedelta
+    from src.database_manager import DatabaseManager
+    from src.simulator import (
+        USER_PROFILES_SEED, generate_normal_transaction, inject_fraud_patterns,
+        process_transaction_batch,
+    )
+
+    random.seed(31)
+    base = datetime(2026, 5, 30, 18, 0, 0)
+    transactions = []
+    for i in range(300):
+        seed = random.choice(USER_PROFILES_SEED[:6])
+        txn = generate_normal_transaction(seed)
+        if random.random() < 0.2:
+            txn = inject_fraud_patterns(txn, seed)
+        txn["transaction_id"] = f"PART-{i:04d}"
+        txn["timestamp"] = (base + timedelta(minutes=12 * i)).isoformat()
+        transactions.append(txn)
+    now = (base + timedelta(minutes=12 * 300)).isoformat()
+
+    def snapshot(db):
+        return (db.get_recent_transactions(limit=25), db.get_recent_transactions(limit=1000),
+                db.get_fraud_alerts(limit=1000), db.get_transaction_velocity(1001, now, 24),
+                db.get_scoring_context(1002, now, 24),
+                db.get_user_activity([1001, 1002], transactions[100]["timestamp"]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        flat = DatabaseManager(db_path=os.path.join(tmp, "flat.db"))
+        daily = DatabaseManager(db_path=os.path.join(tmp, "daily.db"), partition_by="day",
+                                archive_dir=os.path.join(tmp, "archive"))
+        assert process_transaction_batch(daily, transactions) == \
+            process_transaction_batch(flat, transactions)
+        partitions = daily.get_partitions()
+        assert [p["name"] for p in partitions] == ["transactions_p20260602",
+                                                   "transactions_p20260601",
+                                                   "transactions_p20260531",
+                                                   "transactions_p20260530"]
+        assert snapshot(daily) == snapshot(flat)
+        assert daily.get_fraud_stats() == flat.get_fraud_stats()
+        print(f"  ✅ {len(partitions)} day partitions answer like one table")
+
+        # The velocity lookup only reads partitions inside its window
+        plans = daily.explain_hot_queries(user_id=1001, current_time=now)
+        velocity_sql = plans["get_transaction_velocity"][0][0]
+        assert "transactions_p20260602" in velocity_sql
+        assert "transactions_p20260530" not in velocity_sql
+        assert not daily.find_full_scans(plans)
+        print("  ✅ Hot queries skip partitions outside their window")
+
+        # Retention: old partitions go to compressed files, aggregates follow
+        kept = sum(p["rows"] for p in partitions[:2])
+        paths = daily.archive_partitions(before="2026-06-01T00:00:00")
+        assert [os.path.basename(p) for p in paths] == ["transactions_p20260530.jsonl.gz",
+                                                        "transactions_p20260531.jsonl.gz"]
+        assert daily.get_fraud_stats()["total_transactions"] == kept
+        stats = daily.get_fraud_stats()
+        rebuilt = daily.rebuild_aggregates()
+        assert stats["high_risk_count"] == rebuilt["high_risk_count"]
+        assert abs(stats["avg_probability"] - rebuilt["avg_probability"]) < 1e-9
+        for path in paths:
+            daily.restore_archive(path)
+        assert snapshot(daily) == snapshot(flat)
+        print(f"  ✅ Archived {len(paths)} partitions and restored them")
+
+        # Rows written before partitioning was enabled move into partitions
+        expected = snapshot(flat)
+        flat.close()
+        monthly = DatabaseManager(db_path=os.path.join(tmp, "flat.db"), partition_by="month")
+        assert monthly.repartition() == len(transactions)
+        assert [p["rows"] for p in monthly.get_partitions()] == [
+            sum(t["timestamp"] >= "2026-06" for t in transactions),
+            sum(t["timestamp"] < "2026-06" for t in transactions)]
+        assert snapshot(monthly) == expected
+        monthly.close()
+        daily.close()
+        print("  ✅ Existing rows repartitioned by month")
+
+    print("  ✅ All partitioned storage tests passed!\n")
+    return True
+
+
+def test_scoring_server():
+    """Test micro-batched scoring and the HTTP endpoint."""
+    print("=" * 60)
+    print("TEST 9: Scoring Server")
+    print("=" * 60)
+
+    import asyncio
+    import json
+    import random
+    import tempfile
+    from datetime import timedelta
+    from src.database_manager import DatabaseManager
+    from src.scoring_server import MicroBatcher, ScoringServer, normalize_transaction
+    from src.simulator import USER_PROFILES_SEED, generate_normal_transaction, process_transaction
+
+    random.seed(47)
+    base = datetime(2026, 7, 1, 10, 0, 0)
+    transactions = []
+    for i in range(150):
+        txn = generate_normal_transaction(random.choice(USER_PROFILES_SEED[:8]))
+        txn["transaction_id"] = f"SRV-{i:04d}"
+        txn["timestamp"] = (base + timedelta(seconds=20 * i)).isoformat()
+        transactions.append(txn)
+
+    async def http(port, method, path, body=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        data = json.dumps(body).encode() if body is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(payload)
+
+    async def scenario(db):
+        batcher = MicroBatcher(db, max_batch_size=32, max_wait=0.005)
+        server = ScoringServer(batcher, port=0)
+        await server.start()
+        try:
+            records = await asyncio.gather(*(batcher.submit(t) for t in transactions[:140]))
+            single = await http(server.port, "POST", "/score", transactions[140])
+            many = await http(server.port, "POST", "/score", transactions[141:])
+            bad = await http(server.port, "POST", "/score", {"user_id": 1001})
+            missing = await http(server.port, "GET", "/nowhere")
+            health = await http(server.port, "GET", "/health")
+        finally:
+            await server.close()
+        return records, single, many, bad, missing, health
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sequential = DatabaseManager(db_path=os.path.join(tmp, "sequential.db"))
+        expected = [process_transaction(sequential, txn) for txn in transactions]
+        sequential.close()
+
+        db = DatabaseManager(db_path=os.path.join(tmp, "served.db"))
+        records, single, many, bad, missing, health = asyncio.run(scenario(db))
+        assert records == expected[:140]
+        print(f"  ✅ 140 concurrent submits match sequential processing "
+              f"in {health[1]['batches'] - 2} batches")
+
+        assert single == (200, expected[140])
+        assert many == (200, expected[141:])
+        assert bad[0] == 400 and "missing fields" in bad[1]["error"]
+        assert missing[0] == 404
+        assert health[0] == 200 and health[1]["transactions"] == len(transactions)
+        assert db.get_fraud_stats()["total_transactions"] == len(transactions)
+        db.close()
+        print("  ✅ HTTP: single, list, 400, 404 and /health")
+
+    txn = normalize_transaction({"user_id": "7", "amount": "12.5", "hour": 3,
+                                 "device_id": "d", "location": "l", "merchant_id": "m"})
+    assert txn["user_id"] == 7 and txn["amount"] == 12.5 and txn["transaction_id"].startswith("TXN-")
+    print("  ✅ All scoring server tests passed!\n")
+    return True
+
+
+def test_sharded_workers():
+    """Test multi-process scoring with users sharded across workers."""
+    print("=" * 60)
+    print("TEST 10: Sharded Workers")
+    print("=" * 60)
+
+    import random
+    import tempfile
+    from datetime import timedelta
+    from src.database_manager import DatabaseManager
+    from src.sharded_workers import ShardedScorer, shard_for
+    from src.simulator import USER_PROFILES_SEED, generate_normal_transaction, process_transaction
+
+    random.seed(53)
+    base = datetime(2026, 8, 1, 9, 0, 0)
+    transactions = []
+    for i in range(120):
+        txn = generate_normal_transaction(random.choice(USER_PROFILES_SEED[:10]))
+        txn["transaction_id"] = f"SHD-{i:04d}"
+        txn["timestamp"] = (base + timedelta(seconds=30 * i)).isoformat()
+        transactions.append(txn)
+
+    assert {shard_for(t["user_id"], 2) for t in transactions} == {0, 1}
+    assert all(shard_for(t["user_id"], 3) == shard_for(t["user_id"], 3) for t in transactions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sequential = DatabaseManager(db_path=os.path.join(tmp, "sequential.db"))
+        expected = [process_transaction(sequential, txn) for txn in transactions]
+
+        with ShardedScorer(2, os.path.join(tmp, "shards"), batch_size=16) as scorer:
+            records = scorer.process(transactions)
+        assert records == expected
+        print("  ✅ 2 workers match sequential processing, in input order")
+
+        merged = DatabaseManager(db_path=os.path.join(tmp, "merged.db"))
+        assert scorer.merge_into(merged) == len(transactions)
+        assert scorer.merge_into(merged) == len(transactions)  # idempotent
+        stats, want = merged.get_fraud_stats(), sequential.get_fraud_stats()
+        assert stats["total_transactions"] == want["total_transactions"]
+        assert stats["high_risk_count"] == want["high_risk_count"]
+        for user_id in {t["user_id"] for t in transactions}:
+            assert merged.get_user_profile(user_id) == sequential.get_user_profile(user_id)
+        merged.close()
+        sequential.close()
+        print("  ✅ Shards merge into one database with matching stats and profiles")
+
+        # A worker that dies is reported by shard instead of hanging the parent
+        broken = os.path.join(tmp, "broken")
+        os.makedirs(os.path.join(broken, "shard_1_of_2.db"))  # a directory: SQLite can't open it
+        try:
+            ShardedScorer(2, broken).start()
+            assert False, "start() should fail when a worker can't open its shard"
+        except RuntimeError as e:
+            assert "shard 1" in str(e)
+        with ShardedScorer(2, os.path.join(tmp, "killed")) as scorer:
+            scorer._processes[0].kill()
+            scorer._processes[0].join()
+            try:
+                scorer.process(transactions[:8])
+                assert False, "process() should fail when a worker has died"
+            except RuntimeError as e:
+                assert "shard 0" in str(e)
+        print("  ✅ Dead workers raise an error naming their shard")
+
+    print("  ✅ All sharded worker tests passed!\n")
+    return True
+
+
+def test_load_generator():
+    """Test vectorized load generation and stream files."""
+    print("=" * 60)
+    print("TEST 11: Load Generator")
+    print("=" * 60)
+
+    import tempfile
+    import numpy as np
+    from src.database_manager import DatabaseManager
+    from src.load_generator import LoadGenerator, SyntheticPopulation, drive, write_stream
+    from src.simulator import DEVICES, LOCATIONS
+    from src.stream_file import COLUMNS, columns_to_transactions, read_columns, read_transactions
+
+    population = SyntheticPopulation(50_000, seed=11)
+    columns = LoadGenerator(population, rate=500, seed=11).generate(30_000)
+    chunked = LoadGenerator(population, rate=500, seed=11)
+    parts = [chunked.generate(n) for n in (0, 1, 8191, 0, 8193, 13_615)]
+    for name, values in columns.items():
+        assert np.array_equal(values, np.concatenate([part[name] for part in parts])), name
+    print("  ✅ Same seed gives the same stream in any chunk sizes")
+
+    assert 0.08 < columns["injected_fraud"].mean() < 0.12
+    assert np.all(np.diff(columns["timestamp"]) >= 0)
+    span = (columns["timestamp"][-1] - columns["timestamp"][0]) / 1e6
+    assert 55 < span < 65  # 30,000 arrivals at 500/s
+    assert set(columns["location"]) <= set(LOCATIONS) and set(columns["device_id"]) <= set(DEVICES)
+    home = dict(zip(population.user_ids, np.array(LOCATIONS)[population.usual_location]))
+    normal = ~columns["injected_fraud"]
+    assert all(home[u] == loc for u, loc in zip(columns["user_id"][normal], columns["location"][normal]))
+    print(f"  ✅ {columns['injected_fraud'].mean():.1%} fraud, Poisson arrivals at 500/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "load.npz")
+        summary = write_stream(path, LoadGenerator(population, rate=500, seed=11), 30_000,
+                               chunk_size=7_000)
+        assert summary["rows"] == 30_000
+        stored = list(read_columns(path))
+        for name in COLUMNS:
+            assert np.array_equal(np.concatenate([c[name] for c in stored]), columns[name]), name
+        transactions = columns_to_transactions(columns)
+        assert list(read_transactions(path)) == transactions
+        print("  ✅ Stream file round-trips every column")
+
+        db = DatabaseManager(db_path=os.path.join(tmp, "load.db"))
+        summary = drive(db, LoadGenerator(population, rate=500, seed=11), 2_000, batch_size=500)
+        assert summary["rows"] == db.get_fraud_stats()["total_transactions"] == 2_000
+        paced = drive(db, LoadGenerator(population, rate=20_000, seed=12, id_prefix="PACED"),
+                      1_000, batch_size=200, paced=True)
+        assert paced["rows"] == 1_000 and paced["latency_p99_ms"] >= paced["latency_p50_ms"] > 0
+        db.close()
+        print(f"  ✅ Driven into the pipeline: {summary['rows_per_second']:,.0f}/s unpaced, "
+              f"p50 {paced['latency_p50_ms']:.1f} ms at 20,000/s paced")
+
+    print("  ✅ All load generator tests passed!\n")
+    return True
+
+
+def test_replay():
+    """Test recording streams and replaying them in simulated time."""
+    print("=" * 60)
+    print("TEST 12: Record and Replay")
+    print("=" * 60)
+
+    import random
+    import tempfile
+    import time
+    import numpy as np
+    from src.database_manager import DatabaseManager
+    from src.replay import compare_scores, record, replay, simulated_transactions
+    from src.simulator import process_transaction
+    from src.stream_file import read_transactions
+
+    random.seed(61)
+    before = random.random()
+    random.seed(61)
+    transactions = list(simulated_transactions(400, seed=5, interval_seconds=20))
+    assert random.random() == before  # caller's random state untouched
+    assert transactions == list(simulated_transactions(400, seed=5, interval_seconds=20))
+    assert transactions[1]["timestamp"] == "2024-01-01T00:00:20"
+    print("  ✅ Simulated clock: same seed, same stream")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stream.npz")
+        assert record(path, transactions, chunk_size=150) == 400
+        assert list(read_transactions(path)) == transactions
+
+        reference = DatabaseManager(db_path=os.path.join(tmp, "reference.db"))
+        expected = [process_transaction(reference, txn) for txn in transactions]
+        stored = reference.get_recent_transactions(limit=400)
+        reference.close()
+
+        runs = {}
+        for name, options in {"single": {}, "batched": {"batch_size": 64},
+                              "paced": {"speed": 8000.0}}.items():
+            db = DatabaseManager(db_path=os.path.join(tmp, f"{name}.db"))
+            started = time.perf_counter()
+            runs[name] = replay(db, path, scores_path=os.path.join(tmp, f"{name}.npz"), **options)
+            runs[name]["wall"] = time.perf_counter() - started
+            assert db.get_recent_transactions(limit=400) == stored
+            db.close()
+        assert len({run["score_digest"] for run in runs.values()}) == 1
+        assert runs["single"]["high_risk"] == sum(r["risk_level"] == "HIGH RISK" for r in expected)
+        assert runs["paced"]["wall"] >= 399 * 20 / 8000  # 7,980 simulated seconds at 8000x
+        print(f"  ✅ Replays match process_transaction; single, batched and paced runs agree "
+              f"({runs['single']['rows_per_second']:,.0f}/s single)")
+
+        scores = {name: os.path.join(tmp, f"{name}.npz") for name in runs}
+        diff = compare_scores(scores["single"], scores["batched"])
+        assert diff["rows"] == 400 and diff["missing"] == diff["probability_changed"] == 0
+        with np.load(scores["batched"]) as saved:
+            changed = {name: saved[name].copy() for name in saved.files}
+        changed["fraud_probability"][3] += 0.25
+        np.savez(os.path.join(tmp, "changed.npz"), **changed)
+        diff = compare_scores(scores["single"], os.path.join(tmp, "changed.npz"))
+        assert diff["probability_changed"] == 1 and abs(diff["max_probability_diff"] - 0.25) < 1e-9
+        print("  ✅ Score files compare per transaction")
+
+    print("  ✅ All replay tests passed!\n")
+    return True
+
+
+def test_benchmark_harness():
+    """Test benchmark measurement and regression detection."""
+    print("=" * 60)
+    print("TEST 13: Benchmark Harness")
+    print("=" * 60)
+
+    from benchmark_system import compare_to_baseline, measure
+
+    calls = []
+    result = measure(calls.append, items=10, min_time=0.0, min_iterations=50, warmup=2)
+    assert result["iterations"] == 50 and len(calls) == 52 and calls[:3] == [0, 1, 2]
+    assert 0 <= result["p50_ms"] <= result["p99_ms"] and result["per_second"] > 0
+    print(f"  ✅ measure(): {result['iterations']} timed calls, p50/p99 and throughput")
+
+    baseline = {"fast": {"p50_ms": 1.0, "p99_ms": 2.0, "per_second": 1000.0},
+                "steady": {"p50_ms": 1.0, "p99_ms": 2.0, "per_second": 1000.0},
+                "batched": {"p50_ms": 10.0, "p99_ms": 20.0, "per_second": 50_000.0}}
+    current = {"fast": {"p50_ms": 2.0, "p99_ms": 2.0, "per_second": 500.0},
+               "steady": {"p50_ms": 1.1, "p99_ms": 9.0, "per_second": 950.0},
+               "batched": {"p50_ms": 10.0, "p99_ms": 20.0, "per_second": 30_000.0},
+               "new": {"p50_ms": 5.0, "p99_ms": 5.0, "per_second": 1.0}}
+    regressions = compare_to_baseline(current, baseline, threshold=0.25)
+    assert [(name, metric) for name, metric, _, _ in regressions] == \
+        [("fast", "p50_ms"), ("batched", "per_second")]
+    print("  ✅ Regressions flagged beyond the threshold, worst first; noise and new benchmarks ignored")
+
+    print("  ✅ All benchmark harness tests passed!\n")
+    return True
+
+
+def test_metrics():
+    """Test opt-in stage histograms and the Prometheus exporters."""
+    print("=" * 60)
+    print("TEST 14: Pipeline Metrics")
+    print("=" * 60)
+
+    import asyncio
+    import random
+    import tempfile
+    from datetime import timedelta
+    from src import metrics
+    from src.database_manager import DatabaseManager
+    from src.scoring_server import MicroBatcher, ScoringServer
+    from src.simulator import (USER_PROFILES_SEED, generate_normal_transaction,
+                               process_transaction, process_transaction_batch)
+
+    random.seed(67)
+    base = datetime(2026, 8, 1, 9, 0, 0)
+    transactions = [generate_normal_transaction(random.choice(USER_PROFILES_SEED),
+                                                now=base + timedelta(seconds=30 * i))
+                    for i in range(60)]
+
+    histogram = metrics.Histogram(buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0, 9.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1] and histogram.count == 5
+    assert 1.0 < histogram.quantile(0.5) <= 2.0
+    print("  ✅ Histogram buckets and quantiles")
+
+    metrics.disable()
+    assert metrics.timer() is None and metrics.get_registry() is None
+
+    async def scrape(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), head, payload.decode()
+
+    async def serve(db):
+        server = ScoringServer(MicroBatcher(db), port=0)
+        await server.start()
+        try:
+            return await scrape(server.port)
+        finally:
+            await server.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(db_path=os.path.join(tmp, "metrics.db"))
+        assert asyncio.run(serve(db))[0] == 404  # off by default
+
+        registry = metrics.enable()
+        try:
+            assert metrics.enable() is registry
+            records = [process_transaction(db, txn) for txn in transactions[:40]]
+            records += process_transaction_batch(db, transactions[40:])
+            snapshot = registry.snapshot()
+            stages = snapshot["stages"]
+            for stage in ("pipeline.context", "pipeline.predict", "pipeline.store", "pipeline.total"):
+                assert stages[stage]["count"] == 40, stage
+            for stage in ("batch.profiles", "batch.activity", "batch.walk", "batch.predict",
+                          "batch.store", "batch.total", "batch_predict.score"):
+                assert stages[stage]["count"] == 1, stage
+            assert stages["predict.features"]["count"] == 40
+            assert stages["pipeline.total"]["p99_ms"] >= stages["pipeline.total"]["p50_ms"] > 0
+            high_risk = sum(r["risk_level"] == "HIGH RISK" for r in records)
+            counters = snapshot["counters"]
+            assert counters.get('fraud_transactions_total{risk_level="HIGH RISK"}', 0) == high_risk
+            assert counters['fraud_transactions_total{risk_level="LOW RISK"}'] == 60 - high_risk
+            assert counters["fraud_batches_total"] == 1
+            print(f"  ✅ {len(stages)} stages timed, "
+                  f"pipeline p50 {stages['pipeline.total']['p50_ms']:.2f} ms")
+
+            status, head, text = asyncio.run(serve(db))
+            assert status == 200 and b"text/plain" in head
+            assert "# TYPE fraud_stage_seconds histogram" in text
+            assert 'fraud_stage_seconds_bucket{stage="pipeline.total",le="+Inf"} 40' in text
+            assert 'fraud_stage_seconds_count{stage="batch.total"} 1' in text
+            assert 'fraud_stage_seconds_sum{stage="pipeline.store"}' in text
+            assert "# TYPE fraud_batches_total counter" in text
+            print("  ✅ GET /metrics serves the Prometheus text format")
+
+            path = os.path.join(tmp, "prom", "fraud.prom")
+            exporter = metrics.PeriodicExporter(metrics.PrometheusFileExporter(path),
+                                                interval=60).start()
+            exporter.stop()  # exports once more on the way out
+            with open(path, encoding="utf-8") as f:
+                assert f.read() == metrics.render_prometheus(registry)
+            assert not os.path.exists(path + ".partial")
+            print("  ✅ File exporter writes the same text atomically")
+        finally:
+            metrics.disable()
+            db.close()
+
+    print("  ✅ All metrics tests passed!\n")
+    return True
+
+
+def test_dashboard_data():
+    """Test the dashboard's cached, incrementally refreshed queries."""
+    print("=" * 60)
+    print("TEST 15: Dashboard Data Cache")
+    print("=" * 60)
+
+    import random
+    import tempfile
+    from datetime import timedelta
+    import pandas as pd
+    from src.dashboard_data import DashboardData
+    from src.database_manager import DatabaseManager
+    from src.simulator import USER_PROFILES_SEED, generate_normal_transaction, process_transaction
+
+    random.seed(71)
+    base = datetime(2026, 9, 1, 8, 0, 0)
+    clock = iter(range(10_000))
+
+    def transactions(count, start=None):
+        for _ in range(count):
+            at = start or base + timedelta(seconds=15 * next(clock))
+            yield generate_normal_transaction(random.choice(USER_PROFILES_SEED), now=at)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, options in (("standard", {}),
+                              ("compact, partitioned", {"partition_by": "day", "storage": "compact"})):
+            db = DatabaseManager(db_path=os.path.join(tmp, f"{name}.db"), **options)
+            for txn in transactions(300):
+                process_transaction(db, txn)
+
+            data = DashboardData(db, ttl=60, recent_rows=200, alert_rows=50)
+
+            def matches():
+                expected = pd.DataFrame(db.get_recent_transactions(limit=200))
+                assert data.recent_transactions(limit=200).equals(expected)
+                assert data.fraud_alerts(limit=50).to_dict("records") == db.get_fraud_alerts(limit=50)
+                assert data.fraud_stats() == db.get_fraud_stats()
+
+            matches()
+            assert data.stats["reloads"] == 1
+            for txn in transactions(40):
+                process_transaction(db, txn)
+            assert len(data.recent_transactions(limit=200)) == 200
+            assert data.stats["checks"] == 1  # within the TTL: no query at all
+
+            data.invalidate()
+            matches()
+            assert data.stats["incremental"] == 1 and data.stats["reloads"] == 1
+            figure = data.memo("figure", lambda: object())
+            assert data.memo("figure", lambda: object()) is figure
+
+            # A backfilled transaction is older than the cached rows: full reload
+            for txn in transactions(1, start=base - timedelta(days=3)):
+                process_transaction(db, txn)
+            for txn in transactions(5):
+                process_transaction(db, txn)
+            data.invalidate()
+            matches()
+            assert data.stats["reloads"] == 2
+            assert data.memo("figure", lambda: object()) is not figure
+
+            since = data.recent_transactions(limit=3)["timestamp"].iloc[-1]
+            assert [r["transaction_id"] for r in db.get_transactions_since(since)] == \
+                list(data.recent_transactions(limit=3)["transaction_id"])
+
+            # Keyset pages: ties on timestamp are split by transaction_id, nothing repeats
+            for txn in transactions(25, start=base + timedelta(hours=9)):
+                process_transaction(db, txn)
+            data.invalidate()
+            everything = sorted(db.iter_transactions(), reverse=True,
+                                key=lambda row: (row["timestamp"], row["transaction_id"]))
+            for high_risk_only in (False, True):
+                expected = [row["transaction_id"] for row in everything
+                            if not high_risk_only or row["risk_level"] == "HIGH RISK"]
+                pages, after = [], None
+                while True:
+                    rows, after = db.get_transactions_page(after, limit=7,
+                                                           high_risk_only=high_risk_only)
+                    pages.append([row["transaction_id"] for row in rows])
+                    if after is None:
+                        break
+                assert sum(pages, []) == expected and all(len(p) == 7 for p in pages[:-1])
+                after, walked = None, []
+                while True:
+                    page, after = data.transactions_page(after, 25, high_risk_only)
+                    walked += list(page["transaction_id"]) if not page.empty else []
+                    if after is None:
+                        break
+                assert walked == expected
+
+            # New rows tied with the newest cached timestamp are merged in ID order
+            incremental = data.stats["incremental"]
+            for txn in transactions(3, start=base + timedelta(hours=9)):
+                process_transaction(db, txn)
+            data.invalidate()
+            matches()
+            assert data.stats["incremental"] == incremental + 1
+            print(f"  ✅ {name}: keyset pages of 7 cover all {len(everything)} rows in order")
+
+            db.clear_all_data()
+            data.invalidate()
+            assert data.recent_transactions().empty and data.fraud_stats()["total_transactions"] == 0
+            db.close()
+            print(f"  ✅ {name}: incremental refresh matches the "
+                  f"database ({data.stats['rows_fetched']} rows fetched)")
+
+    print("  ✅ All dashboard data tests passed!\n")
+    return True
+
+
+def test_live_feed():
+    """Test pushing scored transactions to in-process subscribers."""
+    print("=" * 60)
+    print("TEST 16: Live Feed")
+    print("=" * 60)
+
+    import random
+    import tempfile
+    import threading
+    import time
+    from datetime import timedelta
+    from src.dashboard_data import DashboardData
+    from src.database_manager import DatabaseManager
+    from src.live_feed import LiveFeed
+    from src.simulator import (USER_PROFILES_SEED, generate_normal_transaction,
+                               process_transaction, process_transaction_batch)
+
+    feed = LiveFeed(capacity=4)
+    early, late = feed.subscribe(from_start=True), feed.subscribe()
+    feed.publish([{"n": n} for n in range(3)])
+    assert late.poll() == [{"n": 0}, {"n": 1}, {"n": 2}] and late.poll() == []
+    feed.publish([{"n": n} for n in range(3, 9)])  # more than the buffer holds
+    assert early.poll() == [{"n": n} for n in range(5, 9)] and early.missed
+    assert late.poll(limit=2) == [{"n": 5}, {"n": 6}] and late.missed
+    assert feed.sequence == 9
+
+    threading.Timer(0.05, feed.publish, args=([{"n": 9}],)).start()
+    started = time.perf_counter()
+    assert early.wait(timeout=5) == [{"n": 9}]
+    print(f"  ✅ Ring buffer: overflow is reported, wait() woke after "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    random.seed(73)
+    base = datetime(2026, 10, 1, 12, 0, 0)
+    transactions = [generate_normal_transaction(random.choice(USER_PROFILES_SEED),
+                                                now=base + timedelta(seconds=10 * i))
+                    for i in range(160)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(db_path=os.path.join(tmp, "feed.db"), live_feed_size=1000)
+        for txn in transactions[:100]:
+            process_transaction(db, txn)
+        data = DashboardData(db, ttl=60, recent_rows=120, alert_rows=40)
+        data.fraud_stats()
+        subscription = db.live_feed.subscribe()
+
+        records = [process_transaction(db, txn) for txn in transactions[100:110]]
+        records += process_transaction_batch(db, transactions[110:])
+        assert subscription.poll() == records
+        print(f"  ✅ process_transaction and the batch path published {len(records)} records")
+
+        statements = []
+        db._thread_connection().set_trace_callback(statements.append)
+        recent = data.recent_transactions(limit=120)
+        alerts = data.fraud_alerts(limit=40)
+        stats = data.fraud_stats()
+        db._thread_connection().set_trace_callback(None)
+        assert statements == [] and data.stats["fed"] == 60
+
+        def ids(rows):
+            return [row["transaction_id"] for row in rows]
+        assert ids(recent.to_dict("records")) == ids(db.get_recent_transactions(limit=120))
+        assert ids(alerts.to_dict("records")) == ids(db.get_fraud_alerts(limit=40))
+        expected = db.get_fraud_stats()
+        assert stats["total_transactions"] == expected["total_transactions"] == 160
+        assert stats["high_risk_count"] == expected["high_risk_count"]
+        assert abs(stats["avg_probability"] - expected["avg_probability"]) < 1e-9
+        print("  ✅ Dashboard reads applied the feed without a single SQLite query")
+
+        # The next version check finds nothing the feed hadn't already delivered
+        reloads, incremental = data.stats["reloads"], data.stats["incremental"]
+        data.invalidate()
+        assert data.fraud_stats() == expected
+        assert (data.stats["reloads"], data.stats["incremental"]) == (reloads, incremental)
+        db.close()
+        print("  ✅ Version check agrees with the feed: no refetch")
+
+    print("  ✅ All live feed tests passed!\n")
+    return True
+
+
+def test_model_artifact():
+    """Test the compiled NumPy model artifact and cold-start warmup."""
+    print("=" * 60)
+    print("TEST 17: Compiled Model Artifact")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import subprocess
+    import sys
+    import tempfile
+    import numpy as np
+    import src.model_registry as registry
+    from src.data_processing import compute_behavioral_features, build_feature_dataframe
+    from src.simulator import USER_PROFILES_SEED, generate_normal_transaction, inject_fraud_patterns
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle_path = os.path.join(tmp, "model.joblib")
+        artifact_path = os.path.join(tmp, "model.npy")
+        shutil.copy(registry.MODEL_PATH, bundle_path)
+        meta = registry.compile_model_artifact(bundle_path, artifact_path)
+        assert meta["feature_columns"] == registry.FEATURE_COLUMNS
+        assert np.load(artifact_path).shape == (3, len(registry.FEATURE_COLUMNS))
+        sidecar, scorer = registry._load_artifact(artifact_path, bundle_path)
+        assert sidecar == meta
+
+        sklearn_bundle = registry.load_bundle(bundle_path)
+        for seed in USER_PROFILES_SEED[:5]:
+            txn = inject_fraud_patterns(generate_normal_transaction(seed), seed)
+            profile = {"avg_amount": seed["avg_spend"], "last_device": seed["usual_device"],
+                       "usual_location": seed["usual_location"], "transaction_count": 10}
+            features = compute_behavioral_features(txn, profile, 3)
+            scaled = sklearn_bundle["scaler"].transform(build_feature_dataframe(features).values)
+            expected = sklearn_bundle["model"].predict_proba(scaled)[0][1]
+            assert abs(scorer.score_features(features) - expected) < 1e-12
+            assert abs(scorer.score_transaction(features, txn) - expected) < 1e-12
+        print("  ✅ Artifact scores match sklearn predict_proba")
+
+        with open(bundle_path, "ab") as f:
+            f.write(b"retrained")
+        assert registry._load_artifact(artifact_path, bundle_path) is None
+        print("  ✅ Artifact from an older bundle is ignored")
+
+    if registry._load_artifact() is not None:
+        code = ("import sys, time; started = time.perf_counter()\n"
+                "import src.fraud_prediction as fp; timings = fp.warmup()\n"
+                "print((time.perf_counter() - started) * 1000, timings['source'],"
+                " 'pandas' in sys.modules, 'sklearn' in sys.modules)")
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        cold_ms, source, pandas_loaded, sklearn_loaded = out.stdout.split()
+        assert source == "artifact" and pandas_loaded == sklearn_loaded == "False"
+        assert float(cold_ms) < 1000, f"cold start took {float(cold_ms):.0f} ms"
+        print(f"  ✅ Cold start: import + warmup in {float(cold_ms):.0f} ms, "
+              "without pandas or sklearn")
+    else:
+        print("  ⚠️  model/ artifact missing or stale, cold-start check skipped "
+              "(python -m src.fraud_prediction compile)")
+
+    print("  ✅ All model artifact tests passed!\n")
+    return True
+
+
+def test_model_registry():
+    """Test versioned models: hot swaps, per-transaction versions and shadow scoring."""
+    print("=" * 60)
+    print("TEST 18: Model Registry")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import tempfile
+    import json
+    import threading
+    import time
+    import joblib
+    import src.model_registry as model_registry
+    from src.database_manager import DatabaseManager
+    from src.fraud_prediction import batch_predict_rows, predict_fraud
+    from src.model_registry import BASE_VERSION, ModelRegistry
+    from src.simulator import (USER_PROFILES_SEED, generate_normal_transaction,
+                               process_transaction_batch)
+
+    seed = USER_PROFILES_SEED[0]
+    profile = {"avg_amount": seed["avg_spend"], "last_device": seed["usual_device"],
+               "usual_location": seed["usual_location"], "transaction_count": 10}
+    transactions = [generate_normal_transaction(seed) for _ in range(50)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("fraud_detection_model.joblib", "fraud_detection_model.npy",
+                     "fraud_detection_model.json"):
+            shutil.copy(os.path.join(model_registry.MODEL_DIR, name), tmp)
+        candidate = model_registry.load_bundle()
+        candidate["model"].coef_ = candidate["model"].coef_ * 1.5
+        candidate["threshold"] = 0.5
+        candidate_path = os.path.join(tmp, "candidate.joblib")
+        joblib.dump(candidate, candidate_path)
+
+        registry = ModelRegistry(tmp, poll_interval=0)
+        v2 = registry.register(candidate_path, "v2")
+        assert registry.versions() == [BASE_VERSION, "v2"] and v2.source == "artifact"
+        assert registry.current()[0].version == BASE_VERSION
+        try:
+            registry.register(candidate_path, "v2")
+            assert False, "duplicate version should be rejected"
+        except ValueError:
+            pass
+        print("  ✅ Registered v2 next to the base model, compiled to an artifact")
+
+        default_registry = model_registry._registry
+        model_registry._registry = registry
+        try:
+            # Swap back and forth while another thread scores: every batch is one version
+            batches, errors, stop = [], [], threading.Event()
+
+            def score():
+                try:
+                    while not stop.is_set():
+                        batches.append(batch_predict_rows(transactions, [profile] * 50, [1] * 50))
+                except Exception as e:
+                    errors.append(e)
+            scorer = threading.Thread(target=score)
+            scorer.start()
+            swaps = 0
+            while len(batches) < 40 and not errors:
+                registry.activate("v2" if swaps % 2 == 0 else BASE_VERSION)
+                swaps += 1
+                time.sleep(0.001)
+            stop.set()
+            scorer.join()
+            assert not errors, errors
+            seen = set()
+            for results in batches:
+                versions = {r["model_version"] for r in results}
+                assert len(versions) == 1
+                model = registry.get(versions.pop())
+                seen.add(model.version)
+                assert all(r["risk_level"] == ("HIGH RISK" if r["fraud_probability"]
+                                               >= model.threshold else "LOW RISK")
+                           for r in results)
+            assert seen == {BASE_VERSION, "v2"}
+            print(f"  ✅ {len(batches)} batches scored during {swaps} swaps, "
+                  "each by a single version")
+
+            # Shadow scores come from the same matrix product and match scoring v2 directly
+            registry.activate(BASE_VERSION)
+            registry.set_shadow("v2")
+            results = batch_predict_rows(transactions, [profile] * 50, [1] * 50)
+            single = predict_fraud(transactions[0], profile, 1)
+            registry.activate("v2")
+            direct = batch_predict_rows(transactions, [profile] * 50, [1] * 50)
+            assert all(r["model_version"] == BASE_VERSION for r in results)
+            keys = ("model_version", "fraud_probability", "risk_level")
+            assert [r["shadow"] for r in results] == [{k: d[k] for k in keys} for d in direct]
+            assert single["shadow"]["fraud_probability"] == direct[0]["fraud_probability"]
+            stats = registry.shadow_stats()["v2"]
+            assert stats["scored"] == 51 and 0 <= stats["disagreements"] <= 51
+            assert registry.current()[1] is None, "activating the shadow version clears the shadow"
+            print(f"  ✅ Shadow scoring: {stats['disagreements']} of {stats['scored']} risk levels "
+                  f"differ, mean |Δp| {stats['mean_abs_diff']:.4f}")
+
+            # Each stored transaction records the version that scored it
+            db = DatabaseManager(db_path=os.path.join(tmp, "registry.db"))
+            process_transaction_batch(db, transactions[:10])
+            registry.activate(BASE_VERSION)
+            process_transaction_batch(db, transactions[10:15])
+            stored = {row["transaction_id"]: row["model_version"]
+                      for row in db.get_recent_transactions(limit=15)}
+            assert ([stored[t["transaction_id"]] for t in transactions[:15]]
+                    == ["v2"] * 10 + [BASE_VERSION] * 5)
+            db.close()
+            print("  ✅ Stored transactions record their model version")
+        finally:
+            model_registry._registry = default_registry
+
+        # Another process switches through registry.json
+        other = ModelRegistry(tmp, poll_interval=0)
+        assert other.current()[0].version == BASE_VERSION
+        registry.activate("v2", persist=True)
+        assert other.current()[0].version == "v2"
+        with open(registry.manifest_path, "w", encoding="utf-8") as f:
+            f.write('{"active": "v9"}')
+        assert other.current()[0].version == "v2" and "v9" in other.error
+
+        # Activating from a fresh process keeps the shadow set in registry.json
+        registry.register(candidate_path, "v3")
+        registry.activate(BASE_VERSION, persist=True)
+        registry.set_shadow("v2", persist=True)
+        ModelRegistry(tmp, poll_interval=None).activate("v3", persist=True)
+        with open(registry.manifest_path, encoding="utf-8") as f:
+            assert json.load(f) == {"active": "v3", "shadow": "v2"}
+        assert other.current()[0].version == "v3" and other.current()[1].version == "v2"
+        print("  ✅ registry.json changes are picked up; a bad one keeps the current model, "
+              "and activating from another process keeps the shadow")
+
+        # poll() loads a new version without holding the lock scoring threads need
+        registry.register(candidate_path, "v4")
+        poller = ModelRegistry(tmp, poll_interval=60)
+        assert poller.current()[0].version == "v3"
+        registry.activate("v4", persist=True)
+        loading, release = threading.Event(), threading.Event()
+        load_version = model_registry.load_version
+
+        def slow_load(*args):
+            loading.set()
+            release.wait(10)
+            return load_version(*args)
+
+        model_registry.load_version = slow_load
+        try:
+            thread = threading.Thread(target=poller.poll)
+            thread.start()
+            assert loading.wait(10)
+            assert poller.current()[0].version == "v3"
+            assert poller._lock.acquire(timeout=1), "poll() held the lock while loading"
+            poller._lock.release()
+            release.set()
+            thread.join()
+        finally:
+            release.set()
+            model_registry.load_version = load_version
+        assert poller.current()[0].version == "v4" and poller.current()[1].version == "v2"
+        print("  ✅ poll() loads the new version outside the lock; scoring keeps going")
+
+    print("  ✅ All model registry tests passed!\n")
+    return True
+
+
 def test_simulator():
     """Test simulator."""
     print("=" * 60)
@@ -225,6 +1597,42 @@ def test_simulator():
     print(f"  Total: {stats['total_transactions']}, "
           f"High Risk: {stats['high_risk_count']}, "
           f"Fraud Rate: {stats['fraud_rate']:.1f}%")
+
+    # Background worker: pause holds the count, stop ends the run early
+    import time
+    from src.simulator import SimulatorWorker
+
+    worker = SimulatorWorker(db)
+    assert worker.status()["state"] == "idle" and not worker.running
+    worker.start(num_transactions=0, delay=0.0, fraud_ratio=0.3)
+    try:
+        worker.start()
+        assert False, "a second start() should be refused"
+    except RuntimeError:
+        pass
+    while worker.status()["processed"] < 20:
+        time.sleep(0.01)
+    worker.pause()
+    time.sleep(0.05)
+    paused = worker.status()
+    time.sleep(0.1)
+    assert paused["state"] == "paused" and worker.running
+    assert worker.status()["processed"] == paused["processed"]
+    worker.resume()
+    while worker.status()["processed"] <= paused["processed"]:
+        time.sleep(0.01)
+    worker.stop(timeout=10)
+    status = worker.status()
+    assert status["state"] == "stopped" and not worker.running
+    assert db.get_fraud_stats()["total_transactions"] == 10 + status["processed"]
+    print(f"  ✅ Background worker: paused at {paused['processed']}, "
+          f"stopped at {status['processed']} ({status['rate']:,.0f}/s)")
+
+    worker.start(num_transactions=5, delay=0.0)
+    worker.join(timeout=10)
+    status = worker.status()
+    assert status["state"] == "finished" and status["processed"] == 5
+    print("  ✅ Worker restarts and finishes a bounded run")
     print("  ✅ All simulator tests passed!\n")
 
     db.clear_all_data()
@@ -235,7 +1643,12 @@ if __name__ == "__main__":
     print("\n🛡️  FINTECHAI — Automated System Tests\n")
 
     all_passed = True
-    for test in [test_database, test_feature_engineering, test_prediction, test_simulator]:
+    for test in [test_database, test_feature_engineering, test_prediction, test_simulator,
+                 test_batch_prediction, test_bulk_ingestion, test_compact_storage,
+                 test_partitioned_storage, test_scoring_server, test_sharded_workers,
+                 test_load_generator, test_replay, test_benchmark_harness, test_metrics,
+                 test_dashboard_data, test_live_feed, test_model_artifact,
+                 test_model_registry]:
         try:
             if not test():
                 all_passed = False